@@ -0,0 +1,175 @@
+"""
+Local stand-in for the OpenAI batch API, for testing batch summarization
+without a provider account.
+
+Implements the file and batch endpoints used by survey_agent.llm.batch:
+
+    POST /v1/files                 upload a batch input file (multipart)
+    GET  /v1/files/{id}/content    download a file
+    POST /v1/batches               create a batch
+    GET  /v1/batches/{id}          batch status
+
+A batch is "in_progress" for --delay seconds and then completes; every
+request gets a canned summary, except a --fail_rate fraction that lands in
+the error file.
+
+Usage:
+    python examples/batch_stub_server.py --port 8765
+    BASE_URL=http://127.0.0.1:8765/v1 API_KEY=test python examples/generate_survey_v2.py --terms "LLM" --batch
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILES = {}
+BATCHES = {}
+LOCK = threading.Lock()
+
+
+def new_id(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:24]}"
+
+
+def file_object(file_id, data, filename, purpose):
+    return {
+        'id': file_id, 'object': 'file', 'bytes': len(data), 'created_at': int(time.time()),
+        'filename': filename, 'purpose': purpose, 'status': 'processed',
+    }
+
+
+def store_file(data, filename, purpose):
+    file_id = new_id('file')
+    with LOCK:
+        FILES[file_id] = {'data': data, 'meta': file_object(file_id, data, filename, purpose)}
+    return FILES[file_id]['meta']
+
+
+def run_batch(batch_id, delay, fail_rate):
+    """Produce output and error files for a batch after `delay` seconds."""
+    time.sleep(delay)
+    with LOCK:
+        batch = BATCHES[batch_id]
+        lines = FILES[batch['input_file_id']]['data'].decode('utf-8').splitlines()
+
+    outputs, errors = [], []
+    for line in lines:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        record = {'id': new_id('batch_req'), 'custom_id': request['custom_id']}
+        if random.random() < fail_rate:
+            record['response'] = {'status_code': 500, 'request_id': new_id('req'),
+                                  'body': {'error': {'message': 'stub failure', 'type': 'server_error'}}}
+            record['error'] = None
+            errors.append(record)
+            continue
+        prompt = request['body']['messages'][-1]['content']
+        content = f"[stub summary] {prompt.strip().splitlines()[0][:80]} ... ({len(prompt)} chars)"
+        record['response'] = {'status_code': 200, 'request_id': new_id('req'), 'body': {
+            'id': new_id('chatcmpl'), 'object': 'chat.completion', 'created': int(time.time()),
+            'model': request['body']['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 50, 'total_tokens': len(prompt) // 4 + 50},
+        }}
+        record['error'] = None
+        outputs.append(record)
+
+    def dump(records):
+        return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode('utf-8')
+
+    output_file = store_file(dump(outputs), f"{batch_id}_output.jsonl", 'batch_output') if outputs else None
+    error_file = store_file(dump(errors), f"{batch_id}_error.jsonl", 'batch_output') if errors else None
+    with LOCK:
+        batch.update(
+            status='completed',
+            completed_at=int(time.time()),
+            output_file_id=output_file and output_file['id'],
+            error_file_id=error_file and error_file['id'],
+            request_counts={'total': len(outputs) + len(errors), 'completed': len(outputs), 'failed': len(errors)},
+        )
+
+
+class Handler(BaseHTTPRequestHandler):
+    delay = 5.0
+    fail_rate = 0.0
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        if self.path == '/v1/files':
+            content_type = self.headers.get('Content-Type', '')
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + self.read_body())
+            fields = {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+            upload = fields.get('file')
+            if upload is None:
+                return self.send_json({'error': {'message': 'missing file'}}, 400)
+            purpose = fields['purpose'].get_content().strip() if 'purpose' in fields else 'batch'
+            return self.send_json(store_file(upload.get_payload(decode=True), upload.get_filename() or 'input.jsonl', purpose))
+
+        if self.path == '/v1/batches':
+            request = json.loads(self.read_body() or b'{}')
+            if request.get('input_file_id') not in FILES:
+                return self.send_json({'error': {'message': 'unknown input_file_id'}}, 400)
+            batch_id = new_id('batch')
+            batch = {
+                'id': batch_id, 'object': 'batch', 'endpoint': request.get('endpoint'),
+                'input_file_id': request['input_file_id'], 'completion_window': request.get('completion_window', '24h'),
+                'status': 'in_progress', 'created_at': int(time.time()), 'output_file_id': None, 'error_file_id': None,
+                'request_counts': {'total': 0, 'completed': 0, 'failed': 0}, 'metadata': request.get('metadata'),
+            }
+            with LOCK:
+                BATCHES[batch_id] = batch
+            threading.Thread(target=run_batch, args=(batch_id, self.delay, self.fail_rate), daemon=True).start()
+            return self.send_json(batch)
+
+        self.send_json({'error': {'message': f'not found: {self.path}'}}, 404)
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 3 and parts[:2] == ['v1', 'batches'] and parts[2] in BATCHES:
+            with LOCK:
+                return self.send_json(dict(BATCHES[parts[2]]))
+        if len(parts) == 4 and parts[:2] == ['v1', 'files'] and parts[3] == 'content' and parts[2] in FILES:
+            data = FILES[parts[2]]['data']
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self.send_json({'error': {'message': f'not found: {self.path}'}}, 404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in server for the OpenAI batch API')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--delay', type=float, default=5.0, help='每个批次完成前的等待秒数')
+    parser.add_argument('--fail_rate', type=float, default=0.0, help='随机失败的请求比例')
+    args = parser.parse_args()
+
+    Handler.delay = args.delay
+    Handler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"🧪 批处理模拟服务已启动: http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ import json
 import sys
 sys.path.append('/mnt/bn/chenguoqing-lf/code/survey_agent/src')
 
-from survey_agent.survey import generate_survey
+from survey_agent.survey import generate_survey, ingest_pdf_directory
+from survey_agent.survey.artifacts import STAGES
 from survey_agent.utils import load_papers_from_jsonl
 import os
 
@@ -28,6 +29,7 @@ def parse_arguments():
     source_group.add_argument('--titles', nargs='+', help='论文标题列表')
     source_group.add_argument('--papers', help='预处理的论文JSONL文件路径')
     source_group.add_argument('--bib_file', help='BIB文件路径')
+    source_group.add_argument('--local_pdf_dir', help='本地PDF目录（递归扫描，增量导入）')
     
     # 其他参数
     parser.add_argument('--max_results', type=int, default=100, help='最大搜索结果数量')
@@ -39,6 +41,21 @@ def parse_arguments():
     parser.add_argument('--logic', choices=['AND', 'OR'], default='AND', help='关键词匹配逻辑: AND(必须同时满足所有关键词) 或 OR(满足任一关键词即可)')
     parser.add_argument('--date', help='查询指定日期发布的论文，格式: YYYY-MM-DD (例如: 2025-09-21)')
     parser.add_argument('--date_range', nargs=2, metavar=('START_DATE', 'END_DATE'), help='查询日期范围内的论文，格式: YYYY-MM-DD YYYY-MM-DD (例如: 2025-09-01 2025-09-30)')
+    parser.add_argument('--force_stage', '--force-stage', dest='force_stages', action='append', choices=STAGES, default=[],
+                        help='即使输入未变化也重新计算的阶段，可多次指定 (例如: --force-stage summary)')
+    parser.add_argument('--artifact_dir', help='阶段产物保存目录，默认为 cache/artifacts')
+    parser.add_argument('--no_artifacts', action='store_true', help='不复用阶段产物，所有阶段重新计算')
+    parser.add_argument('--concurrency', type=int, default=None, help='LLM并发请求数（异步总结），默认逐篇总结')
+    parser.add_argument('--batch', action='store_true', help='通过批处理API离线总结（费用更低，需等待任务完成）')
+    parser.add_argument('--batch_dir', help='批处理任务清单保存目录，默认为 cache/batches')
+    parser.add_argument('--map_reduce', action='store_true', help='长论文分块总结后再汇总，覆盖全文（而不是截断）')
+    parser.add_argument('--triage', action='store_true', help='分级总结：先用便宜的模型按标题和摘要打相关度分，只对达到阈值的论文做全文总结')
+    parser.add_argument('--triage_query', help='分级总结的综述主题，默认使用搜索关键词')
+    parser.add_argument('--triage_model', help='筛选使用的模型，默认与 --model_name 相同（只发送标题和摘要）')
+    parser.add_argument('--triage_threshold', type=float, default=None, help='全文总结的相关度阈值（0-10），默认为6')
+    parser.add_argument('--in_memory', action='store_true', help='PDF下载到内存后直接提取文本，不再从磁盘重新打开')
+    parser.add_argument('--no_persist_pdf', action='store_true', help='内存模式下不把PDF保存到 --pdf_dir（无状态worker）')
+    parser.add_argument('--use_latex', action='store_true', help='优先从arXiv的LaTeX源码提取正文，没有源码时使用PDF')
     
     return parser.parse_args()
 
@@ -60,6 +77,20 @@ def main():
         'logic': args.logic,
         'date': args.date,
         'date_range': args.date_range,
+        'force_stages': args.force_stages,
+        'artifact_dir': args.artifact_dir,
+        'use_artifacts': not args.no_artifacts,
+        'concurrency': args.concurrency,
+        'batch': args.batch,
+        'batch_dir': args.batch_dir,
+        'map_reduce': args.map_reduce,
+        'triage': args.triage,
+        'triage_query': args.triage_query,
+        'triage_model': args.triage_model,
+        'triage_threshold': args.triage_threshold,
+        'in_memory': args.in_memory,
+        'persist_pdf': not args.no_persist_pdf,
+        'use_latex': args.use_latex,
     }
 
     
@@ -80,6 +111,9 @@ def main():
     elif args.bib_file:
         print(f"📚 从BIB文件生成综述: {args.bib_file}")
         kwargs['bib_file'] = args.bib_file
+    elif args.local_pdf_dir:
+        print(f"📂 从本地PDF目录生成综述: {args.local_pdf_dir}")
+        kwargs['papers'] = ingest_pdf_directory(args.local_pdf_dir)
     
     # 生成综述
     print("✨ 开始生成综述...")
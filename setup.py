@@ -12,6 +12,7 @@ setup(
         "fuzzywuzzy",
         "python-Levenshtein",
         "openai",
+        "httpx",
         "rich",
     ],
     python_requires=">=3.8",
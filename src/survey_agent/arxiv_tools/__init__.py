@@ -1,2 +1,3 @@
 from .search import search_papers, search_papers_by_terms, search_paper_by_title
-from .download import process_paper, download_paper_pdf, extract_text_from_pdf 
\ No newline at end of file
+from .download import process_paper, download_paper_pdf, extract_text_from_pdf, extract_text_from_pdf_bytes, download_to_memory, wait_for_pdf_writes, revalidate_pdf, summarize_revalidation
+from .latex import extract_text_from_latex_source
\ No newline at end of file
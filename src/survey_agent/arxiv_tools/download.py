@@ -1,11 +1,33 @@
 import os
 import fitz  # PyMuPDF
+import json
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+import io
 import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
+from ..utils.cache import PaperCache, get_paper_cache
+from ..utils.fingerprint import fingerprint_text
+from ..utils.paper import Paper
+from ..utils.text_store import LazyText, spill_text as spill_text_to_disk
+
+# 内存模式下PDF异步落盘使用的线程池
+_pdf_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-writer")
+_pending_writes = set()
+_pending_writes_lock = threading.Lock()
+
+# 版本未知的PDF（非arXiv链接等）多久用条件请求重新校验一次
+PDF_REVALIDATE_INTERVAL = timedelta(hours=24)
+
+_DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
 def ensure_pdf_dir(pdf_dir: str = None) -> str:
     """
     Ensure the PDF directory exists.
@@ -22,7 +44,9 @@ def ensure_pdf_dir(pdf_dir: str = None) -> str:
     os.makedirs(pdf_dir, exist_ok=True)
     return pdf_dir
 
-def download_with_retry(url: str, output_path: str, max_retries: int = 5, initial_delay: int = 2) -> bool:
+def download_with_retry(url: str, output_path: str, max_retries: int = 5, initial_delay: int = 2,
+                        response_headers: Optional[Dict[str, str]] = None,
+                        cache: Optional[PaperCache] = None) -> bool:
     """
     Download a file with retry mechanism and progress display
     
@@ -31,19 +55,27 @@ def download_with_retry(url: str, output_path: str, max_retries: int = 5, initia
         output_path: Path to save the file
         max_retries: Maximum number of retry attempts
         initial_delay: Initial delay between retries (will be exponentially increased)
+        response_headers: If given, filled with the ETag and Last-Modified response headers
+        cache: Paper cache whose negative cache skips URLs that recently returned
+            404 and remembers new ones; None downloads without the check
         
     Returns:
         bool: Whether the download was successful
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    # 最近返回过404的URL直接跳过
+    if cache is not None and cache.get_failure('pdf_404', url):
+        tqdm.write(f"⏭️ 跳过之前返回404的URL: {url}")
+        return False
+    
+    headers = dict(_DOWNLOAD_HEADERS)
     
     for attempt in range(max_retries):
         tqdm.write(f"🔄 下载中... {url}")
         try:
             response = requests.get(url, headers=headers, stream=True)
             response.raise_for_status()
+            if response_headers is not None:
+                response_headers.update(_validators(response))
             
             # 获取文件大小用于进度显示
             total_size = int(response.headers.get('content-length', 0))
@@ -65,6 +97,8 @@ def download_with_retry(url: str, output_path: str, max_retries: int = 5, initia
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
                 tqdm.write(f"文件不存在 (404): {url}")
+                if cache is not None:
+                    cache.remember_failure('pdf_404', url, "HTTP 404")
                 return False
             delay = initial_delay * (2 ** attempt)
             tqdm.write(f"🔄 下载失败，{delay}秒后重试 (尝试 {attempt + 1}/{max_retries})")
@@ -78,22 +112,280 @@ def download_with_retry(url: str, output_path: str, max_retries: int = 5, initia
     tqdm.write(f"❌ 下载失败，已达到最大重试次数: {url}")
     return False
 
-def download_paper_pdf(paper, pdf_dir: str = None) -> str:
+def download_to_memory(url: str, max_retries: int = 5, initial_delay: int = 2,
+                       response_headers: Optional[Dict[str, str]] = None,
+                       cache: Optional[PaperCache] = None) -> Optional[bytes]:
+    """
+    Download a file into a memory buffer with the same retry policy as download_with_retry
+    
+    Args:
+        url: URL to download from
+        max_retries: Maximum number of retry attempts
+        initial_delay: Initial delay between retries (will be exponentially increased)
+        response_headers: If given, filled with the ETag and Last-Modified response headers
+        cache: Paper cache whose negative cache skips URLs that recently returned
+            404 and remembers new ones; None downloads without the check
+        
+    Returns:
+        The downloaded bytes, or None if the download failed
+    """
+    if cache is not None and cache.get_failure('pdf_404', url):
+        tqdm.write(f"⏭️ 跳过之前返回404的URL: {url}")
+        return None
+    
+    headers = dict(_DOWNLOAD_HEADERS)
+    
+    for attempt in range(max_retries):
+        tqdm.write(f"🔄 下载到内存中... {url}")
+        try:
+            response = requests.get(url, headers=headers, stream=True)
+            response.raise_for_status()
+            if response_headers is not None:
+                response_headers.update(_validators(response))
+            
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if chunk:
+                    buffer.write(chunk)
+            
+            data = buffer.getvalue()
+            tqdm.write(f"✅ 下载完成 (内存): {url} 文件大小: {len(data)} 字节")
+            return data
+            
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 404:
+                tqdm.write(f"文件不存在 (404): {url}")
+                if cache is not None:
+                    cache.remember_failure('pdf_404', url, "HTTP 404")
+                return None
+            delay = initial_delay * (2 ** attempt)
+            tqdm.write(f"🔄 下载失败，{delay}秒后重试 (尝试 {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            
+        except Exception as e:
+            delay = initial_delay * (2 ** attempt)
+            tqdm.write(f"🔄 下载出错 ({str(e)})，{delay}秒后重试 (尝试 {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+    
+    tqdm.write(f"❌ 下载失败，已达到最大重试次数: {url}")
+    return None
+
+def _get_pdf_url(paper: Paper) -> str:
+    """Return the PDF URL of a paper record."""
+    return paper.pdf_url or f"https://arxiv.org/pdf/{paper.get_short_id()}.pdf"
+
+def _get_pdf_path(paper: Paper, pdf_dir: str = None) -> str:
+    """Return the local path a paper's PDF is stored at."""
+    pdf_dir = ensure_pdf_dir(pdf_dir)
+    safe_title = "".join([c if c.isalnum() else "_" for c in paper.title])
+    return os.path.join(pdf_dir, f"{safe_title}.pdf")
+
+def _write_pdf(pdf_bytes: bytes, pdf_path: str, meta: Optional[Dict[str, Any]] = None):
+    """Atomically write PDF bytes to disk (and its version sidecar, if given)."""
+    tmp_path = f"{pdf_path}.part"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, pdf_path)
+        if meta is not None:
+            write_pdf_meta(pdf_path, meta)
+    except Exception as e:
+        tqdm.write(f"⚠️ 保存PDF失败: {pdf_path} - {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def persist_pdf_async(pdf_bytes: bytes, pdf_path: str, meta: Optional[Dict[str, Any]] = None):
+    """
+    Persist downloaded PDF bytes to the PDF store in a background thread.
+    
+    Args:
+        pdf_bytes: Raw PDF content
+        pdf_path: Destination path
+        meta: Version metadata written to the sidecar once the PDF is on disk
+        
+    Returns:
+        Future of the background write
+    """
+    future = _pdf_writer.submit(_write_pdf, pdf_bytes, pdf_path, meta)
+    with _pending_writes_lock:
+        _pending_writes.add(future)
+    # 写完即移出，长时间运行的worker不会积累已完成的future
+    future.add_done_callback(_discard_pending_write)
+    return future
+
+def _discard_pending_write(future):
+    with _pending_writes_lock:
+        _pending_writes.discard(future)
+
+def wait_for_pdf_writes():
+    """Block until all PDFs scheduled by persist_pdf_async have been written."""
+    while True:
+        with _pending_writes_lock:
+            pending = list(_pending_writes)
+        if not pending:
+            return
+        for future in pending:
+            future.result()
+
+def _validators(response) -> Dict[str, str]:
+    """ETag and Last-Modified headers of a response, used for conditional requests."""
+    return {
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+    }
+
+def _meta_path(pdf_path: str) -> str:
+    return f"{pdf_path}.meta.json"
+
+def read_pdf_meta(pdf_path: str) -> Dict[str, Any]:
+    """
+    Read the version sidecar of a stored PDF.
+    
+    Args:
+        pdf_path: Path to the PDF
+        
+    Returns:
+        Sidecar dictionary (arxiv_id, version, updated, pdf_url, etag, last_modified,
+        checked_at and the text fingerprint), empty if there is none
+    """
+    try:
+        with open(_meta_path(pdf_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_pdf_meta(pdf_path: str, meta: Dict[str, Any]):
+    """Atomically write the version sidecar of a stored PDF."""
+    path = _meta_path(pdf_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _version_meta(paper: Paper, pdf_url: str, validators: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Sidecar contents for a freshly downloaded PDF."""
+    meta = {
+        'arxiv_id': paper.arxiv_id,
+        'version': paper.version,
+        'updated': paper.updated,
+        'pdf_url': pdf_url,
+        'checked_at': datetime.now().isoformat(),
+    }
+    meta.update(validators or {})
+    return meta
+
+def _conditional_get(url: str, meta: Dict[str, Any], timeout: int = 60):
+    """
+    Fetch a URL only if it changed since the validators stored in meta.
+    
+    Returns:
+        (status, content, validators) where status is 'not_modified', 'modified' or 'failed'
+    """
+    headers = dict(_DOWNLOAD_HEADERS)
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return 'not_modified', None, {}
+        response.raise_for_status()
+        return 'modified', response.content, _validators(response)
+    except Exception as e:
+        tqdm.write(f"⚠️ 重新校验PDF失败，继续使用本地文件: {url} - {e}")
+        return 'failed', None, {}
+
+def revalidate_pdf(paper: Paper, pdf_path: str) -> str:
+    """
+    Check whether a stored PDF is still the version the paper metadata describes,
+    and replace it if not.
+    
+    arXiv version numbers decide without any request when both the paper and the
+    sidecar know them. Otherwise a conditional request (If-None-Match /
+    If-Modified-Since) is sent, at most once per PDF_REVALIDATE_INTERVAL.
+    
+    Args:
+        paper: Paper record
+        pdf_path: Path to the stored PDF
+        
+    Returns:
+        'unchanged' or 'changed'
+    """
+    meta = read_pdf_meta(pdf_path)
+    pdf_url = _get_pdf_url(paper)
+    
+    if paper.version and meta.get('version'):
+        if paper.version == meta['version']:
+            return 'unchanged'
+        # 版本号变化：直接重新下载
+        tqdm.write(f"🆕 论文版本更新 {meta['version']} -> {paper.version}: {paper.title}")
+        validators = {}
+        tmp_path = f"{pdf_path}.new"
+        if not download_with_retry(pdf_url, tmp_path, response_headers=validators, cache=get_paper_cache()):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return 'unchanged'
+        os.replace(tmp_path, pdf_path)
+        write_pdf_meta(pdf_path, _version_meta(paper, pdf_url, validators))
+        return 'changed'
+    
+    checked_at = meta.get('checked_at')
+    if checked_at and datetime.fromisoformat(checked_at) > datetime.now() - PDF_REVALIDATE_INTERVAL:
+        return 'unchanged'
+    
+    status, content, validators = _conditional_get(pdf_url, meta)
+    if status == 'modified' and content and len(content) >= 1024:
+        # 服务器不支持条件请求（或本地没有校验信息）时比较文件内容
+        with open(pdf_path, 'rb') as f:
+            unchanged = f.read() == content
+        if not unchanged:
+            tqdm.write(f"🆕 PDF内容已更新: {paper.title}")
+            _write_pdf(content, pdf_path, _version_meta(paper, pdf_url, validators))
+            return 'changed'
+    
+    # 未修改（或校验失败）：只记录这次检查，保留已提取文本的指纹
+    meta.update(_version_meta(paper, pdf_url, validators or {k: meta.get(k, '') for k in ('etag', 'last_modified')}))
+    write_pdf_meta(pdf_path, meta)
+    return 'unchanged'
+
+def summarize_revalidation(papers: List[Paper]) -> Dict[str, List[str]]:
+    """
+    Group processed papers by what happened to their stored PDF.
+    
+    Args:
+        papers: Papers returned by process_paper
+        
+    Returns:
+        Dictionary mapping 'new', 'changed' and 'unchanged' to paper titles
+    """
+    report = {'new': [], 'changed': [], 'unchanged': []}
+    for paper in papers:
+        status = paper.get('pdf_status') if paper is not None else None
+        if status in report:
+            report[status].append(paper.get('title', ''))
+    return report
+
+def download_paper_pdf(paper, pdf_dir: str = None, revalidate: bool = True) -> str:
     """
     Download a paper's PDF.
     
     Args:
-        paper: ArXiv paper object
+        paper: Paper record, ArXiv paper object or paper dictionary
         pdf_dir: Directory to save the PDF
+        revalidate: Check an existing PDF against the paper's version (see revalidate_pdf);
+            the result is stored in paper['pdf_status'] when a Paper record is passed
         
     Returns:
         Path to the downloaded PDF
     """
-    pdf_dir = ensure_pdf_dir(pdf_dir)
+    paper = Paper.from_any(paper)
     
     # Create a safe filename from the title
-    safe_title = "".join([c if c.isalnum() else "_" for c in paper.title])
-    pdf_path = os.path.join(pdf_dir, f"{safe_title}.pdf")
+    pdf_path = _get_pdf_path(paper, pdf_dir)
+    paper['pdf_status'] = 'new'
     
     # Download if not already exists
     if not os.path.exists(pdf_path):
@@ -108,15 +400,22 @@ def download_paper_pdf(paper, pdf_dir: str = None) -> str:
                 # 如果paper对象没有download_pdf方法，尝试直接从URL下载
                 # 在字节的merlin的开发机下载特别慢，所以使用下面的方法下载了
                 print(f"\n直接从URL下载")
-                pdf_url = paper.pdf_url if hasattr(paper, 'pdf_url') else f"https://arxiv.org/pdf/{paper.get('arxiv_id')}.pdf"
-                if download_with_retry(pdf_url, pdf_path):
+                pdf_url = _get_pdf_url(paper)
+                validators = {}
+                if download_with_retry(pdf_url, pdf_path, response_headers=validators, cache=get_paper_cache()):
+                    write_pdf_meta(pdf_path, _version_meta(paper, pdf_url, validators))
                     tqdm.write(f"Downloaded `{paper.title}` to `{pdf_path}`")
                 else:
                     return None
         except Exception as e:
             tqdm.write(f"Error downloading `{paper.title}`: {e}")
             return None
+    elif revalidate:
+        paper['pdf_status'] = revalidate_pdf(paper, pdf_path)
+        if paper['pdf_status'] == 'unchanged':
+            tqdm.write(f"Skipping `{paper.title}` because it already exists")
     else:
+        paper['pdf_status'] = 'unchanged'
         tqdm.write(f"Skipping `{paper.title}` because it already exists")
     
     # 验证下载的文件是否完整
@@ -155,20 +454,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         
     try:
         doc = fitz.open(pdf_path)
-        text = ""
-        page_count = doc.page_count
-        
-        for page_num in range(page_count):
-            try:
-                page = doc[page_num]
-                page_text = page.get_text()
-                text += page_text
-            except Exception as page_e:
-                tqdm.write(f"⚠️ 跳过第{page_num+1}页 (错误: {page_e}): {pdf_path}")
-                continue
-        
-        doc.close()
-        return text
+        return extract_text_from_doc(doc, pdf_path)
         
     except fitz.fitz.FileDataError as e:
         tqdm.write(f"❌ PDF格式错误: {pdf_path} - {e}")
@@ -180,35 +466,160 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         tqdm.write(f"❌ 提取PDF文本时出错: {pdf_path} - {e}")
         return ""
 
-def process_paper(paper, pdf_dir: str = None) -> Dict[str, Any]:
+def extract_text_from_pdf_bytes(pdf_bytes: bytes, source: str = "<memory>") -> str:
+    """
+    Extract text from PDF bytes without touching the disk.
+    
+    Args:
+        pdf_bytes: Raw PDF content
+        source: Label used in log messages (usually the URL)
+        
+    Returns:
+        Extracted text
+    """
+    if not pdf_bytes or len(pdf_bytes) < 1024:  # 小于1KB可能是损坏的文件
+        tqdm.write(f"⚠️ PDF数据可能损坏 (大小: {len(pdf_bytes or b'')} bytes): {source}")
+        return ""
+    
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        return extract_text_from_doc(doc, source)
+    except fitz.fitz.FileDataError as e:
+        tqdm.write(f"❌ PDF格式错误: {source} - {e}")
+        return ""
+    except Exception as e:
+        tqdm.write(f"❌ 提取PDF文本时出错: {source} - {e}")
+        return ""
+
+def extract_text_from_doc(doc, source: str) -> str:
+    """Read the text of every page of an open PyMuPDF document and close it."""
+    pages = []
+    try:
+        for page_num in range(doc.page_count):
+            try:
+                pages.append(doc[page_num].get_text())
+            except Exception as page_e:
+                tqdm.write(f"⚠️ 跳过第{page_num+1}页 (错误: {page_e}): {source}")
+                continue
+    finally:
+        doc.close()
+    return "".join(pages)
+
+def _download_and_extract_in_memory(paper: Paper, pdf_dir: str = None, persist_pdf: bool = True):
+    """
+    Download a paper's PDF into memory and extract its text immediately.
+    
+    Args:
+        paper: Paper record
+        pdf_dir: Directory of the PDF store
+        persist_pdf: Whether to write the PDF to the store in the background
+        
+    Returns:
+        Tuple of (pdf_path or None, extracted text, pending write); the text is
+        None when the PDF is already stored and should be read from disk. The
+        pending write is (pdf_bytes, sidecar meta) when the caller should
+        persist the new PDF with persist_pdf_async, after adding the text
+        fields to the meta
+    """
+    pdf_path = _get_pdf_path(paper, pdf_dir)
+    
+    # 已经在本地的PDF先校验版本，再由调用方从磁盘读取
+    if os.path.exists(pdf_path):
+        paper['pdf_status'] = revalidate_pdf(paper, pdf_path)
+        return pdf_path, None, None
+    
+    paper['pdf_status'] = 'new'
+    pdf_url = _get_pdf_url(paper)
+    validators = {}
+    pdf_bytes = download_to_memory(pdf_url, response_headers=validators, cache=get_paper_cache())
+    if not pdf_bytes:
+        return None, "", None
+    
+    text = extract_text_from_pdf_bytes(pdf_bytes, pdf_url)
+    if not persist_pdf or not text:
+        return None, text, None
+    
+    return pdf_path, text, (pdf_bytes, _version_meta(paper, pdf_url, validators))
+
+def process_paper(paper, pdf_dir: str = None, in_memory: bool = False, persist_pdf: bool = True,
+                  use_latex: bool = False, spill_text: bool = False) -> Paper:
     """
     Process a paper: download PDF and extract text.
     
     Args:
-        paper: ArXiv paper object
+        paper: Paper record, ArXiv paper object or paper dictionary
         pdf_dir: Directory to save the PDF
+        in_memory: Download into memory and extract from the bytes directly,
+            instead of reopening the PDF from disk
+        persist_pdf: In memory mode, whether to write the PDF to pdf_dir
+            asynchronously (False keeps the worker stateless)
+        use_latex: Extract text from the arXiv LaTeX source (e-print) when available,
+            falling back to the PDF otherwise
+        spill_text: Write the extracted text to disk and keep only a lazy handle
+            (LazyText) in 'pdf_text', so memory stays flat for large surveys
         
     Returns:
-        Dictionary with paper information
-    """
-    pdf_path = download_paper_pdf(paper, pdf_dir)
-    
-    # Extract information
-    paper_info = {
-        'title': paper.title if hasattr(paper, 'title') else paper.get('title', ''),
-        'authors': ', '.join([str(author) for author in paper.authors]) if hasattr(paper, 'authors') else paper.get('authors', ''),
-        'summary': paper.summary if hasattr(paper, 'summary') else paper.get('summary', ''),
-        'url': paper.entry_id if hasattr(paper, 'entry_id') else paper.get('url', ''),
-        'pdf_url': paper.pdf_url if hasattr(paper, 'pdf_url') else paper.get('pdf_url', ''),
-        'published': paper.published if hasattr(paper, 'published') else paper.get('published', ''),
-        'comment': paper.comment if hasattr(paper, 'comment') else paper.get('comment', ''),
-        'pdf_path': pdf_path,
-    }
+        Paper record with pdf_path, pdf_text, text_source, content_fingerprint
+        and simhash filled in; paper['pdf_status'] tells whether the stored PDF
+        was 'new', 'changed' or 'unchanged' ('new' for text from the LaTeX source)
+    """
+    paper = Paper.from_any(paper)
     
-    # Extract text from PDF if it exists
-    if pdf_path and os.path.exists(pdf_path):
-        paper_info['pdf_text'] = extract_text_from_pdf(pdf_path)
+    latex_text = ""
+    pending_write = None
+    if use_latex and paper.arxiv_id:
+        from .latex import extract_text_from_latex_source
+        latex_text = extract_text_from_latex_source(paper.get_short_id())
+    
+    if latex_text:
+        # 源码可用时不再下载PDF；源码每次重新下载，按新下载统计
+        pdf_path, pdf_text = None, latex_text
+        paper['pdf_status'] = 'new'
+    elif in_memory:
+        pdf_path, pdf_text, pending_write = _download_and_extract_in_memory(paper, pdf_dir, persist_pdf)
     else:
-        paper_info['pdf_text'] = ""
+        pdf_path = download_paper_pdf(paper, pdf_dir)
+        pdf_text = None
+    
+    paper.pdf_path = pdf_path
+    paper.text_source = 'latex' if latex_text else 'pdf'
+    
+    # PDF版本未变化且之前提取过的文本还在磁盘上：直接复用，不再重新提取
+    if pdf_text is None and spill_text and paper.get('pdf_status') == 'unchanged':
+        meta = read_pdf_meta(pdf_path)
+        text_path = meta.get('text_path')
+        if text_path and meta.get('content_fingerprint') and os.path.exists(text_path):
+            paper.pdf_text = LazyText(text_path, meta.get('text_length', 0))
+            paper.content_fingerprint = meta['content_fingerprint']
+            paper.simhash = meta.get('simhash', '')
+            return paper
+    
+    # Extract text from PDF if it exists
+    if pdf_text is None:
+        pdf_text = extract_text_from_pdf(pdf_path) if pdf_path and os.path.exists(pdf_path) else ""
+    
+    # 提取文本时计算一次内容指纹，缓存直接复用
+    paper.content_fingerprint, paper.simhash = fingerprint_text(paper.title, paper.summary, pdf_text)
+    
+    text_meta = {}
+    if spill_text and pdf_text:
+        key = paper.get_short_id() or "".join([c if c.isalnum() else "_" for c in paper.title])
+        pdf_text = spill_text_to_disk(pdf_text, key)
+        text_meta = {
+            'text_path': pdf_text.path,
+            'text_length': len(pdf_text),
+            'content_fingerprint': paper.content_fingerprint,
+            'simhash': paper.simhash,
+        }
+    paper.pdf_text = pdf_text
+    
+    if pending_write is not None:
+        # 内存模式新下载的PDF：文本信息随版本信息一起写入sidecar，后台写入不会覆盖它
+        pdf_bytes, meta = pending_write
+        persist_pdf_async(pdf_bytes, pdf_path, dict(meta, **text_meta))
+    elif text_meta and pdf_path and os.path.exists(pdf_path):
+        meta = read_pdf_meta(pdf_path)
+        meta.update(text_meta)
+        write_pdf_meta(pdf_path, meta)
     
-    return paper_info 
\ No newline at end of file
+    return paper 
\ No newline at end of file
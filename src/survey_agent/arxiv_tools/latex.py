@@ -0,0 +1,293 @@
+import gzip
+import io
+import os
+import re
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from tqdm import tqdm
+
+from .download import download_to_memory
+from ..utils.cache import get_paper_cache
+
+# 解包e-print时的安全限制
+MAX_SOURCE_BYTES = 200 * 1024 * 1024
+MAX_SOURCE_MEMBERS = 5000
+MAX_INPUT_DEPTH = 10
+
+# 常见的主文件名，按优先级排列
+MAIN_TEX_NAMES = ['main.tex', 'ms.tex', 'paper.tex', 'article.tex', 'manuscript.tex']
+
+# 只保留内容（丢弃命令本身）的格式化命令
+_KEEP_ARG_COMMANDS = [
+    'textbf', 'textit', 'emph', 'underline', 'texttt', 'textsc', 'textrm', 'textsf',
+    'mathrm', 'mathbf', 'mbox', 'text', 'footnote', 'caption', 'paragraph', 'subparagraph',
+]
+
+# 连同参数一起丢弃的命令
+_DROP_COMMANDS = [
+    'cite', 'citep', 'citet', 'citealp', 'ref', 'eqref', 'autoref', 'cref', 'Cref', 'label',
+    'includegraphics', 'bibliographystyle', 'bibliography', 'vspace', 'hspace', 'url',
+    'thanks', 'newcommand', 'renewcommand', 'usepackage', 'input', 'include',
+]
+
+# 整个环境都丢弃的环境
+_DROP_ENVIRONMENTS = ['figure', 'figure*', 'table', 'table*', 'tikzpicture', 'thebibliography', 'algorithm']
+
+_SECTION_LEVELS = {
+    'section': '##',
+    'subsection': '###',
+    'subsubsection': '####',
+}
+
+
+def download_paper_source(arxiv_id: str) -> Optional[bytes]:
+    """
+    Download the e-print (LaTeX source) of an arXiv paper.
+    
+    Args:
+        arxiv_id: arXiv identifier, optionally with version (e.g. "2406.09172v2")
+        
+    Returns:
+        Raw e-print bytes, or None if no LaTeX source is available
+    """
+    data = download_to_memory(f"https://arxiv.org/e-print/{arxiv_id}", cache=get_paper_cache())
+    if not data:
+        return None
+    
+    # 没有源码的论文，e-print直接返回PDF
+    if data[:4] == b'%PDF':
+        tqdm.write(f"ℹ️ 论文没有LaTeX源码: {arxiv_id}")
+        return None
+    
+    return data
+
+
+def _is_within(root: Path, path: Path) -> bool:
+    """Check that path resolves inside root."""
+    try:
+        path.resolve().relative_to(root.resolve())
+        return True
+    except ValueError:
+        return False
+
+
+def unpack_source(data: bytes, dest_dir: str) -> bool:
+    """
+    Safely unpack an e-print into a directory.
+    
+    Only regular .tex files are written. Absolute paths, path traversal,
+    links and oversized archives are rejected.
+    
+    Args:
+        data: Raw e-print bytes (gzipped tarball or single gzipped .tex file)
+        dest_dir: Directory to unpack into
+        
+    Returns:
+        Whether any .tex file was unpacked
+    """
+    root = Path(dest_dir)
+    
+    try:
+        tar = tarfile.open(fileobj=io.BytesIO(data), mode='r:*')
+    except tarfile.ReadError:
+        # 单文件论文: e-print是一个gzip压缩的.tex文件
+        # 按上限读取解压结果，不把压缩炸弹整个解压到内存
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+                content = f.read(MAX_SOURCE_BYTES + 1)
+        except (OSError, EOFError):
+            content = data[:MAX_SOURCE_BYTES + 1]
+        if len(content) > MAX_SOURCE_BYTES or b'\\documentclass' not in content:
+            return False
+        (root / 'main.tex').write_bytes(content)
+        return True
+    
+    extracted = 0
+    total_size = 0
+    with tar:
+        for i, member in enumerate(tar):
+            if i >= MAX_SOURCE_MEMBERS:
+                tqdm.write("⚠️ e-print文件数过多，停止解包")
+                break
+            if not member.isfile() or not member.name.lower().endswith('.tex'):
+                continue
+            
+            target = root / member.name
+            if os.path.isabs(member.name) or not _is_within(root, target):
+                tqdm.write(f"⚠️ 跳过不安全的路径: {member.name}")
+                continue
+            
+            total_size += member.size
+            if total_size > MAX_SOURCE_BYTES:
+                tqdm.write("⚠️ e-print过大，停止解包")
+                break
+            
+            source = tar.extractfile(member)
+            if source is None:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(source.read())
+            extracted += 1
+    
+    return extracted > 0
+
+
+def find_main_tex(root_dir: str) -> Optional[Path]:
+    """
+    Locate the main .tex file of an unpacked source tree.
+    
+    Args:
+        root_dir: Directory the source was unpacked into
+        
+    Returns:
+        Path to the main file, or None if not found
+    """
+    candidates = []
+    for path in Path(root_dir).rglob('*.tex'):
+        content = path.read_text(encoding='utf-8', errors='ignore')
+        if '\\documentclass' in content and '\\begin{document}' in content:
+            candidates.append(path)
+    
+    if not candidates:
+        return None
+    
+    for name in MAIN_TEX_NAMES:
+        for path in candidates:
+            if path.name.lower() == name:
+                return path
+    
+    # 否则取最大的那个
+    return max(candidates, key=lambda p: p.stat().st_size)
+
+
+def strip_comments(tex: str) -> str:
+    """Remove LaTeX comments (unescaped % to end of line)."""
+    tex = re.sub(r'\\begin\{comment\}.*?\\end\{comment\}', '', tex, flags=re.DOTALL)
+    return re.sub(r'(?<!\\)%.*', '', tex)
+
+
+def resolve_inputs(tex_path: Path, root_dir: str, depth: int = 0) -> str:
+    """
+    Read a .tex file and inline its \\input / \\include / \\subfile directives.
+    
+    Args:
+        tex_path: File to read
+        root_dir: Root of the source tree; files outside it are never read
+        depth: Current recursion depth
+        
+    Returns:
+        The file content with all resolvable inputs inlined
+    """
+    root = Path(root_dir)
+    tex = strip_comments(tex_path.read_text(encoding='utf-8', errors='ignore'))
+    
+    if depth >= MAX_INPUT_DEPTH:
+        return tex
+    
+    def replace_input(match):
+        name = match.group(1).strip()
+        if not name.endswith('.tex'):
+            name += '.tex'
+        # 路径既可能相对于主文件目录，也可能相对于当前文件
+        for base in (root, tex_path.parent):
+            target = base / name
+            if target.is_file() and _is_within(root, target):
+                return resolve_inputs(target, root_dir, depth + 1)
+        return ''
+    
+    return re.sub(r'\\(?:input|include|subfile)\s*\{([^}]+)\}', replace_input, tex)
+
+
+def latex_to_text(tex: str) -> str:
+    """
+    Convert LaTeX source to clean, section-labelled plain text.
+    
+    Args:
+        tex: LaTeX source with inputs already resolved
+        
+    Returns:
+        Plain text with "## Section" style headers
+    """
+    tex = strip_comments(tex)
+    
+    # 只保留正文
+    body = re.search(r'\\begin\{document\}(.*?)(?:\\end\{document\}|$)', tex, re.DOTALL)
+    if body:
+        tex = body.group(1)
+    
+    # 丢弃参考文献之后的内容
+    tex = re.split(r'\\bibliography\{|\\begin\{thebibliography\}|\\printbibliography', tex)[0]
+    
+    for env in _DROP_ENVIRONMENTS:
+        env_re = re.escape(env)
+        tex = re.sub(rf'\\begin\{{{env_re}\}}.*?\\end\{{{env_re}\}}', '', tex, flags=re.DOTALL)
+    
+    # 命令名后不能紧跟字母，避免 \cite 匹配到 \citet、\citeauthor
+    for command in _DROP_COMMANDS:
+        tex = re.sub(rf'\\{command}(?![A-Za-z])\*?\s*(?:\[[^\]]*\])*\s*(?:\{{[^{{}}]*\}})?', '', tex)
+    
+    # 格式化命令只保留参数内容，循环处理嵌套；在识别章节标题之前展开，标题中的 \emph{...} 不影响匹配
+    keep_re = re.compile(rf'\\(?:{"|".join(_KEEP_ARG_COMMANDS)})(?![A-Za-z])\*?\s*\{{([^{{}}]*)\}}')
+    previous = None
+    while previous != tex:
+        previous = tex
+        tex = keep_re.sub(r'\1', tex)
+    
+    # 章节标题（允许一层嵌套的花括号，如未识别的宏参数）
+    tex = re.sub(r'\\begin\{abstract\}', '\n## Abstract\n', tex)
+    tex = re.sub(r'\\end\{abstract\}', '\n', tex)
+    for command, marker in _SECTION_LEVELS.items():
+        tex = re.sub(rf'\\{command}\*?\s*(?:\[[^\]]*\])?\s*\{{((?:[^{{}}]|\{{[^{{}}]*\}})*)\}}',
+                     rf'\n{marker} \1\n', tex)
+    tex = re.sub(r'\\appendix', '\n## Appendix\n', tex)
+    
+    tex = re.sub(r'\\item\s*(?:\[[^\]]*\])?', '\n- ', tex)
+    tex = re.sub(r'\\(?:begin|end)\{[^}]*\}(?:\[[^\]]*\])?', '\n', tex)
+    tex = re.sub(r'\\\\|\\newline', '\n', tex)
+    tex = re.sub(r'~', ' ', tex)
+    tex = re.sub(r'\\([%&$#_])', r'\1', tex)
+    # 剩余的命令（如 \centering、\maketitle），参数内容由下面去括号保留
+    tex = re.sub(r'\\[a-zA-Z]+\*?\s?', '', tex)
+    tex = tex.replace('{', '').replace('}', '')
+    
+    tex = re.sub(r'[ \t]+', ' ', tex)
+    tex = re.sub(r'\n\s*\n+', '\n\n', tex)
+    return tex.strip()
+
+
+def extract_text_from_latex_source(arxiv_id: str) -> str:
+    """
+    Fetch an arXiv paper's LaTeX source and convert it to plain text.
+    
+    The e-print is unpacked in a temporary directory that is removed afterwards.
+    
+    Args:
+        arxiv_id: arXiv identifier
+        
+    Returns:
+        Section-labelled plain text, or empty string if no usable source exists
+    """
+    data = download_paper_source(arxiv_id)
+    if not data:
+        return ""
+    
+    try:
+        with tempfile.TemporaryDirectory(prefix='survey_agent_eprint_') as tmp_dir:
+            if not unpack_source(data, tmp_dir):
+                tqdm.write(f"ℹ️ e-print中没有可用的.tex文件: {arxiv_id}")
+                return ""
+            
+            main_tex = find_main_tex(tmp_dir)
+            if main_tex is None:
+                tqdm.write(f"ℹ️ 没有找到LaTeX主文件: {arxiv_id}")
+                return ""
+            
+            text = latex_to_text(resolve_inputs(main_tex, tmp_dir))
+            tqdm.write(f"✅ 从LaTeX源码提取文本: {arxiv_id} ({len(text)} 字符)")
+            return text
+    except Exception as e:
+        tqdm.write(f"❌ 解析LaTeX源码时出错: {arxiv_id} - {e}")
+        return ""
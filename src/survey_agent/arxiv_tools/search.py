@@ -4,6 +4,8 @@ from fuzzywuzzy import fuzz
 import time
 import signal
 
+from ..utils.paper import Paper
+
 def search_papers_by_terms(terms: List[str], max_results: int = 100, logic: str = "AND", date: Optional[str] = None, date_range: Optional[List[str]] = None, multi_terms: Optional[List[List[str]]] = None) -> List[Any]:
     """
     Search for papers on arXiv based on a list of terms.
@@ -17,7 +19,7 @@ def search_papers_by_terms(terms: List[str], max_results: int = 100, logic: str
         multi_terms: List of term groups, generates all combinations (Cartesian product)
         
     Returns:
-        List of paper dictionaries
+        List of Paper records
     """
     client = arxiv.Client()
     
@@ -77,7 +79,7 @@ def search_papers_by_terms(terms: List[str], max_results: int = 100, logic: str
         for result in all_results:
             if result.entry_id not in seen_urls:
                 seen_urls.add(result.entry_id)
-                unique_results.append(result)
+                unique_results.append(Paper.from_arxiv_result(result))
         
         return unique_results
         
@@ -113,7 +115,7 @@ def search_papers_by_terms(terms: List[str], max_results: int = 100, logic: str
             sort_by=arxiv.SortCriterion.SubmittedDate
         )
         
-        results = list(client.results(search))
+        results = [Paper.from_arxiv_result(result) for result in client.results(search)]
         return results
 
 def search_paper_by_title(paper_title: str, timeout: int = 30) -> Optional[Any]:
@@ -125,7 +127,7 @@ def search_paper_by_title(paper_title: str, timeout: int = 30) -> Optional[Any]:
         timeout: Timeout in seconds for the search
         
     Returns:
-        Paper object if found, None otherwise
+        Paper record if found, None otherwise
     """
     # Clean up title for search
     tidy_title = paper_title.replace(':', '').strip()
@@ -148,7 +150,7 @@ def search_paper_by_title(paper_title: str, timeout: int = 30) -> Optional[Any]:
         
         # Find the best match using fuzzy matching
         best_match = max(results, key=lambda result: fuzz.ratio(paper_title.lower(), result.title.lower()))
-        return best_match
+        return Paper.from_arxiv_result(best_match)
         
     except TimeoutError:
         print(f"   ⏰ 搜索超时 ({timeout}秒)")
@@ -175,7 +177,7 @@ def search_papers(terms=None, titles=None, max_results=100, logic="AND", date=No
         multi_terms: List of term groups, each group uses OR internally, groups use AND between them
         
     Returns:
-        List of paper objects
+        List of Paper records
     """
     results = []
     date_info = ""
@@ -0,0 +1,4 @@
+import os
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("BASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SURVEY_AGENT_LLM_MODEL", "gpt-4o-mini")
@@ -1,5 +1,6 @@
 import datetime
 from pyarrow import timestamp
+import asyncio
 import streamlit as st
 import os
 import time
@@ -10,8 +11,11 @@ sys.path.append('/mnt/bn/chenguoqing-lf/code/survey_agent/src')
 
 from survey_agent.survey.generator import generate_survey, generate_markdown
 from survey_agent.arxiv_tools.search import search_papers
-from survey_agent.arxiv_tools.download import process_paper
-from survey_agent.llm.summarize import get_summarizer
+from survey_agent.arxiv_tools.download import process_paper, wait_for_pdf_writes
+from survey_agent.llm.summarize import get_summarizer, summarize_papers_async, DEFAULT_ASYNC_CONCURRENCY
+from survey_agent.utils.cache import get_paper_cache
+from survey_agent.llm.rate_limit import get_rate_limit_stats
+from survey_agent.llm.resilience import get_circuit_stats
 
 from survey_agent.env import *
 import uuid
@@ -26,12 +30,13 @@ st.markdown("""
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def process_papers_parallel(papers, process_paper, progress_placeholder, paper_list_placeholder, max_workers=4):
+def process_papers_parallel(papers, process_paper, progress_placeholder, paper_list_placeholder, max_workers=4,
+                            in_memory=False, persist_pdf=True, use_latex=False):
     processed_papers = [None] * len(papers)  # Pre-allocate list to maintain order
     
     def process_with_progress(idx_paper):
         idx, paper = idx_paper
-        result = process_paper(paper)
+        result = process_paper(paper, in_memory=in_memory, persist_pdf=persist_pdf, use_latex=use_latex, spill_text=True)
         return idx, result
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -54,30 +59,51 @@ def process_papers_parallel(papers, process_paper, progress_placeholder, paper_l
     
     return [p for p in processed_papers if p is not None]
 
-def summarize_papers_parallel(processed_papers, summarizer, progress_placeholder, paper_list_placeholder, max_workers=4):
+def summarize_papers_parallel(processed_papers, summarizer, progress_placeholder, paper_list_placeholder, concurrency=DEFAULT_ASYNC_CONCURRENCY, stream_placeholder=None):
     summarized_papers = [None] * len(processed_papers)  # Pre-allocate list to maintain order
     
-    def summarize_with_progress(idx_paper):
-        idx, paper = idx_paper
-        paper['llm_summary_res'] = summarizer.summarize(paper)
-        return idx, paper
+    partial_summaries = {}  # 正在流式生成的论文 -> 已收到的文本
+    last_render = [0.0]
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(summarize_with_progress, (i, paper)) 
-                  for i, paper in enumerate(processed_papers)]
+    def render_partial_summaries(force=False):
+        # 流式片段到达很频繁，限制页面刷新频率
+        if stream_placeholder is None or (not force and time.time() - last_render[0] < 0.3):
+            return
+        last_render[0] = time.time()
+        stream_placeholder.markdown(
+            "\n\n".join([
+                f"#### ✍️ {processed_papers[i]['title']}\n\n{text}"
+                for i, text in partial_summaries.items()
+            ])
+        )
+    
+    def on_chunk(idx, chunk):
+        partial_summaries[idx] = partial_summaries.get(idx, '') + chunk
+        render_partial_summaries()
+    
+    def on_result(idx, summary):
+        # 在事件循环所在的脚本线程中回调，可以直接更新页面
+        paper = processed_papers[idx]
+        paper['llm_summary_res'] = summary
+        summarized_papers[idx] = paper
+        if partial_summaries.pop(idx, None) is not None:
+            render_partial_summaries(force=True)
         
-        for future in as_completed(futures):
-            idx, result = future.result()
-            summarized_papers[idx] = result
-            
-            # Update progress display
-            progress_placeholder.info(f"LLM 总结中 {sum(1 for p in summarized_papers if p is not None)}/{len(processed_papers)}")
-            paper_list_placeholder.markdown(
-                "\n".join([
-                    f"- {'✨ ' if summarized_papers[i] is not None else '📥 '}{processed_papers[i]['title']}" 
-                    for i in range(len(processed_papers))
-                ])
-            )
+        # Update progress display
+        progress_placeholder.info(f"LLM 总结中 {sum(1 for p in summarized_papers if p is not None)}/{len(processed_papers)}")
+        paper_list_placeholder.markdown(
+            "\n".join([
+                f"- {'✨ ' if summarized_papers[i] is not None else '📥 '}{processed_papers[i]['title']}" 
+                for i in range(len(processed_papers))
+            ])
+        )
+    
+    asyncio.run(summarize_papers_async(
+        summarizer, processed_papers, concurrency, on_result=on_result,
+        on_chunk=on_chunk if stream_placeholder is not None else None
+    ))
+    if stream_placeholder is not None:
+        stream_placeholder.empty()
     
     return [p for p in summarized_papers if p is not None]
 
@@ -92,6 +118,9 @@ with st.form("query_form"):
     # model_name = st.text_input("LLM 模型名", "glm-4-air")
     default_model = os.environ.get("SURVEY_AGENT_LLM_MODEL", "None")
     model_name = st.selectbox("LLM 模型名", [default_model])
+    in_memory = st.checkbox("PDF 在内存中解析", value=False, help="下载到内存后直接提取文本，不再从磁盘重新打开")
+    persist_pdf = st.checkbox("保存 PDF 到磁盘", value=True, help="内存解析时是否在后台把PDF写入PDF目录")
+    use_latex = st.checkbox("优先使用 LaTeX 源码", value=False, help="优先从arXiv的LaTeX源码提取正文，没有源码时使用PDF")
     submitted = st.form_submit_button("开始生成综述")
 
 progress_placeholder = st.empty()
@@ -109,14 +138,15 @@ if submitted:
     )
     
     # 修改原始代码部分
-    processed_papers = process_papers_parallel(papers, process_paper, progress_placeholder, paper_list_placeholder)
+    processed_papers = process_papers_parallel(papers, process_paper, progress_placeholder, paper_list_placeholder,
+                                               in_memory=in_memory, persist_pdf=persist_pdf, use_latex=use_latex)
     progress_placeholder.info("正在调用 LLM 生成总结...")
     # summarizer = get_summarizer(llm_provider, model_name)
     if model_name != "None":
         summarizer = get_summarizer(llm_provider, model_name)
     else:
         summarizer = get_summarizer(llm_provider)
-    processed_papers = summarize_papers_parallel(processed_papers, summarizer, progress_placeholder, paper_list_placeholder)   
+    processed_papers = summarize_papers_parallel(processed_papers, summarizer, progress_placeholder, paper_list_placeholder, stream_placeholder=summary_placeholder)
         
     progress_placeholder.success("全部论文处理完成，正在生成 markdown...")
     uuid = str(uuid.uuid4())
@@ -124,6 +154,8 @@ if submitted:
     base_path = '/mnt/bn/chenguoqing-lf/code/survey_agent/output/streamlite'
     output_md = f"{base_path}/survey_result_{timestamp}.md"
     markdown_content = generate_markdown(processed_papers, output_md, terms)
+    # 内存模式下PDF在后台落盘
+    wait_for_pdf_writes()
     # 分割条
     
     summary_placeholder.markdown("### 综述 Markdown 预览")
@@ -136,4 +168,36 @@ if submitted:
     download_placeholder.markdown("### 下载结果")
     st.download_button("下载 Markdown 文件", markdown_content, file_name="survey_result.md")
     st.download_button("下载 HTML 文件", html_content, file_name="survey_result.html")
-    progress_placeholder.success("🎉 综述已生成！") 
\ No newline at end of file
+    progress_placeholder.success("🎉 综述已生成！") 
+
+# 侧边栏：缓存统计（放在脚本末尾，每次运行后显示最新的计数）
+cache_stats = get_paper_cache().get_cache_stats()
+cache_counters = cache_stats['counters']['total']
+with st.sidebar.expander("📊 摘要缓存统计", expanded=False):
+    st.metric("命中率", f"{cache_counters['hit_rate']:.0%}",
+              help=f"命中 {cache_counters['hits']} 次（内存层 {cache_counters['memory_hits']} 次），未命中 {cache_counters['misses']} 次")
+    st.metric("节省的LLM时间", f"{cache_counters['llm_seconds_saved']:.1f} 秒")
+    st.metric("节省的Token", f"{cache_counters['tokens_saved']:,}")
+    st.caption(
+        f"内容变化失效 {cache_counters['invalidations']} 次 · "
+        f"读取 {cache_counters['bytes_read'] / 1024:.1f} KB · 写入 {cache_counters['bytes_written'] / 1024:.1f} KB · "
+        f"缓存条目 {cache_stats['total_entries']} · {cache_stats['cache_size_mb']} MB"
+    )
+    if cache_stats['counters']['by_model']:
+        st.table([
+            {"模型": model, "命中": c['hits'], "未命中": c['misses'], "失效": c['invalidations'],
+             "节省秒数": c['llm_seconds_saved'], "节省Token": c['tokens_saved']}
+            for model, c in cache_stats['counters']['by_model'].items()
+        ])
+
+# 侧边栏：各LLM端点当前的自适应并发上限
+rate_limit_stats = get_rate_limit_stats()
+circuit_stats = get_circuit_stats()
+if rate_limit_stats:
+    with st.sidebar.expander("⚡ LLM 并发控制", expanded=False):
+        for endpoint, limiter_stats in rate_limit_stats.items():
+            circuit_state = circuit_stats.get(endpoint, {}).get('state', 'closed')
+            st.caption(
+                f"{endpoint.split('|')[-1]}: 并发上限 {limiter_stats['limit']} · 进行中 {limiter_stats['in_flight']} · "
+                f"过载 {limiter_stats['overloads']} 次 · 降速 {limiter_stats['decreases']} 次 · 熔断器 {circuit_state}"
+            )
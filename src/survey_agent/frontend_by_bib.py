@@ -1,3 +1,4 @@
+import asyncio
 import streamlit as st
 import os
 import time
@@ -7,11 +8,15 @@ import arxiv
 import re
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from survey_agent.arxiv_tools.download import process_paper
+from survey_agent.arxiv_tools.download import process_paper, wait_for_pdf_writes
 from survey_agent.survey.generator import generate_survey_from_bib
 from survey_agent.utils.bib_parser import BibParser
-from survey_agent.llm.summarize import get_summarizer
+from survey_agent.llm.summarize import get_summarizer, summarize_papers_async, DEFAULT_ASYNC_CONCURRENCY
 from survey_agent.survey.generator import generate_markdown
+from survey_agent.utils.paper import Paper
+from survey_agent.utils.cache import get_paper_cache
+from survey_agent.llm.rate_limit import get_rate_limit_stats
+from survey_agent.llm.resilience import get_circuit_stats
 
 # 设置环境变量
 from survey_agent.env import *
@@ -45,7 +50,7 @@ def fetch_arxiv_paper_parallel(arxiv_ids, progress_placeholder, paper_list_place
             search = arxiv.Search(id_list=[arxiv_id])
             results = list(client.results(search))
             if results:
-                return idx, results[0]
+                return idx, Paper.from_arxiv_result(results[0])
             else:
                 return idx, None
         except Exception as e:
@@ -116,13 +121,15 @@ def search_papers_by_title_parallel(entries_without_arxiv, progress_placeholder,
     # Filter out None results
     return [p for p in found_papers if p is not None]
 
-def process_papers_parallel(papers, progress_placeholder, paper_list_placeholder, pdf_dir=None, max_workers=4):
+def process_papers_parallel(papers, progress_placeholder, paper_list_placeholder, pdf_dir=None, max_workers=4,
+                            in_memory=False, persist_pdf=True, use_latex=False):
     """并行处理论文：下载PDF并提取文本"""
     processed_papers = [None] * len(papers)  # Pre-allocate list to maintain order
     
     def process_with_progress(idx_paper):
         idx, paper = idx_paper
-        result = process_paper(paper, pdf_dir)
+        result = process_paper(paper, pdf_dir, in_memory=in_memory, persist_pdf=persist_pdf, use_latex=use_latex,
+                               spill_text=True)
         return idx, result
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -145,31 +152,52 @@ def process_papers_parallel(papers, progress_placeholder, paper_list_placeholder
     
     return [p for p in processed_papers if p is not None]
 
-def summarize_papers_parallel(processed_papers, summarizer, progress_placeholder, paper_list_placeholder, max_workers=4):
-    """并行生成论文总结"""
+def summarize_papers_parallel(processed_papers, summarizer, progress_placeholder, paper_list_placeholder, concurrency=DEFAULT_ASYNC_CONCURRENCY, stream_placeholder=None):
+    """并发生成论文总结（异步请求，最多 concurrency 个同时进行）"""
     summarized_papers = [None] * len(processed_papers)  # Pre-allocate list to maintain order
     
-    def summarize_with_progress(idx_paper):
-        idx, paper = idx_paper
-        paper['llm_summary_res'] = summarizer.summarize(paper)
-        return idx, paper
+    partial_summaries = {}  # 正在流式生成的论文 -> 已收到的文本
+    last_render = [0.0]
+    
+    def render_partial_summaries(force=False):
+        # 流式片段到达很频繁，限制页面刷新频率
+        if stream_placeholder is None or (not force and time.time() - last_render[0] < 0.3):
+            return
+        last_render[0] = time.time()
+        stream_placeholder.markdown(
+            "\n\n".join([
+                f"#### ✍️ {processed_papers[i]['title']}\n\n{text}"
+                for i, text in partial_summaries.items()
+            ])
+        )
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(summarize_with_progress, (i, paper)) 
-                  for i, paper in enumerate(processed_papers)]
+    def on_chunk(idx, chunk):
+        partial_summaries[idx] = partial_summaries.get(idx, '') + chunk
+        render_partial_summaries()
+    
+    def on_result(idx, summary):
+        # 在事件循环所在的脚本线程中回调，可以直接更新页面
+        paper = processed_papers[idx]
+        paper['llm_summary_res'] = summary
+        summarized_papers[idx] = paper
+        if partial_summaries.pop(idx, None) is not None:
+            render_partial_summaries(force=True)
         
-        for future in as_completed(futures):
-            idx, result = future.result()
-            summarized_papers[idx] = result
-            
-            # Update progress display
-            progress_placeholder.info(f"✨ LLM 总结中 {sum(1 for p in summarized_papers if p is not None)}/{len(processed_papers)}")
-            paper_list_placeholder.markdown(
-                "\n".join([
-                    f"- {'✨ ' if summarized_papers[i] is not None else '📥 '}{processed_papers[i]['title']}" 
-                    for i in range(len(processed_papers))
-                ])
-            )
+        # Update progress display
+        progress_placeholder.info(f"✨ LLM 总结中 {sum(1 for p in summarized_papers if p is not None)}/{len(processed_papers)}")
+        paper_list_placeholder.markdown(
+            "\n".join([
+                f"- {'✨ ' if summarized_papers[i] is not None else '📥 '}{processed_papers[i]['title']}" 
+                for i in range(len(processed_papers))
+            ])
+        )
+    
+    asyncio.run(summarize_papers_async(
+        summarizer, processed_papers, concurrency, on_result=on_result,
+        on_chunk=on_chunk if stream_placeholder is not None else None
+    ))
+    if stream_placeholder is not None:
+        stream_placeholder.empty()
     
     return [p for p in summarized_papers if p is not None]
 
@@ -181,7 +209,12 @@ def generate_survey_from_bib_parallel(bib_file: str,
                                     pdf_dir: str = None,
                                     progress_placeholder=None,
                                     paper_list_placeholder=None,
-                                    max_workers: int = 4) -> str:
+                                    max_workers: int = 4,
+                                    concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+                                    stream_placeholder=None,
+                                    in_memory: bool = False,
+                                    persist_pdf: bool = True,
+                                    use_latex: bool = False) -> str:
     """
     并行版本的从BIB文件生成综述函数，支持通过标题搜索没有arXiv ID的条目
     """
@@ -245,7 +278,8 @@ def generate_survey_from_bib_parallel(bib_file: str,
         progress_placeholder.info("📥 正在下载PDFs和提取文本...")
     
     processed_papers = process_papers_parallel(
-        all_papers, progress_placeholder, paper_list_placeholder, pdf_dir, max_workers
+        all_papers, progress_placeholder, paper_list_placeholder, pdf_dir, max_workers,
+        in_memory=in_memory, persist_pdf=persist_pdf, use_latex=use_latex
     )
     
     if not processed_papers:
@@ -259,11 +293,14 @@ def generate_survey_from_bib_parallel(bib_file: str,
     
     summarizer = get_summarizer(llm_provider, model_name, custom_prompt)
     summarized_papers = summarize_papers_parallel(
-        processed_papers, summarizer, progress_placeholder, paper_list_placeholder, max_workers
+        processed_papers, summarizer, progress_placeholder, paper_list_placeholder, concurrency,
+        stream_placeholder=stream_placeholder
     )
     
     
     markdown_content = generate_markdown(summarized_papers, output_file, bib_file=bib_file)
+    # 内存模式下PDF在后台落盘
+    wait_for_pdf_writes()
     
     if progress_placeholder:
         progress_placeholder.success("🎉 综述生成完成！")
@@ -290,6 +327,11 @@ model_name = st.sidebar.selectbox("🤖 LLM 模型", ["ep-20250529110941-khvtx",
 # 并行处理设置
 max_workers = st.sidebar.slider("🔧 并行处理线程数", min_value=1, max_value=8, value=4, 
                                help="增加线程数可以加快处理速度，但会消耗更多系统资源")
+llm_concurrency = st.sidebar.slider("⚡ LLM 并发请求数", min_value=1, max_value=200, value=DEFAULT_ASYNC_CONCURRENCY,
+                                    help="同时进行的LLM总结请求数，受服务商速率限制约束")
+in_memory = st.sidebar.checkbox("📄 PDF 在内存中解析", value=False, help="下载到内存后直接提取文本，不再从磁盘重新打开")
+persist_pdf = st.sidebar.checkbox("💾 保存 PDF 到磁盘", value=True, help="内存解析时是否在后台把PDF写入PDF目录")
+use_latex = st.sidebar.checkbox("📜 优先使用 LaTeX 源码", value=False, help="优先从arXiv的LaTeX源码提取正文，没有源码时使用PDF")
 
 # 主界面
 col1, col2 = st.columns([1, 1])
@@ -580,7 +622,12 @@ if submitted:
                 pdf_dir="pdfs/",
                 progress_placeholder=progress_placeholder,
                 paper_list_placeholder=paper_list_placeholder,
-                max_workers=max_workers
+                max_workers=max_workers,
+                concurrency=llm_concurrency,
+                stream_placeholder=summary_placeholder,
+                in_memory=in_memory,
+                persist_pdf=persist_pdf,
+                use_latex=use_latex
             )
             
             if output_path and Path(output_path).exists():
@@ -691,8 +738,8 @@ with st.expander("📖 使用说明"):
     - `{abstract}` - 论文总结
     - `{authors}` - 作者信息
     - `{year}` - 发表年份
-    - `{pdf_text}` - 论文全文(截断版，约10000字符)
-    - `{full_pdf_text}` - 论文全文(完整版)
+    - `{pdf_text}` - 论文全文(按token截断，最多2500 token，优先丢弃参考文献、附录等章节)
+    - `{full_pdf_text}` - 论文全文(使用剩余的全部 prompt 预算，超出模型上下文时同样按章节裁剪)
     
     ### ⚠️ 注意事项
     
@@ -707,3 +754,35 @@ with st.expander("📖 使用说明"):
 # 页脚
 st.markdown("---")
 st.markdown("💡 **提示**: 现在支持智能论文识别和全流程并行处理！采用多层搜索策略提高论文匹配成功率，并优化HTML输出格式，让综述内容更完整、更美观。")
+
+# 侧边栏：缓存统计（放在脚本末尾，每次运行后显示最新的计数）
+cache_stats = get_paper_cache().get_cache_stats()
+cache_counters = cache_stats['counters']['total']
+with st.sidebar.expander("📊 摘要缓存统计", expanded=False):
+    st.metric("命中率", f"{cache_counters['hit_rate']:.0%}",
+              help=f"命中 {cache_counters['hits']} 次（内存层 {cache_counters['memory_hits']} 次），未命中 {cache_counters['misses']} 次")
+    st.metric("节省的LLM时间", f"{cache_counters['llm_seconds_saved']:.1f} 秒")
+    st.metric("节省的Token", f"{cache_counters['tokens_saved']:,}")
+    st.caption(
+        f"内容变化失效 {cache_counters['invalidations']} 次 · "
+        f"读取 {cache_counters['bytes_read'] / 1024:.1f} KB · 写入 {cache_counters['bytes_written'] / 1024:.1f} KB · "
+        f"缓存条目 {cache_stats['total_entries']} · {cache_stats['cache_size_mb']} MB"
+    )
+    if cache_stats['counters']['by_model']:
+        st.table([
+            {"模型": model, "命中": c['hits'], "未命中": c['misses'], "失效": c['invalidations'],
+             "节省秒数": c['llm_seconds_saved'], "节省Token": c['tokens_saved']}
+            for model, c in cache_stats['counters']['by_model'].items()
+        ])
+
+# 侧边栏：各LLM端点当前的自适应并发上限
+rate_limit_stats = get_rate_limit_stats()
+circuit_stats = get_circuit_stats()
+if rate_limit_stats:
+    with st.sidebar.expander("⚡ LLM 并发控制", expanded=False):
+        for endpoint, limiter_stats in rate_limit_stats.items():
+            circuit_state = circuit_stats.get(endpoint, {}).get('state', 'closed')
+            st.caption(
+                f"{endpoint.split('|')[-1]}: 并发上限 {limiter_stats['limit']} · 进行中 {limiter_stats['in_flight']} · "
+                f"过载 {limiter_stats['overloads']} 次 · 降速 {limiter_stats['decreases']} 次 · 熔断器 {circuit_state}"
+            )
@@ -1 +1,2 @@
-from .summarize import get_summarizer, LLMSummarizer, OpenAISummarizer 
\ No newline at end of file
+from .summarize import get_summarizer, LLMSummarizer, OpenAISummarizer
+from .resilience import SummaryFailure
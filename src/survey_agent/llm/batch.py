@@ -0,0 +1,280 @@
+"""Offline bulk summarization through the OpenAI-compatible batch API."""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .summarize import OpenAISummarizer
+from ..utils.cache import CACHE_DIR_ENV, get_paper_cache
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# 状态为这些值的批次不会再变化
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+# OpenAI 单个批次最多 50000 个请求、输入文件最大 200MB
+MAX_REQUESTS_PER_BATCH = 50000
+MAX_BATCH_BYTES = 100 * 1024 * 1024
+
+
+class BatchSummarizer:
+    """
+    Summarize papers with provider batch jobs and fill the summary cache.
+    """
+
+    def __init__(self, summarizer: OpenAISummarizer,
+                 job_dir: Optional[str] = None,
+                 poll_interval: float = 60.0,
+                 completion_window: str = "24h",
+                 max_requests_per_batch: int = MAX_REQUESTS_PER_BATCH,
+                 max_batch_bytes: int = MAX_BATCH_BYTES):
+        """
+        Initialize the batch summarizer.
+
+        Args:
+            summarizer: OpenAI-compatible summarizer providing the client,
+                model, prompt and cache variant
+            job_dir: Directory for manifests and batch files, defaults to <cache dir>/batches
+            poll_interval: Seconds between status checks
+            completion_window: Completion window requested from the provider
+            max_requests_per_batch: Split jobs into batches of at most this many requests
+            max_batch_bytes: Split jobs into batches of at most this many bytes
+        """
+        if summarizer.provider != "openai":
+            raise ValueError(f"Batch mode requires an OpenAI-compatible batch API (provider: {summarizer.provider})")
+        self.summarizer = summarizer
+        self.client = summarizer.client
+        self.job_dir = os.path.abspath(job_dir or os.path.join(os.environ.get(CACHE_DIR_ENV, "cache"), "batches"))
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_requests_per_batch = max_requests_per_batch
+        self.max_batch_bytes = max_batch_bytes
+
+    def _manifest_path(self, job_name: str) -> str:
+        return os.path.join(self.job_dir, job_name, "manifest.json")
+
+    def _load_manifest(self, job_name: str) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path(job_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {
+                'job_name': job_name,
+                'created_at': datetime.now().isoformat(),
+                'variant': self.summarizer.get_cache_variant(),
+                'batches': [],
+            }
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        path = self._manifest_path(manifest['job_name'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        manifest['updated_at'] = datetime.now().isoformat()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def default_job_name(custom_ids: List[str]) -> str:
+        """Job name derived from the requests, so rerunning with the same papers resumes the job."""
+        return "job-" + hashlib.sha256("\n".join(sorted(custom_ids)).encode('utf-8')).hexdigest()[:16]
+
+    def _pending_requests(self, papers: List[Dict[str, Any]], refresh: bool) -> Dict[str, Dict[str, Any]]:
+        """Map custom_id -> {'paper', 'prompt'} for papers without a cached summary."""
+        requests = {}
+        for paper in papers:
+            _, prompt, _, cache_key, map_reduce = self.summarizer._prepare(paper, refresh)
+            # 无法确定论文ID的论文不能写入缓存，需要分块总结的长论文也留给交互式总结
+            if prompt is not None and cache_key and not map_reduce:
+                requests[cache_key] = {'paper': paper, 'prompt': prompt}
+        return requests
+
+    def _split(self, lines: Dict[str, bytes]) -> List[List[str]]:
+        """Group custom_ids into batches within the request and size limits."""
+        groups, current, size = [], [], 0
+        for custom_id, line in lines.items():
+            if current and (len(current) >= self.max_requests_per_batch or size + len(line) > self.max_batch_bytes):
+                groups.append(current)
+                current, size = [], 0
+            current.append(custom_id)
+            size += len(line)
+        if current:
+            groups.append(current)
+        return groups
+
+    def _submit(self, manifest: Dict[str, Any], requests: Dict[str, Dict[str, Any]]):
+        """Write, upload and create batches for the given requests."""
+        lines = {}
+        for custom_id, request in requests.items():
+            line = {
+                'custom_id': custom_id,
+                'method': 'POST',
+                'url': BATCH_ENDPOINT,
+                'body': self.summarizer._openai_request(request['prompt']),
+            }
+            lines[custom_id] = (json.dumps(line, ensure_ascii=False) + "\n").encode('utf-8')
+
+        job_path = os.path.dirname(self._manifest_path(manifest['job_name']))
+        os.makedirs(job_path, exist_ok=True)
+        for custom_ids in self._split(lines):
+            input_path = os.path.join(job_path, f"input-{len(manifest['batches']):03d}.jsonl")
+            with open(input_path, 'wb') as f:
+                f.writelines(lines[custom_id] for custom_id in custom_ids)
+
+            with open(input_path, 'rb') as f:
+                input_file = self.client.files.create(file=f, purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=self.completion_window,
+                metadata={'job': manifest['job_name']},
+            )
+            manifest['batches'].append({
+                'id': batch.id,
+                'input_file': os.path.basename(input_path),
+                'input_file_id': input_file.id,
+                'custom_ids': custom_ids,
+                'status': batch.status,
+                'submitted_at': datetime.now().isoformat(),
+                'collected': False,
+            })
+            # 每提交一个批次就保存清单，中断后不会重复提交
+            self._save_manifest(manifest)
+            print(f"📤 已提交批次 {batch.id} ({len(custom_ids)} 个请求)")
+
+    def _refresh_status(self, manifest: Dict[str, Any]) -> bool:
+        """Update the status of unfinished batches; return True when all are finished."""
+        changed = False
+        for entry in manifest['batches']:
+            if entry['status'] in TERMINAL_STATUSES:
+                continue
+            batch = self.client.batches.retrieve(entry['id'])
+            counts = getattr(batch, 'request_counts', None)
+            if counts is not None:
+                entry['request_counts'] = {'completed': counts.completed, 'failed': counts.failed, 'total': counts.total}
+            if batch.status != entry['status']:
+                entry['status'] = batch.status
+                changed = True
+            entry['output_file_id'] = getattr(batch, 'output_file_id', None)
+            entry['error_file_id'] = getattr(batch, 'error_file_id', None)
+        if changed:
+            self._save_manifest(manifest)
+        return all(entry['status'] in TERMINAL_STATUSES for entry in manifest['batches'])
+
+    def _download(self, file_id: str) -> List[Dict[str, Any]]:
+        content = self.client.files.content(file_id)
+        text = content.text if hasattr(content, 'text') else content.read().decode('utf-8')
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def _collect(self, manifest: Dict[str, Any], papers_by_id: Dict[str, Dict[str, Any]], stats: Dict[str, int]):
+        """Write the results of finished batches into the summary cache."""
+        for entry in manifest['batches']:
+            if entry['collected'] or entry['status'] not in TERMINAL_STATUSES:
+                continue
+            records = []
+            for file_id in (entry.get('output_file_id'), entry.get('error_file_id')):
+                if file_id:
+                    records.extend(self._download(file_id))
+
+            answered = set()
+            for record in records:
+                custom_id = record.get('custom_id')
+                answered.add(custom_id)
+                paper = papers_by_id.get(custom_id)
+                if paper is None:
+                    stats['unmatched'] += 1
+                    continue
+                response = record.get('response') or {}
+                body = response.get('body') or {}
+                if response.get('status_code') != 200 or not body.get('choices'):
+                    stats['failed'] += 1
+                    continue
+                content = body['choices'][0].get('message', {}).get('content', '')
+                tokens = (body.get('usage') or {}).get('total_tokens')
+                summary, tokens = self.summarizer._finish((content, tokens))
+                self.summarizer._record(paper, self.summarizer.get_cache_variant(), custom_id, summary, None, tokens)
+                stats['completed' if summary else 'failed'] += 1
+            # 失败、过期或取消的批次中没有结果的请求
+            stats['failed'] += len(set(entry['custom_ids']) - answered)
+
+            entry['collected'] = True
+            entry['collected_at'] = datetime.now().isoformat()
+            self._save_manifest(manifest)
+
+    def run(self, papers: List[Dict[str, Any]], job_name: Optional[str] = None,
+            refresh: bool = False, wait: bool = True) -> Dict[str, int]:
+        """
+        Run (or resume) a batch job for papers without a cached summary.
+
+        Args:
+            papers: Paper dictionaries
+            job_name: Manifest name; defaults to a hash of the requests so the
+                same papers resume the same job
+            refresh: Ignore cached summaries
+            wait: Poll until all batches finish and collect the results;
+                otherwise return after submitting
+
+        Returns:
+            Counts of submitted, completed, failed and unmatched requests
+        """
+        requests = self._pending_requests(papers, refresh)
+        papers_by_id = {custom_id: request['paper'] for custom_id, request in requests.items()}
+        stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'unmatched': 0}
+
+        # 任务名取决于全部论文（而不只是未缓存的），部分结果写入缓存后仍能找到同一个任务
+        if job_name is None:
+            cache = get_paper_cache()
+            variant = self.summarizer.get_cache_variant()
+            job_name = self.default_job_name([key for key in (cache.get_cache_key(paper, variant) for paper in papers) if key])
+        manifest = self._load_manifest(job_name)
+
+        # 已在未结束批次中的请求只轮询，不重复提交
+        in_flight = {custom_id for entry in manifest['batches'] if not entry['collected']
+                     for custom_id in entry['custom_ids']}
+        to_submit = {custom_id: request for custom_id, request in requests.items() if custom_id not in in_flight}
+        if to_submit:
+            self._submit(manifest, to_submit)
+            stats['submitted'] = len(to_submit)
+        if not any(not entry['collected'] for entry in manifest['batches']):
+            print("✅ 所有论文都已有缓存摘要，无需提交批处理任务")
+            return stats
+
+        print(f"🗂️ 批处理任务 {job_name}: {len(requests)} 篇待总结, 新提交 {stats['submitted']} 个请求")
+        if not wait:
+            self._refresh_status(manifest)
+            return stats
+
+        while not self._refresh_status(manifest):
+            pending = [entry for entry in manifest['batches'] if entry['status'] not in TERMINAL_STATUSES]
+            done = sum(entry.get('request_counts', {}).get('completed', 0) for entry in pending)
+            total = sum(len(entry['custom_ids']) for entry in pending)
+            print(f"⏳ {len(pending)} 个批次进行中 ({done}/{total})，{self.poll_interval:.0f}秒后再次查询")
+            time.sleep(self.poll_interval)
+
+        self._collect(manifest, papers_by_id, stats)
+        print(f"📥 批处理完成: 成功 {stats['completed']}, 失败 {stats['failed']}, 未匹配 {stats['unmatched']}")
+        return stats
+
+
+def summarize_papers_batch(papers: List[Dict[str, Any]],
+                           model_name: str = None,
+                           custom_prompt: str = None,
+                           job_dir: Optional[str] = None,
+                           poll_interval: float = 60.0,
+                           refresh: bool = False) -> Dict[str, int]:
+    """
+    Fill the summary cache for papers through a batch job.
+
+    Args:
+        papers: Paper dictionaries
+        model_name: Name of the model to use
+        custom_prompt: Custom prompt template for summarization
+        job_dir: Directory for job manifests
+        poll_interval: Seconds between status checks
+        refresh: Ignore cached summaries
+
+    Returns:
+        Batch job counts
+    """
+    summarizer = OpenAISummarizer(model_name, custom_prompt=custom_prompt)
+    return BatchSummarizer(summarizer, job_dir=job_dir, poll_interval=poll_interval).run(papers, refresh=refresh)
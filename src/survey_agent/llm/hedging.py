@@ -0,0 +1,297 @@
+"""Hedged LLM requests: resend requests slower than the observed latency percentile."""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# 超过该分位的延迟时发送对冲请求
+DEFAULT_HEDGE_PERCENTILE = 95
+# 对冲请求占全部请求的比例上限
+DEFAULT_MAX_HEDGE_RATE = 0.05
+# 统计分位数所用的最近延迟样本数，以及开始对冲前至少需要的样本数
+DEFAULT_LATENCY_WINDOW = 200
+DEFAULT_MIN_SAMPLES = 20
+# 同步对冲请求的线程数上限（失败方也在这些线程中结束）
+DEFAULT_HEDGE_WORKERS = 8
+
+Completion = Tuple[str, Optional[int]]
+
+
+class _Timers:
+    """A single daemon thread that runs delayed callbacks, shared by all policies."""
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> List[Any]:
+        """Schedule callback; returns a handle for cancel."""
+        entry = [time.monotonic() + delay, next(self._sequence), callback]
+        with self._condition:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="llm-hedge-timer", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return entry
+
+    def cancel(self, entry: List[Any]):
+        with self._condition:
+            entry[2] = None
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                callback = heapq.heappop(self._heap)[2]
+            if callback is not None:
+                callback()
+
+
+_timers = _Timers()
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate request, and where.
+    """
+
+    def __init__(self, percentile: float = DEFAULT_HEDGE_PERCENTILE, max_hedge_rate: float = DEFAULT_MAX_HEDGE_RATE,
+                 min_delay: float = 1.0, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 window: int = DEFAULT_LATENCY_WINDOW, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, max_workers: int = DEFAULT_HEDGE_WORKERS):
+        """
+        Initialize the policy.
+
+        Args:
+            percentile: Hedge requests still running after this latency percentile (0-100)
+            max_hedge_rate: Largest fraction of requests that may be hedged
+            min_delay: Never hedge earlier than this many seconds
+            min_samples: Latencies observed before hedging starts
+            window: Number of recent latencies the percentile is computed over,
+                kept separately for every kind of call
+            base_url: Endpoint the hedge request goes to (default: the same endpoint)
+            api_key: API key of the hedge request (default: the same key)
+            max_workers: Threads running synchronous hedge requests
+        """
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.base_url = base_url
+        self.api_key = api_key
+        self.window = window
+        self.max_workers = max_workers
+        # 每类调用（整篇总结、分块、汇总、筛选）的延迟分别统计，短调用不会拉低长调用的分位数
+        self._latencies: Dict[str, deque] = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0, 'hedged': 0, 'rate_capped': 0, 'hedge_wins': 0, 'primary_wins': 0,
+            'cancelled': 0, 'extra_tokens': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional['HedgePolicy']:
+        """
+        Build a policy from the environment.
+
+        SURVEY_AGENT_HEDGE enables hedging; its value is the percentile
+        ("p95" or "95"). SURVEY_AGENT_HEDGE_MAX_RATE, SURVEY_AGENT_HEDGE_BASE_URL
+        and SURVEY_AGENT_HEDGE_API_KEY set the other options.
+
+        Returns:
+            HedgePolicy, or None if hedging is not enabled
+        """
+        value = os.environ.get("SURVEY_AGENT_HEDGE")
+        if not value:
+            return None
+        return cls(
+            percentile=float(value.lower().lstrip('p')),
+            max_hedge_rate=float(os.environ.get("SURVEY_AGENT_HEDGE_MAX_RATE", DEFAULT_MAX_HEDGE_RATE)),
+            base_url=os.environ.get("SURVEY_AGENT_HEDGE_BASE_URL"),
+            api_key=os.environ.get("SURVEY_AGENT_HEDGE_API_KEY"),
+        )
+
+    def observe(self, latency_s: float, kind: str = "default"):
+        """Record the latency of a successful request of the given kind."""
+        with self._lock:
+            window = self._latencies.get(kind)
+            if window is None:
+                window = self._latencies[kind] = deque(maxlen=self.window)
+            window.append(latency_s)
+
+    def hedge_delay(self, kind: str = "default") -> Optional[float]:
+        """Seconds after which a running request of this kind is hedged; None until enough latencies are known."""
+        with self._lock:
+            window = self._latencies.get(kind, ())
+            if len(window) < self.min_samples:
+                return None
+            latencies = sorted(window)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[index])
+
+    def _start(self):
+        with self._lock:
+            self._stats['requests'] += 1
+
+    def _take_hedge(self) -> bool:
+        """Count a hedge if the hedge rate allows one."""
+        with self._lock:
+            if self._stats['hedged'] + 1 > self.max_hedge_rate * self._stats['requests']:
+                self._stats['rate_capped'] += 1
+                return False
+            self._stats['hedged'] += 1
+            return True
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _loser_done(self, future: Future):
+        """Count the tokens of a synchronous hedge that lost but finished anyway."""
+        if not future.cancelled() and future.exception() is None:
+            self._count(extra_tokens=future.result()[0][1] or 0)
+
+    @staticmethod
+    def _succeeded(result: Completion) -> bool:
+        return bool(result[0])
+
+    def _submit_hedge(self, hedge: Callable[[], Completion]) -> Future:
+        """Run the hedge on the bounded executor; the future holds (result, finish time)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+        return self._executor.submit(lambda: (hedge(), time.perf_counter()))
+
+    def run(self, primary: Callable[[], Completion], hedge: Callable[[], Completion],
+            label: str = "LLM", kind: str = "default") -> Completion:
+        """
+        Call primary in the calling thread, and hedge if it is still running after the hedge delay.
+
+        Args:
+            primary: Sends the request; returns (summary or SummaryFailure, tokens)
+            hedge: Sends the duplicate request
+            label: Name used in logs
+            kind: Kind of call; latencies and hedge delays are kept per kind
+
+        Returns:
+            The hedge's result if it succeeded before the primary finished or
+            the primary failed, otherwise the primary's result
+        """
+        self._start()
+        delay = self.hedge_delay(kind)
+        start_time = time.perf_counter()
+        if delay is None:
+            result = primary()
+            if self._succeeded(result):
+                self.observe(time.perf_counter() - start_time, kind)
+            return result
+
+        state = {'primary_done': False, 'hedge': None}
+        state_lock = threading.Lock()
+
+        def launch():
+            with state_lock:
+                if state['primary_done'] or not self._take_hedge():
+                    return
+                print(f"🐇 {label} 请求超过 p{self.percentile:g} 延迟 {delay:.1f}s，发送对冲请求")
+                state['hedge'] = self._submit_hedge(hedge)
+
+        timer = _timers.call_later(delay, launch)
+        try:
+            result = primary()
+        finally:
+            _timers.cancel(timer)
+            with state_lock:
+                state['primary_done'] = True
+            second = state['hedge']
+        primary_at = time.perf_counter()
+        if second is None:
+            if self._succeeded(result):
+                self.observe(primary_at - start_time, kind)
+            return result
+
+        # 对冲请求已先成功返回，原请求的消耗计为额外开销
+        if second.done() and second.exception() is None:
+            hedge_result, hedge_at = second.result()
+            if self._succeeded(hedge_result) and hedge_at <= primary_at:
+                self._count(hedge_wins=1, extra_tokens=result[1] or 0)
+                self.observe(hedge_at - start_time, kind)
+                return hedge_result
+        if self._succeeded(result):
+            self._count(primary_wins=1)
+            self.observe(primary_at - start_time, kind)
+            if second.cancel():
+                self._count(cancelled=1)
+            else:
+                second.add_done_callback(self._loser_done)
+            return result
+
+        # 原请求失败，等待对冲请求的结果
+        hedge_result, hedge_at = second.result()
+        if self._succeeded(hedge_result):
+            self._count(hedge_wins=1)
+            self.observe(hedge_at - start_time, kind)
+            return hedge_result
+        return result
+
+    async def run_async(self, primary: Callable[[], Awaitable[Completion]],
+                        hedge: Callable[[], Awaitable[Completion]], label: str = "LLM",
+                        kind: str = "default") -> Completion:
+        """Asynchronous version of run; both requests run concurrently and the losing one is cancelled."""
+        self._start()
+        delay = self.hedge_delay(kind)
+        start_time = time.perf_counter()
+        first = asyncio.ensure_future(primary())
+        names = {first: 'primary'}
+        pending = {first}
+        try:
+            if delay is not None:
+                done, pending = await asyncio.wait(pending, timeout=delay)
+                if not done and self._take_hedge():
+                    print(f"🐇 {label} 请求超过 p{self.percentile:g} 延迟 {delay:.1f}s，发送对冲请求")
+                    second = asyncio.ensure_future(hedge())
+                    names[second] = 'hedge'
+                    pending.add(second)
+            result = None
+            while True:
+                if not pending:
+                    # 对冲前主请求已完成
+                    result = first.result()
+                    break
+                done, pending = await asyncio.wait(pending, return_when=FIRST_COMPLETED)
+                finished = [future for future in done if self._succeeded(future.result())]
+                if finished:
+                    result = finished[0].result()
+                    if len(names) > 1:
+                        self._count(**{f"{names[finished[0]]}_wins": 1})
+                    break
+                result = next(iter(done)).result()
+                if not pending:
+                    break
+            if self._succeeded(result):
+                self.observe(time.perf_counter() - start_time, kind)
+            return result
+        finally:
+            for future in pending:
+                if future.cancel():
+                    self._count(cancelled=1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, hedges sent and skipped by the rate cap, wins, cancelled losers, extra tokens and the current delay per kind."""
+        with self._lock:
+            kinds = list(self._latencies)
+        delays = {kind: self.hedge_delay(kind) for kind in kinds}
+        with self._lock:
+            return dict(self._stats, percentile=self.percentile,
+                        hedge_delay_s={kind: round(delay, 2) for kind, delay in delays.items() if delay is not None})
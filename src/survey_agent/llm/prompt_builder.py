@@ -0,0 +1,261 @@
+"""Token-budgeted prompt assembly."""
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .tokenizer import get_tokenizer
+
+# 各模型的上下文窗口（token），按模型名前缀匹配，最长前缀优先
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4o': 128000,
+    'gpt-4.1': 1000000,
+    'gpt-4-turbo': 128000,
+    'gpt-4-32k': 32768,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+    'o1': 128000,
+    'o3': 200000,
+    'o4-mini': 200000,
+    'glm-4': 128000,
+    'doubao': 128000,
+    'deepseek': 64000,
+    'qwen': 32000,
+    'moonshot-v1-8k': 8192,
+    'moonshot-v1-32k': 32768,
+    'moonshot-v1-128k': 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 32000
+# 单次请求输入的上限（token），避免长上下文模型的开销失控
+DEFAULT_MAX_PROMPT_TOKENS = 16000
+# 为tokenizer误差和消息格式预留的token数
+DEFAULT_SAFETY_MARGIN = 512
+# 截断后的段落末尾加上省略标记
+TRUNCATION_MARKER = "\n[...]"
+
+# 章节标题关键词及保留优先级（数值越大越晚被裁剪，0表示最先丢弃）
+SECTION_PRIORITIES = [
+    (r'abstract', 5),
+    (r'introduction', 4),
+    (r'conclusions?|concluding remarks|summary', 4),
+    (r'method(?:s|ology)?|approach|proposed method|model|framework|architecture', 3),
+    (r'experiments?|experimental (?:setup|results)|evaluation|results|analysis', 3),
+    (r'discussion|limitations?|future work', 2),
+    (r'related work|background|preliminar(?:y|ies)|prior work', 1),
+    (r'references|bibliography|acknowledge?ments?|appendix|appendices|supplementary material', 0),
+]
+# 未识别标题的章节、以及首个标题之前的内容（作者、单位、摘要重复）的优先级
+DEFAULT_SECTION_PRIORITY = 2
+FRONT_MATTER_PRIORITY = 1
+# 优先级或章节划分方式变化时递增，写入缓存键
+SECTION_POLICY_VERSION = 1
+
+_HEADING_RE = re.compile(
+    r'^\s*(?:(?:\d+(?:\.\d+)*|[IVX]+|[A-H])[.)]?\s+)?(' + '|'.join(p for p, _ in SECTION_PRIORITIES) + r')\s*:?\s*$',
+    re.IGNORECASE,
+)
+_PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+_context_windows: Dict[str, int] = {}
+
+
+def register_context_window(model_prefix: str, tokens: int):
+    """
+    Set the context window of every model whose name starts with model_prefix.
+
+    Args:
+        model_prefix: Model name prefix
+        tokens: Context window in tokens
+    """
+    _context_windows[model_prefix] = tokens
+
+
+def get_context_window(model_name: Optional[str]) -> int:
+    """
+    Return a model's context window.
+
+    Args:
+        model_name: Model name
+
+    Returns:
+        $SURVEY_AGENT_CONTEXT_TOKENS if set, otherwise the window of the
+        longest matching prefix, otherwise DEFAULT_CONTEXT_WINDOW
+    """
+    override = os.environ.get("SURVEY_AGENT_CONTEXT_TOKENS")
+    if override:
+        return int(override)
+    windows = dict(MODEL_CONTEXT_WINDOWS, **_context_windows)
+    name = (model_name or '').lower()
+    prefixes = [prefix for prefix in windows if name.startswith(prefix)]
+    if not prefixes:
+        return DEFAULT_CONTEXT_WINDOW
+    return windows[max(prefixes, key=len)]
+
+
+def _section_priority(heading: str) -> int:
+    for pattern, priority in SECTION_PRIORITIES:
+        if re.fullmatch(pattern, heading, re.IGNORECASE):
+            return priority
+    return DEFAULT_SECTION_PRIORITY
+
+
+def split_sections(text: str) -> List[Tuple[str, int]]:
+    """
+    Split paper text at recognizable section headings.
+
+    Only headings naming a known section start a new one; subsections and
+    unknown headings stay in the section they appear in.
+
+    Args:
+        text: Paper text
+
+    Returns:
+        List of (section text, priority) in document order
+    """
+    sections, start, priority = [], 0, FRONT_MATTER_PRIORITY
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        match = _HEADING_RE.match(line) if len(line) <= 80 else None
+        if match and offset > start:
+            sections.append((text[start:offset], priority))
+            start = offset
+        if match:
+            priority = _section_priority(match.group(1))
+        offset += len(line)
+    if offset > start:
+        sections.append((text[start:], priority))
+    return sections
+
+
+class PromptBuilder:
+    """
+    Fits placeholder values into a model's prompt budget.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, max_output_tokens: int = 1024,
+                 max_prompt_tokens: Optional[int] = None, safety_margin: int = DEFAULT_SAFETY_MARGIN):
+        """
+        Initialize the builder.
+
+        Args:
+            model_name: Model the prompt is for; selects tokenizer and context window
+            max_output_tokens: Tokens reserved for the completion
+            max_prompt_tokens: Upper bound on the prompt, defaults to
+                $SURVEY_AGENT_MAX_PROMPT_TOKENS or DEFAULT_MAX_PROMPT_TOKENS
+            safety_margin: Tokens kept free for tokenizer error and message framing
+        """
+        self.model_name = model_name
+        self.tokenizer = get_tokenizer(model_name)
+        if max_prompt_tokens is None:
+            max_prompt_tokens = int(os.environ.get("SURVEY_AGENT_MAX_PROMPT_TOKENS", DEFAULT_MAX_PROMPT_TOKENS))
+        context_budget = get_context_window(model_name) - max_output_tokens - safety_margin
+        self.prompt_budget = max(0, min(max_prompt_tokens, context_budget))
+
+    def policy(self) -> str:
+        """Describe the budget and tokenizer; part of the summary cache key."""
+        return f"budget:{self.prompt_budget}:{self.tokenizer.name}:sections{SECTION_POLICY_VERSION}"
+
+    def count(self, text: str) -> int:
+        return self.tokenizer.count(text)
+
+    def fit_text(self, text: str, max_tokens: int) -> str:
+        """
+        Shorten paper text to max_tokens, dropping low-priority sections first.
+
+        Args:
+            text: Paper text
+            max_tokens: Token limit
+
+        Returns:
+            Text within the limit, sections kept in their original order
+        """
+        if max_tokens <= 0 or not text:
+            return ''
+        if self.count(text) <= max_tokens:
+            return text
+
+        sections = split_sections(text)
+        sizes = [self.count(section) for section, _ in sections]
+        keep = {i: sizes[i] for i in range(len(sections))}
+        for level in sorted({priority for _, priority in sections}):
+            level_ids = [i for i, (_, priority) in enumerate(sections) if priority == level]
+            rest = sum(size for i, size in keep.items() if i not in level_ids)
+            if rest <= max_tokens:
+                # 剩余预算按长度比例分给这一级的章节
+                room = max_tokens - rest
+                level_total = sum(sizes[i] for i in level_ids) or 1
+                for i in level_ids:
+                    keep[i] = sizes[i] * room // level_total
+                break
+            for i in level_ids:
+                del keep[i]
+
+        parts = []
+        for i in sorted(keep):
+            section = sections[i][0]
+            if keep[i] >= sizes[i]:
+                parts.append(section)
+            elif keep[i] > self.count(TRUNCATION_MARKER) + 16:
+                parts.append(self.tokenizer.truncate(section, keep[i] - self.count(TRUNCATION_MARKER)) + TRUNCATION_MARKER)
+        fitted = ''.join(parts)
+        # 分词在拼接处可能合并或拆分，最后再按token截断一次兜底
+        return self.tokenizer.truncate(fitted, max_tokens)
+
+    def fit(self, template: str, fixed: Dict[str, str],
+            elastic: Sequence[Tuple[str, str, Optional[int], bool]]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Decide the value of every placeholder.
+
+        Args:
+            template: Prompt template with {name} placeholders
+            fixed: Values inserted unchanged
+            elastic: (name, text, cap, sectioned) in priority order; each gets
+                at most `cap` tokens (None for no cap) of what is left of the
+                budget, paper text (sectioned=True) is shortened by section
+
+        Returns:
+            (values by name, names of the values that were shortened)
+        """
+        names = _PLACEHOLDER_RE.findall(template)
+        values = {name: str(value) for name, value in fixed.items()}
+        values.update((name, '') for name, _, _, _ in elastic)
+        remaining = self.prompt_budget - self.count(render(template, values))
+
+        truncated = []
+        for name, text, cap, sectioned in elastic:
+            occurrences = names.count(name)
+            if not occurrences or not text:
+                continue
+            allowed = max(0, remaining) // occurrences
+            if cap is not None:
+                allowed = min(cap, allowed)
+            value = self.fit_text(text, allowed) if sectioned else self.tokenizer.truncate(text, allowed)
+            if value != text:
+                truncated.append(name)
+            values[name] = value
+            remaining -= self.count(value) * occurrences
+        return values, truncated
+
+    def build(self, template: str, fixed: Dict[str, str],
+              elastic: Sequence[Tuple[str, str, Optional[int], bool]]) -> str:
+        """
+        Render a template with its values fitted into the budget (see fit).
+
+        Returns:
+            Prompt string
+        """
+        values, _ = self.fit(template, fixed, elastic)
+        return render(template, values)
+
+
+def render(template: str, values: Dict[str, str]) -> str:
+    """
+    Replace {name} placeholders in one pass; unknown placeholders are left as they are.
+
+    Args:
+        template: Prompt template
+        values: Placeholder values
+
+    Returns:
+        Rendered prompt
+    """
+    return _PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1), m.group(0)), template)
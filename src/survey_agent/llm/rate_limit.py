@@ -0,0 +1,309 @@
+"""Adaptive (AIMD) concurrency limits shared by all callers of an LLM endpoint."""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Either a number of seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if absent or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AIMDLimiter:
+    """
+    Shared concurrency limit with additive increase / multiplicative decrease.
+
+    Use `with limiter.slot():` around synchronous calls and
+    `async with limiter.slot_async():` around asynchronous ones, then report
+    the outcome with `on_success(latency_s)` or `on_overload(retry_after)`.
+    """
+
+    def __init__(self, name: str = "default", initial_limit: float = 8, min_limit: float = 1,
+                 max_limit: float = 200, increase: float = 1.0, decrease: float = 0.5,
+                 latency_spike: float = 3.0, min_latency_samples: int = 10):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Endpoint name, used in logs and stats
+            initial_limit: Starting concurrency limit
+            min_limit: Lowest limit a decrease can reach
+            max_limit: Highest limit an increase can reach
+            increase: Limit added per window of successful requests
+            decrease: Factor applied to the limit on overload
+            latency_spike: A success slower than this multiple of the average
+                latency counts as overload
+            min_latency_samples: Successes needed before latency spikes are detected
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_spike = latency_spike
+        self.min_latency_samples = min_latency_samples
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._avg_latency = None
+        self._latency_samples = 0
+        self._stats = {'successes': 0, 'overloads': 0, 'latency_spikes': 0, 'decreases': 0}
+        self._condition = threading.Condition()
+        # 等待并发槽的协程，先到先得：(事件循环, future)
+        self._waiters = deque()
+
+    @property
+    def current_limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return max(int(self._limit), int(self.min_limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _try_acquire(self) -> Optional[float]:
+        """Take a slot if one is free (0.0); otherwise the remaining Retry-After pause, or None to wait for a release."""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight < self.current_limit and not self._waiters:
+            self._in_flight += 1
+            return 0.0
+        return None
+
+    def _wake_waiters(self):
+        """Hand free slots to waiting coroutines in arrival order; during a pause let them all re-check."""
+        paused = time.monotonic() < self._blocked_until
+        while self._waiters and (paused or self._in_flight < self.current_limit):
+            loop, future = self._waiters.popleft()
+            if not paused:
+                self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, future, not paused)
+            except RuntimeError:
+                # 事件循环已关闭
+                if not paused:
+                    self._in_flight -= 1
+
+    def _grant(self, future: asyncio.Future, granted: bool):
+        if not future.done():
+            future.set_result(granted)
+        elif granted:
+            # 等待方已超时或被取消，归还转交给它的槽
+            self.release()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a slot is free.
+
+        Args:
+            timeout: Longest time to wait in seconds, default no limit
+
+        Returns:
+            Whether a slot was taken (False if the timeout ran out first)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0.0:
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(timeout=wait)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a free slot without blocking the event loop.
+
+        Waiting coroutines are queued and woken in order by release() or a
+        limit increase; only a Retry-After pause is slept through.
+
+        Args:
+            timeout: Longest time to wait in seconds, default no limit
+
+        Returns:
+            Whether a slot was taken (False if the timeout ran out first)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                wait = self._try_acquire()
+                if wait is None:
+                    future = loop.create_future()
+                    self._waiters.append((loop, future))
+            if wait == 0.0:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                if wait is None:
+                    self._abandon(loop, future)
+                return False
+            if wait is not None:
+                await asyncio.sleep(wait if remaining is None else min(wait, remaining))
+                continue
+
+            try:
+                await asyncio.wait((future,), timeout=remaining)
+            except BaseException:
+                if self._abandon(loop, future):
+                    self.release()
+                raise
+            if future.done():
+                if future.result():
+                    return True
+                continue
+            if self._abandon(loop, future):
+                return True
+            return False
+
+    def _abandon(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> bool:
+        """Stop waiting; return True if a slot had already been handed over and is now owned by the caller."""
+        with self._condition:
+            try:
+                self._waiters.remove((loop, future))
+                return False
+            except ValueError:
+                pass
+        if future.done():
+            return future.result()
+        # 槽已转交但回调尚未执行，回调看到取消后会归还
+        future.cancel()
+        return False
+
+    def release(self):
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._wake_waiters()
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def _decrease(self, now: float):
+        # 同一窗口（约一个请求耗时）内的多个错误只降一次
+        cooldown = self._avg_latency if self._avg_latency is not None else 1.0
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.decrease)
+        self._stats['decreases'] += 1
+        print(f"🐢 [{self.name}] 降低并发上限至 {self.current_limit}")
+
+    def on_success(self, latency_s: float):
+        """Report a successful request and its latency."""
+        with self._condition:
+            self._stats['successes'] += 1
+            now = time.monotonic()
+            spike = (self._latency_samples >= self.min_latency_samples
+                     and latency_s > self.latency_spike * self._avg_latency)
+            if spike:
+                self._stats['latency_spikes'] += 1
+                self._decrease(now)
+            else:
+                self._limit = min(self.max_limit, self._limit + self.increase / max(self._limit, 1.0))
+            self._latency_samples += 1
+            self._avg_latency = latency_s if self._avg_latency is None else 0.9 * self._avg_latency + 0.1 * latency_s
+            self._wake_waiters()
+            self._condition.notify_all()
+
+    def on_overload(self, retry_after: Optional[float] = None):
+        """
+        Report a 429/5xx response.
+
+        Args:
+            retry_after: Seconds from the Retry-After header; pauses new requests until then
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._stats['overloads'] += 1
+            self._decrease(now)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+                # 排队的协程改为等待暂停结束
+                self._wake_waiters()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limit, in-flight count and counters."""
+        with self._condition:
+            return dict(
+                self._stats,
+                name=self.name,
+                limit=self.current_limit,
+                in_flight=self._in_flight,
+                avg_latency_s=round(self._avg_latency, 2) if self._avg_latency is not None else None,
+                paused_s=round(max(0.0, self._blocked_until - time.monotonic()), 1),
+            )
+
+
+_limiters: Dict[str, AIMDLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint: str, **kwargs) -> AIMDLimiter:
+    """
+    Return the shared limiter for an endpoint, creating it on first use.
+
+    Args:
+        endpoint: Endpoint identifier (e.g. "<base_url>|<model>")
+        **kwargs: AIMDLimiter options, only used when the limiter is created
+
+    Returns:
+        AIMDLimiter instance
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            limiter = _limiters[endpoint] = AIMDLimiter(name=endpoint, **kwargs)
+        return limiter
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every limiter created in this process, keyed by endpoint."""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return {endpoint: limiter.stats() for endpoint, limiter in limiters}
@@ -0,0 +1,435 @@
+"""Retries, circuit breaking and error classification for LLM provider calls."""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, TypeVar, Union
+
+from .rate_limit import AIMDLimiter, parse_retry_after
+
+T = TypeVar('T')
+
+# 错误类型
+RATE_LIMITED = 'rate_limited'
+SERVER_ERROR = 'server_error'
+TIMEOUT = 'timeout'
+NETWORK = 'network'
+AUTH = 'auth'
+BAD_REQUEST = 'bad_request'
+INVALID_RESPONSE = 'invalid_response'
+EMPTY_RESPONSE = 'empty_response'
+CIRCUIT_OPEN = 'circuit_open'
+DEADLINE_EXCEEDED = 'deadline_exceeded'
+UNEXPECTED = 'unexpected'
+
+RETRYABLE_KINDS = frozenset({RATE_LIMITED, SERVER_ERROR, TIMEOUT, NETWORK})
+# 说明端点本身不可用的错误，计入熔断器；429说明端点仍在响应，不计入
+OUTAGE_KINDS = frozenset({SERVER_ERROR, TIMEOUT, NETWORK})
+# 说明端点过载的错误，用于降低自适应并发上限
+OVERLOAD_KINDS = frozenset({RATE_LIMITED, SERVER_ERROR, TIMEOUT})
+
+
+class ProviderError(Exception):
+    """A classified provider failure."""
+
+    def __init__(self, kind: str, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in RETRYABLE_KINDS
+
+
+class SummaryFailure(str):
+    """
+    Result of a summary request that produced no summary.
+
+    It is an empty string, so callers that test `if summary:` or store the
+    result as text keep working, but it also tells why the call failed.
+    """
+
+    def __new__(cls, kind: str, message: str = '', status_code: Optional[int] = None, attempts: int = 0):
+        failure = super().__new__(cls, '')
+        failure.kind = kind
+        failure.message = message
+        failure.status_code = status_code
+        failure.attempts = attempts
+        return failure
+
+    def __getnewargs__(self):
+        return (self.kind, self.message, self.status_code, self.attempts)
+
+    @property
+    def retryable(self) -> bool:
+        """Whether trying again later may succeed."""
+        return self.kind in RETRYABLE_KINDS or self.kind in (CIRCUIT_OPEN, DEADLINE_EXCEEDED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'kind': self.kind, 'message': self.message, 'status_code': self.status_code, 'attempts': self.attempts}
+
+    def __repr__(self) -> str:
+        return f"SummaryFailure(kind={self.kind!r}, message={self.message!r})"
+
+
+def classify_status(status_code: int, retryable_statuses: Iterable[int] = ()) -> str:
+    """
+    Map an HTTP status code to an error kind.
+
+    Args:
+        status_code: HTTP status code
+        retryable_statuses: Extra statuses the endpoint is known to return transiently
+
+    Returns:
+        Error kind
+    """
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code >= 500 or status_code in retryable_statuses:
+        return SERVER_ERROR
+    if status_code == 408:
+        return TIMEOUT
+    if status_code in (401, 403):
+        return AUTH
+    return BAD_REQUEST
+
+
+def classify_exception(error: BaseException, retryable_statuses: Iterable[int] = ()) -> ProviderError:
+    """
+    Classify an exception raised by openai, requests or httpx.
+
+    Client libraries are matched by exception class name so none of them
+    has to be imported here.
+
+    Args:
+        error: Exception raised by a provider call
+        retryable_statuses: Extra statuses the endpoint is known to return transiently
+
+    Returns:
+        ProviderError describing the failure
+    """
+    if isinstance(error, ProviderError):
+        return error
+
+    response = getattr(error, 'response', None)
+    status_code = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    message = f"{type(error).__name__}: {error}"
+    if isinstance(status_code, int) and status_code >= 400:
+        headers = getattr(response, 'headers', None) or {}
+        return ProviderError(classify_status(status_code, retryable_statuses), message, status_code,
+                             parse_retry_after(headers.get('retry-after')))
+
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if isinstance(error, asyncio.TimeoutError) or any('Timeout' in name for name in names):
+        return ProviderError(TIMEOUT, message)
+    if names & {'APIConnectionError', 'ConnectionError', 'TransportError', 'NetworkError', 'RemoteProtocolError'}:
+        return ProviderError(NETWORK, message)
+    if 'JSONDecodeError' in names:
+        return ProviderError(INVALID_RESPONSE, message)
+    if isinstance(error, OSError):
+        return ProviderError(NETWORK, message)
+    return ProviderError(UNEXPECTED, message)
+
+
+class RetryPolicy:
+    """Retry budget for one provider call."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 deadline: float = 240.0, request_timeout: float = 120.0, connect_timeout: float = 10.0):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Maximum number of requests per call
+            base_delay: Backoff ceiling after the first failure
+            max_delay: Largest backoff ceiling
+            deadline: Total seconds a call may take including retries
+            request_timeout: Timeout of a single request
+            connect_timeout: Timeout for establishing a connection
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before the next attempt: the server's Retry-After if given,
+        otherwise full jitter over an exponentially growing ceiling.
+
+        Args:
+            attempt: Number of attempts made so far (1-based)
+            retry_after: Seconds from the Retry-After header
+
+        Returns:
+            Seconds to wait
+        """
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+
+    closed: requests pass; consecutive outage errors are counted.
+    open: after `failure_threshold` consecutive outage errors every request
+        is rejected for `reset_timeout` seconds.
+    half_open: afterwards one probe request is let through; success closes
+        the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str = "default", failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._stats = {'opened': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        return 'half_open'
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            now = time.monotonic()
+            # 半开状态只放行一个探测请求（探测请求长时间无结果时再放行一个）
+            if state == 'half_open' and (self._probe_started is None
+                                         or now - self._probe_started > self.reset_timeout):
+                self._probe_started = now
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        """The endpoint answered (even with a non-outage error)."""
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"✅ [{self.name}] 端点已恢复，关闭熔断")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        """The endpoint failed with an outage error."""
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self._stats['opened'] += 1
+                    print(f"⛔ [{self.name}] 连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, name=self.name, state=self.state, consecutive_failures=self._failures)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str, **kwargs) -> CircuitBreaker:
+    """
+    Return the shared circuit breaker for an endpoint, creating it on first use.
+
+    Args:
+        endpoint: Endpoint identifier (e.g. "<base_url>|<model>")
+        **kwargs: CircuitBreaker options, only used when the breaker is created
+
+    Returns:
+        CircuitBreaker instance
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(name=endpoint, **kwargs)
+        return breaker
+
+
+def get_circuit_stats() -> Dict[str, Dict[str, Any]]:
+    """State of every circuit breaker created in this process, keyed by endpoint."""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {endpoint: breaker.stats() for endpoint, breaker in breakers}
+
+
+class _Attempts:
+    """Bookkeeping shared by the sync and async retry loops."""
+
+    def __init__(self, breaker: CircuitBreaker, limiter: Optional[AIMDLimiter], policy: RetryPolicy,
+                 label: str, retryable_statuses: Iterable[int]):
+        self.breaker = breaker
+        self.limiter = limiter
+        self.policy = policy
+        self.label = label
+        self.retryable_statuses = tuple(retryable_statuses)
+        self.deadline = time.monotonic() + policy.deadline
+        self.attempt = 0
+
+    def start(self) -> Optional[SummaryFailure]:
+        """Count the next attempt, or return a failure if it must not be sent."""
+        if not self.breaker.allow():
+            return SummaryFailure(CIRCUIT_OPEN, f"{self.breaker.name} 熔断中", attempts=self.attempt)
+        if self.remaining() <= 0:
+            return SummaryFailure(DEADLINE_EXCEEDED, f"超过总时限 {self.policy.deadline:.0f} 秒", attempts=self.attempt)
+        self.attempt += 1
+        return None
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def request_timeout(self) -> Union[float, SummaryFailure]:
+        """Timeout of a request sent now (after the limiter slot was taken), or a failure if the deadline passed."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            return self.queue_timeout()
+        return min(self.policy.request_timeout, remaining)
+
+    def queue_timeout(self) -> SummaryFailure:
+        print(f"❌ {self.label} 等待并发槽超过总时限 {self.policy.deadline:.0f} 秒")
+        return SummaryFailure(TIMEOUT, f"等待并发槽超过总时限 {self.policy.deadline:.0f} 秒", attempts=self.attempt)
+
+    def succeeded(self, latency_s: float):
+        self.breaker.record_success()
+        if self.limiter is not None:
+            self.limiter.on_success(latency_s)
+
+    def failed(self, error: BaseException) -> Union[float, SummaryFailure]:
+        """Record a failed request; return the delay before retrying or the final failure."""
+        error = classify_exception(error, self.retryable_statuses)
+        if error.kind in OUTAGE_KINDS:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if self.limiter is not None and error.kind in OVERLOAD_KINDS:
+            self.limiter.on_overload(error.retry_after)
+
+        failure = SummaryFailure(error.kind, error.message, error.status_code, self.attempt)
+        if not error.retryable:
+            print(f"❌ {self.label} 调用失败 ({error.kind}): {error.message}")
+            return failure
+        if self.attempt >= self.policy.max_attempts:
+            print(f"❌ {self.label} 调用失败，已达到最大重试次数 ({error.kind}): {error.message}")
+            return failure
+        delay = self.policy.backoff(self.attempt, error.retry_after)
+        if time.monotonic() + delay >= self.deadline:
+            print(f"❌ {self.label} 调用失败，重试将超过总时限 ({error.kind}): {error.message}")
+            return SummaryFailure(DEADLINE_EXCEEDED, error.message, error.status_code, self.attempt)
+        print(f"🔄 {self.label} {error.kind}，{delay:.1f}秒后重试 (尝试 {self.attempt}/{self.policy.max_attempts})")
+        return delay
+
+
+def call_with_retries(request: Callable[[float], T],
+                      breaker: CircuitBreaker,
+                      limiter: Optional[AIMDLimiter] = None,
+                      policy: Optional[RetryPolicy] = None,
+                      label: str = "LLM",
+                      retryable_statuses: Iterable[int] = (),
+                      hold_slot: bool = False) -> Union[T, SummaryFailure]:
+    """
+    Run a provider request with classification, retries and circuit breaking.
+
+    Args:
+        request: Sends one request; called with the timeout in seconds,
+            raises on failure
+        breaker: Circuit breaker of the endpoint
+        limiter: AIMD limiter of the endpoint; each request holds one slot
+        policy: Retry policy, default RetryPolicy()
+        label: Name used in log messages
+        retryable_statuses: Extra HTTP statuses to treat as transient
+        hold_slot: Keep the limiter slot after a successful request (e.g. while
+            a stream is read); the caller must call limiter.release()
+
+    Returns:
+        The request's result, or a SummaryFailure
+    """
+    state = _Attempts(breaker, limiter, policy or RetryPolicy(), label, retryable_statuses)
+    while True:
+        failure = state.start()
+        if failure is not None:
+            return failure
+        # 在并发槽上排队的时间也计入总时限，拿到槽后再计算本次请求的超时
+        if limiter is not None and not limiter.acquire(timeout=state.remaining()):
+            return state.queue_timeout()
+        timeout = state.request_timeout()
+        if isinstance(timeout, SummaryFailure):
+            if limiter is not None:
+                limiter.release()
+            return timeout
+        request_start = time.perf_counter()
+        try:
+            result = request(timeout)
+        except BaseException as e:
+            # 释放并发槽后再等待
+            if limiter is not None:
+                limiter.release()
+            if not isinstance(e, Exception):
+                raise
+            outcome = state.failed(e)
+        else:
+            state.succeeded(time.perf_counter() - request_start)
+            if limiter is not None and not hold_slot:
+                limiter.release()
+            return result
+        if isinstance(outcome, SummaryFailure):
+            return outcome
+        time.sleep(outcome)
+
+
+async def call_with_retries_async(request: Callable[[float], Awaitable[T]],
+                                  breaker: CircuitBreaker,
+                                  limiter: Optional[AIMDLimiter] = None,
+                                  policy: Optional[RetryPolicy] = None,
+                                  label: str = "LLM",
+                                  retryable_statuses: Iterable[int] = (),
+                                  hold_slot: bool = False) -> Union[T, SummaryFailure]:
+    """Asynchronous version of call_with_retries; `request` is a coroutine function."""
+    state = _Attempts(breaker, limiter, policy or RetryPolicy(), label, retryable_statuses)
+    while True:
+        failure = state.start()
+        if failure is not None:
+            return failure
+        if limiter is not None and not await limiter.acquire_async(timeout=state.remaining()):
+            return state.queue_timeout()
+        timeout = state.request_timeout()
+        if isinstance(timeout, SummaryFailure):
+            if limiter is not None:
+                limiter.release()
+            return timeout
+        request_start = time.perf_counter()
+        try:
+            result = await request(timeout)
+        except BaseException as e:
+            if limiter is not None:
+                limiter.release()
+            if not isinstance(e, Exception):
+                raise
+            outcome = state.failed(e)
+        else:
+            state.succeeded(time.perf_counter() - request_start)
+            if limiter is not None and not hold_slot:
+                limiter.release()
+            return result
+        if isinstance(outcome, SummaryFailure):
+            return outcome
+        await asyncio.sleep(outcome)
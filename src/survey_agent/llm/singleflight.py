@@ -0,0 +1,129 @@
+"""In-flight request coalescing: concurrent callers of the same key share one call."""
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls keyed by a string.
+
+    `do(key, fn)` and `await do_async(key, fn)` cover most uses. Callers that
+    produce their result incrementally (streams) use `join`, and the leader
+    reports the outcome with `finish`.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'shared': 0}
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        Join the call in flight for key, or start one.
+
+        Args:
+            key: Call key
+
+        Returns:
+            (future holding the result, whether the caller is the leader and
+            must call finish)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats['shared'] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._stats['leaders'] += 1
+            return future, True
+
+    def finish(self, key: str, future: Future, result: Any = None, error: BaseException = None,
+               abandoned: bool = False):
+        """
+        Publish the leader's outcome and let later callers start a new call.
+
+        Args:
+            key: Call key
+            future: Future returned by join
+            result: Result handed to the waiting callers
+            error: Exception raised to the waiting callers instead
+            abandoned: The leader stopped without a result; waiting callers retry
+        """
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if future.done():
+            return
+        if abandoned:
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn unless a call for key is already in flight, then share its result.
+
+        Args:
+            key: Call key
+            fn: Function computing the result
+
+        Returns:
+            Result of this or the concurrent call
+        """
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                return self._lead(key, future, fn)
+            try:
+                return future.result()
+            except CancelledError:
+                continue
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Asynchronous version of do; fn returns an awaitable.
+
+        Returns:
+            Result of this or the concurrent call
+        """
+        while True:
+            future, leader = self.join(key)
+            if not leader:
+                try:
+                    # shield：当前协程被取消时不取消共享的future
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    continue
+            try:
+                result = await fn()
+            except Exception as e:
+                self.finish(key, future, error=e)
+                raise
+            except BaseException:
+                self.finish(key, future, abandoned=True)
+                raise
+            self.finish(key, future, result)
+            return result
+
+    def _lead(self, key: str, future: Future, fn: Callable[[], Any]) -> Any:
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        except BaseException:
+            self.finish(key, future, abandoned=True)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Calls that did the work, calls that shared another call's result, and calls in flight."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
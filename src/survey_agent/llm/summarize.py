@@ -1,7 +1,89 @@
 import os
 import json
-from typing import Dict, Any, List, Optional, Union
-from ..utils.cache import get_paper_cache
+import math
+import time
+import hashlib
+import asyncio
+import socket
+import threading
+import uuid
+import weakref
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional, Tuple, Union
+from ..utils.cache import get_paper_cache, hash_prompt_template
+from ..utils.text_store import materialize_text
+from .tokenizer import count_tokens, split_into_chunks
+from .prompt_builder import PromptBuilder, render
+from .rate_limit import get_limiter, parse_retry_after
+from .singleflight import SingleFlight
+from .hedging import HedgePolicy
+from .resilience import (EMPTY_RESPONSE, INVALID_RESPONSE, ProviderError, RetryPolicy, SummaryFailure,
+                         call_with_retries, call_with_retries_async, classify_exception, classify_status,
+                         get_breaker)
+
+# 自定义模板中 {pdf_text} 的长度上限（token）；默认模板的论文全文和 {full_pdf_text} 使用剩余的全部预算
+CUSTOM_PDF_TEXT_TOKENS = 2500
+# 标题和摘要的长度上限（token），先于论文全文分配预算
+TITLE_MAX_TOKENS = 200
+ABSTRACT_MAX_TOKENS = 1500
+# 默认的输出token上限
+DEFAULT_MAX_OUTPUT_TOKENS = 1024
+# 每个总结器实例统计的调用量
+USAGE_COUNTERS = ('calls', 'cache_hits', 'failures', 'tokens', 'latency_s')
+# 异步总结时默认同时进行的请求数
+DEFAULT_ASYNC_CONCURRENCY = 64
+# 豆包网关偶尔返回临时性的404，按服务端错误重试
+DOUBAO_RETRYABLE_STATUSES = (404,)
+# 长论文分块总结（map-reduce）：每块的token数、最多分块数（超过时增大块）和同时总结的块数
+DEFAULT_CHUNK_TOKENS = 6000
+DEFAULT_MAX_CHUNKS = 12
+DEFAULT_MAP_CONCURRENCY = 8
+# 跨进程合并同一篇论文的并发请求：租约有效期（持有者崩溃后可被接管）和等待时的轮询间隔（秒）
+INFLIGHT_LEASE_S = 600
+INFLIGHT_POLL_S = 0.5
+
+# 本进程内正在进行的总结调用，按摘要缓存键合并；所有总结器实例共享
+_inflight = SingleFlight()
+
+DEFAULT_SUMMARY_PROMPT = """### 任务
+你是一个人工智能领域的专家，你能够快速阅读arxiv上的各种AI前沿论文，并给出非常好的论文总结。
+现在请你阅读以下论文，并给出你对这篇论文的详细介绍，从而放到你的博客上，让更多人了解这篇论文。
+
+### 论文信息
+###  1. 论文标题
+```
+{title}
+```
+#### 2. 论文摘要
+```
+{abstract}
+```
+
+#### 3. 论文全文
+```
+{pdf_text}  # Truncate if too long
+```
+
+请输出论文总结
+### 输出格式（输出语言用中文）
+```
+1.任务：研究领域(根据Introduction或者Related Work中的内容，总结出论文的研究领域)
+2.问题：动机是打算解决什么问题？之前的方法存在什么问题？文本提出的方法解决之前的什么问题？
+3.方法：具体的方法是什么？
+4.实验结果
+```
+"""
+
+CHUNK_SUMMARY_PROMPT = """### 任务
+下面是论文《{title}》全文的第 {index}/{total} 部分。请提取这一部分中的关键信息，之后会把所有部分的要点汇总成整篇论文的总结。
+
+### 论文片段
+```
+{chunk}
+```
+
+请用中文分点列出这一部分涉及的：研究问题、方法细节、实验设置与结果（保留具体数字）、结论或局限。只根据给出的片段，不要猜测其他部分的内容，没有相关内容的条目可以省略。
+"""
 
 class LLMSummarizer:
     """
@@ -9,16 +91,79 @@ class LLMSummarizer:
     Subclass this to implement specific LLM integrations.
     """
     
-    def __init__(self, model_name: str = None, custom_prompt: str = None):
+    # Provider name recorded in the summary cache
+    provider = "unknown"
+    
+    def __init__(self, model_name: str = None, custom_prompt: str = None, map_reduce: bool = False):
         """
         Initialize the summarizer.
         
         Args:
             model_name: Name of the LLM model to use
             custom_prompt: Custom prompt template for summarization
+            map_reduce: Summarize papers longer than the truncation limit chunk by
+                chunk and pass the chunk summaries to the template instead of
+                the truncated text
         """
         self.model_name = model_name or os.environ.get("SURVEY_AGENT_LLM_MODEL", "gpt-4")
         self.custom_prompt = custom_prompt
+        self.map_reduce = map_reduce
+        self.chunk_tokens = DEFAULT_CHUNK_TOKENS
+        self.max_chunks = DEFAULT_MAX_CHUNKS
+        self.map_concurrency = DEFAULT_MAP_CONCURRENCY
+        self.max_output_tokens = DEFAULT_MAX_OUTPUT_TOKENS
+        self._usage_stats = dict.fromkeys(USAGE_COUNTERS, 0)
+        self._usage_lock = threading.Lock()
+        self._legacy_adopted = False
+    
+    def _count_usage(self, **increments):
+        """Add to this summarizer's usage counters."""
+        with self._usage_lock:
+            for name, value in increments.items():
+                self._usage_stats[name] += value
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        Usage of this summarizer since it was created.
+        
+        Returns:
+            Dictionary with model_name, LLM calls, cache hits, failures, tokens,
+            total and average LLM latency in seconds
+        """
+        with self._usage_lock:
+            stats = dict(self._usage_stats)
+        stats['latency_s'] = round(stats['latency_s'], 2)
+        stats['avg_latency_s'] = round(stats['latency_s'] / stats['calls'], 2) if stats['calls'] else None
+        return dict(stats, model_name=self.model_name)
+    
+    def get_prompt_builder(self) -> PromptBuilder:
+        """
+        Get the builder that fits prompts into this model's token budget.
+        
+        Returns:
+            PromptBuilder for the model and its output token limit
+        """
+        return PromptBuilder(self.model_name, max_output_tokens=self.max_output_tokens)
+    
+    def _prompt_fields(self, paper: Dict[str, Any], pdf_text_cap: Optional[int]) -> Tuple[Dict[str, str], List[Tuple[str, str, Optional[int], bool]]]:
+        """
+        Placeholder values for a paper: (fixed values, elastic values in budget priority order).
+        """
+        fixed = {
+            'authors': paper.get('authors', ''),
+            'year': paper.get('year', ''),
+            'url': paper.get('url', ''),
+            'doi': paper.get('doi', ''),
+            'arxiv_id': paper.get('arxiv_id', ''),
+        }
+        pdf_text = materialize_text(paper.get('pdf_text')) or ''
+        elastic = [
+            ('title', str(paper.get('title', '')), TITLE_MAX_TOKENS, False),
+            ('abstract', str(paper.get('summary', '')), ABSTRACT_MAX_TOKENS, False),
+            ('pdf_text', pdf_text, pdf_text_cap, True),
+            ('full_pdf_text', pdf_text, None, True),
+        ]
+        return fixed, elastic
     
     def get_default_summary_prompt(self, paper: Dict[str, Any]) -> str:
         """
@@ -76,34 +221,9 @@ class LLMSummarizer:
 # ```
 # """
 
-        prompt = f"""### 任务
-你是一个人工智能领域的专家，你能够快速阅读arxiv上的各种AI前沿论文，并给出非常好的论文总结。
-现在请你阅读以下论文，并给出你对这篇论文的详细介绍，从而放到你的博客上，让更多人了解这篇论文。
-
-### 论文信息
-###  1. 论文标题
-```
-{paper['title']}
-```
-#### 2. 论文摘要
-```
-{paper['summary']}
-```
-
-#### 3. 论文全文
-```
-{paper.get('pdf_text', '')[:30000]}  # Truncate if too long
-```
-
-请输出论文总结
-### 输出格式（输出语言用中文）
-```
-1.任务：研究领域(根据Introduction或者Related Work中的内容，总结出论文的研究领域)
-2.问题：动机是打算解决什么问题？之前的方法存在什么问题？文本提出的方法解决之前的什么问题？
-3.方法：具体的方法是什么？
-4.实验结果
-```
-"""
+        # 标题、摘要、全文按优先级分配token预算，全文超出时先丢弃参考文献、附录等章节
+        fixed, elastic = self._prompt_fields(paper, pdf_text_cap=None)
+        prompt = self.get_prompt_builder().build(DEFAULT_SUMMARY_PROMPT, fixed, elastic)
         return prompt
     
     def get_summary_prompt(self, paper: Dict[str, Any]) -> str:
@@ -134,25 +254,125 @@ class LLMSummarizer:
         Returns:
             Formatted prompt string
         """
-        # Available placeholders for custom prompts
-        placeholders = {
-            '{title}': paper.get('title', ''),
-            '{abstract}': paper.get('summary', ''),
-            '{authors}': paper.get('authors', ''),
-            '{year}': paper.get('year', ''),
-            '{url}': paper.get('url', ''),
-            '{pdf_text}': paper.get('pdf_text', '')[:10000],  # Truncate if too long
-            '{full_pdf_text}': paper.get('pdf_text', ''),
-            '{doi}': paper.get('doi', ''),
-            '{arxiv_id}': paper.get('arxiv_id', '')
+        # Available placeholders: see get_available_placeholders. {pdf_text} is
+        # capped at CUSTOM_PDF_TEXT_TOKENS, {full_pdf_text} gets the rest of the budget
+        fixed, elastic = self._prompt_fields(paper, pdf_text_cap=CUSTOM_PDF_TEXT_TOKENS)
+        formatted_prompt = self.get_prompt_builder().build(prompt_template, fixed, elastic)
+        
+        return formatted_prompt
+    
+    def get_prompt_template(self) -> str:
+        """
+        Get the prompt template in use.
+        
+        Returns:
+            The custom prompt if set, otherwise the default template
+        """
+        return self.custom_prompt or DEFAULT_SUMMARY_PROMPT
+    
+    def get_truncation_policy(self) -> str:
+        """
+        Describe how paper text is truncated when building prompts.
+        
+        Returns:
+            Policy string, part of the summary cache key
+        """
+        builder_policy = self.get_prompt_builder().policy()
+        if not self.custom_prompt:
+            policies = [f"pdf_text:tokens:{builder_policy}"]
+        else:
+            policies = []
+            if '{pdf_text}' in self.custom_prompt:
+                policies.append(f"pdf_text:tokens:{CUSTOM_PDF_TEXT_TOKENS}:{builder_policy}")
+            if '{full_pdf_text}' in self.custom_prompt:
+                policies.append(f"full_pdf_text:tokens:{builder_policy}")
+        if self.map_reduce and policies:
+            chunk_prompt_hash = hash_prompt_template(CHUNK_SUMMARY_PROMPT)[:8]
+            policies.append(f"map_reduce:{chunk_prompt_hash}:{self.chunk_tokens}x{self.max_chunks}")
+        return ';'.join(policies) or "none"
+    
+    def get_cache_variant(self) -> Dict[str, str]:
+        """
+        Describe everything besides the paper that determines the summary.
+        
+        Returns:
+            Dictionary with provider, model_name, prompt_hash and truncation
+        """
+        return {
+            'provider': self.provider,
+            'model_name': self.model_name,
+            'prompt_hash': hash_prompt_template(self.get_prompt_template()),
+            'truncation': self.get_truncation_policy(),
         }
+    
+    def needs_map_reduce(self, paper: Dict[str, Any]) -> bool:
+        """
+        Whether a paper is summarized chunk by chunk.
+        
+        Args:
+            paper: Paper information dictionary
+            
+        Returns:
+            True if map-reduce is enabled, the template uses the paper text and
+            the text does not fit in the prompt budget
+        """
+        if not self.map_reduce or not paper.get('pdf_text'):
+            return False
+        return self.fit_summary_prompt(paper)[1]
+    
+    def fit_summary_prompt(self, paper: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Build the summary prompt and tell whether the paper text had to be shortened.
+        
+        Args:
+            paper: Paper information dictionary
+            
+        Returns:
+            (prompt, whether pdf_text or full_pdf_text was truncated to fit the budget)
+        """
+        template = self.get_prompt_template()
+        pdf_text_cap = CUSTOM_PDF_TEXT_TOKENS if self.custom_prompt else None
+        fixed, elastic = self._prompt_fields(paper, pdf_text_cap)
+        values, truncated = self.get_prompt_builder().fit(template, fixed, elastic)
+        return render(template, values), 'pdf_text' in truncated or 'full_pdf_text' in truncated
+    
+    def get_chunk_prompts(self, paper: Dict[str, Any]) -> List[str]:
+        """
+        Split the paper text into token-bounded chunks and build their prompts.
         
-        # Replace all placeholders in the template
-        formatted_prompt = prompt_template
-        for placeholder, value in placeholders.items():
-            formatted_prompt = formatted_prompt.replace(placeholder, str(value))
+        Chunks are grown when needed so a paper never has more than max_chunks.
         
-        return formatted_prompt
+        Args:
+            paper: Paper information dictionary
+            
+        Returns:
+            One prompt per chunk
+        """
+        text = materialize_text(paper.get('pdf_text'))
+        chunk_tokens = max(self.chunk_tokens, math.ceil(count_tokens(text, self.model_name) / self.max_chunks))
+        chunks = split_into_chunks(text, chunk_tokens, self.model_name)
+        return [
+            CHUNK_SUMMARY_PROMPT.format(title=paper.get('title', ''), index=i, total=len(chunks), chunk=chunk)
+            for i, chunk in enumerate(chunks, 1)
+        ]
+    
+    def get_reduce_prompt(self, paper: Dict[str, Any], chunk_summaries: List[str]) -> str:
+        """
+        Build the final prompt from the chunk summaries, using the normal template.
+        
+        Args:
+            paper: Paper information dictionary
+            chunk_summaries: Summaries of the paper's chunks, in order
+            
+        Returns:
+            Prompt string for the LLM
+        """
+        notes = f"以下为论文全文分 {len(chunk_summaries)} 部分提取的要点：\n\n" + "\n\n".join(
+            f"[第{i}部分]\n{summary}" for i, summary in enumerate(chunk_summaries, 1)
+        )
+        reduce_paper = dict(paper.items())
+        reduce_paper['pdf_text'] = notes
+        return self.get_summary_prompt(reduce_paper)
     
     def set_custom_prompt(self, custom_prompt: str):
         """
@@ -182,25 +402,61 @@ class LLMSummarizer:
             '{arxiv_id}'
         ]
     
-    def summarize(self, paper: Dict[str, Any]) -> str:
+    def summarize(self, paper: Dict[str, Any], refresh: bool = False) -> str:
         """
         Generate a summary for a paper using an LLM.
         This is a placeholder that should be implemented by subclasses.
         
         Args:
             paper: Paper information dictionary
+            refresh: Ignore cached summaries and call the LLM again
             
         Returns:
             Summary string
         """
         raise NotImplementedError("Subclasses must implement this method")
+    
+    async def summarize_async(self, paper: Dict[str, Any], refresh: bool = False) -> str:
+        """
+        Asynchronous summarize. The default runs summarize in the event loop's
+        executor; subclasses with async clients override it.
+        
+        Args:
+            paper: Paper information dictionary
+            refresh: Ignore cached summaries and call the LLM again
+            
+        Returns:
+            Summary string
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.summarize(paper, refresh=refresh))
+    
+    def summarize_stream(self, paper: Dict[str, Any], refresh: bool = False) -> Iterator[str]:
+        """
+        Stream a summary while it is generated. The default yields the whole
+        summary at once; subclasses with streaming APIs override it.
+        
+        Args:
+            paper: Paper information dictionary
+            refresh: Ignore cached summaries and call the LLM again
+            
+        Yields:
+            Text chunks. If the call fails the last chunk is a SummaryFailure;
+            text yielded before it is incomplete and is not cached.
+        """
+        yield self.summarize(paper, refresh=refresh)
+    
+    async def summarize_stream_async(self, paper: Dict[str, Any], refresh: bool = False) -> AsyncIterator[str]:
+        """Asynchronous version of summarize_stream."""
+        yield await self.summarize_async(paper, refresh=refresh)
 
 class OpenAISummarizer(LLMSummarizer):
     """
     OpenAI-based paper summarizer.
     """
     
-    def __init__(self, model_name: str = None, api_key: str = None, base_url: str = None, custom_prompt: str = None):
+    def __init__(self, model_name: str = None, api_key: str = None, base_url: str = None, custom_prompt: str = None,
+                 map_reduce: bool = False, hedge: Optional[HedgePolicy] = None):
         """
         Initialize the OpenAI summarizer.
         
@@ -209,10 +465,27 @@ class OpenAISummarizer(LLMSummarizer):
             api_key: OpenAI API key
             base_url: OpenAI API base URL
             custom_prompt: Custom prompt template for summarization
+            map_reduce: Summarize long papers chunk by chunk (see LLMSummarizer)
+            hedge: Send a duplicate of requests slower than the policy's latency
+                percentile (see llm.hedging); None disables hedging
         """
-        super().__init__(model_name, custom_prompt)
+        super().__init__(model_name, custom_prompt, map_reduce)
+        self.hedge = hedge
+        self._hedge_summarizer = None
         self.api_key = api_key or os.environ.get("API_KEY")
         self.base_url = base_url or os.environ.get("BASE_URL")
+        self.provider = "doubao" if (self.base_url and "ark-cn-beijing" in self.base_url) else "openai"
+        if self.provider == "doubao":
+            self.max_output_tokens = 2000
+        # 每个线程最近一次调用消耗的token数，写入缓存用于统计节省的开销
+        self._usage = threading.local()
+        # 异步客户端绑定在创建它的事件循环上，每个循环各用一份
+        self._async_clients = weakref.WeakKeyDictionary()
+        # 同一个端点（base_url + 模型）的所有线程和事件循环共享一个自适应并发上限和熔断器
+        endpoint = f"{self.base_url or 'openai'}|{self.model_name}"
+        self.limiter = get_limiter(endpoint)
+        self.breaker = get_breaker(endpoint)
+        self.retry_policy = RetryPolicy()
         
         if not self.api_key:
             raise ValueError("OpenAI API key not provided")
@@ -220,170 +493,825 @@ class OpenAISummarizer(LLMSummarizer):
         try:
             import openai
             from openai import OpenAI
-            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+            # 重试由 resilience 层统一处理，关闭客户端自带的重试
+            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
         except Exception as e:
             # 根据内容，自己返回
             raise e
     
-    def summarize(self, paper: Dict[str, Any]) -> str:
+    def summarize(self, paper: Dict[str, Any], refresh: bool = False) -> str:
         """
         Generate a summary for a paper using OpenAI or Doubao API.
         
+        Concurrent calls for the same paper and variant are coalesced: only
+        the first calls the LLM and the others get its result. This covers
+        threads and coroutines of this process, and other processes sharing
+        the cache (through a lease in the cache database).
+        
         Args:
             paper: Paper information dictionary
+            refresh: Ignore cached summaries (and cached empty responses) and call the LLM again
             
         Returns:
-            Summary string
+            Summary string, or a SummaryFailure (an empty string) saying why none was produced
         """
-        # 获取缓存实例
-        cache = get_paper_cache()
+        cached_summary, prompt, variant, cache_key, map_reduce = self._prepare(paper, refresh)
+        if prompt is None:
+            return cached_summary
+        if not cache_key:
+            return self._generate(paper, prompt, variant, cache_key, map_reduce)
+        # 同一篇论文同时只发起一次调用，其他调用方（本进程的线程、共享缓存的其他进程）等待其结果
+        return _inflight.do(cache_key, lambda: self._generate_leased(paper, prompt, variant, cache_key, map_reduce))
+    
+    def _generate(self, paper: Dict[str, Any], prompt: str, variant: Dict[str, str], cache_key: Optional[str],
+                  map_reduce: bool = False) -> str:
+        """Call the LLM for a paper that missed the cache and record the result."""
+        start_time = time.perf_counter()
+        map_tokens = 0
+        if map_reduce:
+            prompt, map_tokens = self._map_reduce_prompt(paper)
+            if isinstance(prompt, SummaryFailure):
+                return prompt
         
-        # 设置当前模型信息到缓存
-        provider = "doubao" if (self.base_url and "ark-cn-beijing" in self.base_url) else "openai"
-        cache.set_model_info(provider, self.model_name)
+        summary, tokens = self._complete(prompt, "reduce" if map_reduce else "summary")
+        latency_s = time.perf_counter() - start_time
         
-        # 检查缓存
-        cached_summary = cache.get_cached_summary(paper)
-        if cached_summary:
-            return cached_summary
+        self._record(paper, variant, cache_key, summary, latency_s, (tokens or 0) + map_tokens or None)
+        return summary
+    
+    def _generate_leased(self, paper: Dict[str, Any], prompt: str, variant: Dict[str, str], cache_key: str,
+                         map_reduce: bool = False) -> str:
+        """_generate under the cross-process lease of the cache key."""
+        owner = self._lease_owner()
+        try:
+            found = self._acquire_lease(paper, variant, cache_key, owner)
+            if found is not None:
+                return found
+            return self._generate(paper, prompt, variant, cache_key, map_reduce)
+        finally:
+            get_paper_cache().release_inflight(cache_key, owner)
+    
+    async def _generate_leased_async(self, paper: Dict[str, Any], prompt: str, variant: Dict[str, str], cache_key: str,
+                                     map_reduce: bool = False) -> str:
+        """Asynchronous version of _generate_leased."""
+        loop = asyncio.get_running_loop()
+        owner = self._lease_owner()
+        try:
+            found = await self._acquire_lease_async(paper, variant, cache_key, owner)
+            if found is not None:
+                return found
+            return await self._generate_async(paper, prompt, variant, cache_key, map_reduce)
+        finally:
+            await loop.run_in_executor(None, get_paper_cache().release_inflight, cache_key, owner)
+    
+    @staticmethod
+    def _lease_owner() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def _acquire_lease(self, paper: Dict[str, Any], variant: Dict[str, str], cache_key: str, owner: str) -> Optional[str]:
+        """
+        Take the cross-process lease of a cache key, waiting while another process holds it.
         
-        # 没有缓存，生成新的摘要
-        prompt = self.get_summary_prompt(paper)
+        Returns:
+            None once the lease is held and the LLM should be called; the
+            summary (or a SummaryFailure) if the other process produced one
+            while this one was waiting
+        """
+        cache = get_paper_cache()
+        if cache.acquire_inflight(cache_key, owner, INFLIGHT_LEASE_S):
+            return None
+        print(f"⏳ 其他进程正在总结同一篇论文，等待其结果: {paper.get('title', 'Unknown')[:50]}...")
+        # 轮询只读查询租约，租约释放或过期后才尝试写入获取
+        while True:
+            time.sleep(INFLIGHT_POLL_S)
+            if not cache.is_inflight(cache_key) and cache.acquire_inflight(cache_key, owner, INFLIGHT_LEASE_S):
+                break
+        return self._lookup_after_wait(paper, variant, cache_key)
+    
+    async def _acquire_lease_async(self, paper: Dict[str, Any], variant: Dict[str, str], cache_key: str, owner: str) -> Optional[str]:
+        """Asynchronous version of _acquire_lease."""
+        loop = asyncio.get_running_loop()
+        cache = get_paper_cache()
+        if await loop.run_in_executor(None, cache.acquire_inflight, cache_key, owner, INFLIGHT_LEASE_S):
+            return None
+        print(f"⏳ 其他进程正在总结同一篇论文，等待其结果: {paper.get('title', 'Unknown')[:50]}...")
+        while True:
+            await asyncio.sleep(INFLIGHT_POLL_S)
+            if await loop.run_in_executor(None, cache.is_inflight, cache_key):
+                continue
+            if await loop.run_in_executor(None, cache.acquire_inflight, cache_key, owner, INFLIGHT_LEASE_S):
+                break
+        return await loop.run_in_executor(None, self._lookup_after_wait, paper, variant, cache_key)
+    
+    def _lookup_after_wait(self, paper: Dict[str, Any], variant: Dict[str, str], cache_key: str) -> Optional[str]:
+        """Result left in the cache by the process that held the lease, if any."""
+        cache = get_paper_cache()
+        summary = cache.get_cached_summary(paper, variant)
+        if summary:
+            self._count_usage(cache_hits=1)
+            return summary
+        if cache.get_failure('empty_llm_response', cache_key):
+            return SummaryFailure(EMPTY_RESPONSE, "LLM最近返回空结果")
+        # 对方调用失败且没有留下结果，由本进程重新调用
+        return None
+    
+    def _complete(self, prompt: str, kind: str = "summary") -> Tuple[str, Optional[int]]:
+        """
+        Send one prompt to the configured API, hedged if a hedge policy is set.
         
+        Args:
+            prompt: Prompt to send
+            kind: Kind of call ("summary", "chunk", "reduce", "triage"); the
+                hedge policy keeps the latencies of each kind apart
+            
+        Returns:
+            (summary or SummaryFailure, tokens)
+        """
+        if self.hedge is None:
+            return self._complete_once(prompt)
+        target = self._hedge_target()
+        return self.hedge.run(lambda: self._complete_once(prompt), lambda: target._complete_once(prompt),
+                              label=self.model_name, kind=kind)
+    
+    async def _complete_async(self, prompt: str, kind: str = "summary") -> Tuple[str, Optional[int]]:
+        """Asynchronous version of _complete."""
+        if self.hedge is None:
+            return await self._complete_once_async(prompt)
+        target = self._hedge_target()
+        return await self.hedge.run_async(lambda: self._complete_once_async(prompt),
+                                          lambda: target._complete_once_async(prompt), label=self.model_name,
+                                          kind=kind)
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        Usage of this summarizer (see LLMSummarizer.get_usage_stats).
+        
+        Returns:
+            Usage dictionary; with a hedge policy it also holds the hedging
+            stats under 'hedge'
+        """
+        stats = super().get_usage_stats()
+        if self.hedge is not None:
+            stats['hedge'] = self.hedge.stats()
+        return stats
+    
+    def _hedge_target(self) -> 'OpenAISummarizer':
+        """Summarizer that sends hedge requests: this one, or one for the policy's endpoint or key."""
+        if not (self.hedge.base_url or self.hedge.api_key):
+            return self
+        if self._hedge_summarizer is None:
+            self._hedge_summarizer = OpenAISummarizer(self.model_name, api_key=self.hedge.api_key or self.api_key,
+                                                      base_url=self.hedge.base_url or self.base_url)
+        # 输出上限可能在创建后被调整（如筛选模式），对冲请求与原请求保持一致
+        self._hedge_summarizer.max_output_tokens = self.max_output_tokens
+        return self._hedge_summarizer
+    
+    def _complete_once(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """Send one prompt to the configured API without hedging."""
         # 检查是否使用豆包API（通过base_url判断）
-        if self.base_url and "ark-cn-beijing" in self.base_url:
+        self._usage.tokens = None
+        if self.provider == "doubao":
             # 使用豆包API
             summary = self._summarize_with_doubao(prompt)
         else:
             # 使用标准OpenAI API
             summary = self._summarize_with_openai(prompt)
+        return summary, self._usage.tokens
+    
+    async def _complete_once_async(self, prompt: str) -> Tuple[str, Optional[int]]:
+        if self.provider == "doubao":
+            return await self._summarize_with_doubao_async(prompt)
+        return await self._summarize_with_openai_async(prompt)
+    
+    def _chunk_key(self, chunk_prompt: str) -> str:
+        return hashlib.sha256(f"{self.provider}|{self.model_name}|{chunk_prompt}".encode('utf-8')).hexdigest()
+    
+    def _summarize_chunk(self, chunk_prompt: str) -> Tuple[str, int]:
+        """Summarize one chunk, reusing the cached result; returns (summary or SummaryFailure, tokens spent)."""
+        cache = get_paper_cache()
+        chunk_key = self._chunk_key(chunk_prompt)
+        cached = cache.get_chunk_summary(chunk_key)
+        if cached:
+            return cached, 0
+        summary, tokens = self._complete(chunk_prompt, "chunk")
+        if summary:
+            cache.cache_chunk_summary(chunk_key, summary, self.model_name, tokens)
+        return summary, tokens or 0
+    
+    async def _summarize_chunk_async(self, chunk_prompt: str) -> Tuple[str, int]:
+        loop = asyncio.get_running_loop()
+        cache = get_paper_cache()
+        chunk_key = self._chunk_key(chunk_prompt)
+        cached = await loop.run_in_executor(None, cache.get_chunk_summary, chunk_key)
+        if cached:
+            return cached, 0
+        summary, tokens = await self._complete_async(chunk_prompt, "chunk")
+        if summary:
+            await loop.run_in_executor(None, cache.cache_chunk_summary, chunk_key, summary, self.model_name, tokens)
+        return summary, tokens or 0
+    
+    def _reduce_prompt(self, paper: Dict[str, Any], results: List[Tuple[str, int]]) -> Tuple[str, int]:
+        """Reduce prompt from chunk results, or the first chunk failure; plus the tokens spent."""
+        tokens = sum(chunk_tokens for _, chunk_tokens in results)
+        for summary, _ in results:
+            if isinstance(summary, SummaryFailure):
+                # 已成功的分块已缓存，下次只需重试失败的分块
+                print(f"❌ 分块总结失败 ({summary.kind}): {paper.get('title', 'Unknown')[:50]}...")
+                return summary, tokens
+        return self.get_reduce_prompt(paper, [summary for summary, _ in results]), tokens
+    
+    def _map_reduce_prompt(self, paper: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        Map stage: summarize all chunks concurrently.
+        
+        Returns:
+            (reduce prompt or SummaryFailure, tokens spent on chunks)
+        """
+        chunk_prompts = self.get_chunk_prompts(paper)
+        print(f"🧩 长论文分块总结: {paper.get('title', 'Unknown')[:50]}... ({len(chunk_prompts)} 块)")
+        with ThreadPoolExecutor(max_workers=max(1, min(self.map_concurrency, len(chunk_prompts)))) as executor:
+            results = list(executor.map(self._summarize_chunk, chunk_prompts))
+        return self._reduce_prompt(paper, results)
+    
+    async def _map_reduce_prompt_async(self, paper: Dict[str, Any]) -> Tuple[str, int]:
+        """Asynchronous version of _map_reduce_prompt."""
+        loop = asyncio.get_running_loop()
+        chunk_prompts = await loop.run_in_executor(None, self.get_chunk_prompts, paper)
+        print(f"🧩 长论文分块总结: {paper.get('title', 'Unknown')[:50]}... ({len(chunk_prompts)} 块)")
+        semaphore = asyncio.Semaphore(max(1, self.map_concurrency))
+        
+        async def run(chunk_prompt):
+            async with semaphore:
+                return await self._summarize_chunk_async(chunk_prompt)
+        
+        results = await asyncio.gather(*(run(chunk_prompt) for chunk_prompt in chunk_prompts))
+        return self._reduce_prompt(paper, list(results))
+    
+    def _prepare(self, paper: Dict[str, Any], refresh: bool = False) -> Tuple[str, Optional[str], Dict[str, str], Optional[str], bool]:
+        """
+        Look the paper up in the cache and build the prompt if an LLM call is needed.
+        
+        Everything that reads the paper text or tokenizes it happens here, so
+        async callers can run it in an executor.
+        
+        Returns:
+            (cached summary or "", prompt or None when no call is needed, cache variant, cache key,
+            whether the paper is summarized chunk by chunk)
+        """
+        # 获取缓存实例
+        cache = get_paper_cache()
+        
+        # 缓存键包含模型、服务商、prompt模板和截断策略
+        variant = self.get_cache_variant()
+        
+        # 旧版JSON缓存的摘要都是用默认模板生成的，使用默认模板时认领一次
+        if not self._legacy_adopted and not self.custom_prompt and not self.map_reduce:
+            self._legacy_adopted = True
+            cache.adopt_legacy_entries(variant)
+        
+        # 检查缓存
+        cached_summary = None if refresh else cache.get_cached_summary(paper, variant)
+        if cached_summary:
+            self._count_usage(cache_hits=1)
+            return cached_summary, None, variant, None, False
+        
+        # 最近返回过空结果的请求暂不重试
+        cache_key = cache.get_cache_key(paper, variant)
+        if not refresh and cache.get_failure('empty_llm_response', cache_key):
+            print(f"⏭️ LLM最近返回空结果，暂不重试: {paper.get('title', 'Unknown')[:50]}...")
+            return SummaryFailure(EMPTY_RESPONSE, "LLM最近返回空结果"), None, variant, cache_key, False
         
-        # 缓存生成的摘要
+        # 没有缓存，生成新的摘要；构建prompt时的截断结果同时决定是否需要分块总结
+        prompt, shortened = self.fit_summary_prompt(paper)
+        map_reduce = self.map_reduce and shortened and bool(paper.get('pdf_text'))
+        return "", prompt, variant, cache_key, map_reduce
+    
+    def _record(self, paper: Dict[str, Any], variant: Dict[str, str], cache_key: Optional[str],
+                summary: str, latency_s: Optional[float], tokens: Optional[int]):
+        """Cache a generated summary, or remember that the LLM returned nothing."""
+        # 批处理结果没有单次调用的耗时（latency_s 为None）
+        self._count_usage(calls=1, failures=0 if summary else 1, tokens=tokens or 0, latency_s=latency_s or 0)
+        cache = get_paper_cache()
         if summary:
-            cache.cache_summary(paper, summary)
+            cache.cache_summary(paper, summary, variant, latency_s=latency_s, tokens=tokens)
+        elif isinstance(summary, SummaryFailure) and summary.kind == EMPTY_RESPONSE:
+            cache.remember_failure('empty_llm_response', cache_key, f"{self.provider}/{self.model_name} 返回空结果")
+        # 网络、服务端等其他失败不写入负缓存，下次直接重试
+    
+    async def summarize_async(self, paper: Dict[str, Any], refresh: bool = False) -> str:
+        """
+        Asynchronous version of summarize, sharing the same summary cache.
+        
+        Cache lookups and prompt building (which may read spilled text from
+        disk) run in the default executor so the event loop keeps other
+        requests moving.
+        
+        Args:
+            paper: Paper information dictionary
+            refresh: Ignore cached summaries (and cached empty responses) and call the LLM again
+            
+        Returns:
+            Summary string, or a SummaryFailure (an empty string) saying why none was produced
+        """
+        loop = asyncio.get_running_loop()
+        cached_summary, prompt, variant, cache_key, map_reduce = await loop.run_in_executor(None, self._prepare, paper, refresh)
+        if prompt is None:
+            return cached_summary
+        if not cache_key:
+            return await self._generate_async(paper, prompt, variant, cache_key, map_reduce)
+        return await _inflight.do_async(
+            cache_key, lambda: self._generate_leased_async(paper, prompt, variant, cache_key, map_reduce))
+    
+    async def _generate_async(self, paper: Dict[str, Any], prompt: str, variant: Dict[str, str], cache_key: Optional[str],
+                              map_reduce: bool = False) -> str:
+        """Asynchronous version of _generate."""
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        map_tokens = 0
+        if map_reduce:
+            prompt, map_tokens = await self._map_reduce_prompt_async(paper)
+            if isinstance(prompt, SummaryFailure):
+                return prompt
+        
+        summary, tokens = await self._complete_async(prompt, "reduce" if map_reduce else "summary")
+        latency_s = time.perf_counter() - start_time
         
+        await loop.run_in_executor(None, self._record, paper, variant, cache_key, summary, latency_s,
+                                   (tokens or 0) + map_tokens or None)
         return summary
     
-    def _summarize_with_openai(self, prompt: str) -> str:
-        """使用标准OpenAI API进行总结"""
+    def summarize_stream(self, paper: Dict[str, Any], refresh: bool = False) -> Iterator[str]:
+        """
+        Stream a summary from OpenAI or Doubao while it is generated.
+        
+        Opening the stream is retried like a normal request; once text has
+        started arriving a failure ends the stream. Only a completed summary
+        is written to the cache.
+        
+        Args:
+            paper: Paper information dictionary
+            refresh: Ignore cached summaries (and cached empty responses) and call the LLM again
+            
+        Yields:
+            Text chunks (a cached summary comes as one chunk). If the call fails
+            the last chunk is a SummaryFailure; text yielded before it is
+            incomplete and is not cached.
+        """
+        cached_summary, prompt, variant, cache_key, map_reduce = self._prepare(paper, refresh)
+        if prompt is None:
+            yield cached_summary
+            return
+        if not cache_key:
+            yield from self._stream(paper, prompt, variant, cache_key, map_reduce)
+            return
+        
+        while True:
+            future, leader = _inflight.join(cache_key)
+            if leader:
+                break
+            try:
+                # 同一篇论文正在由其他调用总结，等待其结果后整体输出
+                yield future.result()
+                return
+            except CancelledError:
+                continue
+        
+        owner = self._lease_owner()
+        summary = None
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a helpful AI assistant that summarizes research papers."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1024
-            )
+            summary = self._acquire_lease(paper, variant, cache_key, owner)
+            if summary is not None:
+                yield summary
+            else:
+                summary = yield from self._stream(paper, prompt, variant, cache_key, map_reduce)
+        finally:
+            get_paper_cache().release_inflight(cache_key, owner)
+            # 调用方中途停止读取时没有结果，等待的调用方会重新发起
+            _inflight.finish(cache_key, future, summary, abandoned=summary is None)
+    
+    def _stream(self, paper: Dict[str, Any], prompt: str, variant: Dict[str, str], cache_key: Optional[str],
+                map_reduce: bool = False) -> Iterator[str]:
+        """
+        Stream the LLM's answer for a paper that missed the cache and record it.
+        
+        Yields:
+            Text chunks, then a SummaryFailure if the call failed
+            
+        Returns:
+            The complete summary or the SummaryFailure
+        """
+        start_time = time.perf_counter()
+        map_tokens = 0
+        if map_reduce:
+            # 分块总结不流式输出，只流式输出最后的汇总
+            prompt, map_tokens = self._map_reduce_prompt(paper)
+            if isinstance(prompt, SummaryFailure):
+                yield prompt
+                return prompt
+        
+        open_stream = self._open_doubao_stream if self.provider == "doubao" else self._open_openai_stream
+        events = call_with_retries(lambda timeout: open_stream(prompt, timeout), self.breaker, self.limiter,
+                                   self.retry_policy, hold_slot=True, **self._retry_options())
+        if isinstance(events, SummaryFailure):
+            yield events
+            return events
+        
+        parts, tokens, failure = [], None, None
+        try:
+            for delta, usage_tokens in events:
+                tokens = usage_tokens or tokens
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            failure = self._stream_failure(e)
+        finally:
+            # 整个流读取期间占用并发槽
+            self.limiter.release()
+            events.close()
+        if failure is not None:
+            yield failure
+            return failure
+        
+        summary, tokens = self._finish((''.join(parts), tokens))
+        self._record(paper, variant, cache_key, summary, time.perf_counter() - start_time, (tokens or 0) + map_tokens or None)
+        if isinstance(summary, SummaryFailure):
+            yield summary
+        return summary
+    
+    async def summarize_stream_async(self, paper: Dict[str, Any], refresh: bool = False) -> AsyncIterator[str]:
+        """
+        Asynchronous version of summarize_stream.
+        
+        Args:
+            paper: Paper information dictionary
+            refresh: Ignore cached summaries (and cached empty responses) and call the LLM again
             
-            return response.choices[0].message.content
+        Yields:
+            Text chunks; on failure the last chunk is a SummaryFailure
+        """
+        loop = asyncio.get_running_loop()
+        cached_summary, prompt, variant, cache_key, map_reduce = await loop.run_in_executor(None, self._prepare, paper, refresh)
+        if prompt is None:
+            yield cached_summary
+            return
+        if not cache_key:
+            async for chunk in self._stream_async(paper, prompt, variant, cache_key, map_reduce, []):
+                yield chunk
+            return
+        
+        while True:
+            future, leader = _inflight.join(cache_key)
+            if leader:
+                break
+            try:
+                yield await asyncio.shield(asyncio.wrap_future(future))
+                return
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+        
+        owner = self._lease_owner()
+        result = []
+        try:
+            found = await self._acquire_lease_async(paper, variant, cache_key, owner)
+            if found is not None:
+                result.append(found)
+                yield found
+            else:
+                async for chunk in self._stream_async(paper, prompt, variant, cache_key, map_reduce, result):
+                    yield chunk
+        finally:
+            await loop.run_in_executor(None, get_paper_cache().release_inflight, cache_key, owner)
+            _inflight.finish(cache_key, future, result[0] if result else None, abandoned=not result)
+    
+    async def _stream_async(self, paper: Dict[str, Any], prompt: str, variant: Dict[str, str], cache_key: Optional[str],
+                            map_reduce: bool, result: List[str]) -> AsyncIterator[str]:
+        """Asynchronous version of _stream; the complete summary or SummaryFailure is appended to result."""
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        map_tokens = 0
+        if map_reduce:
+            prompt, map_tokens = await self._map_reduce_prompt_async(paper)
+            if isinstance(prompt, SummaryFailure):
+                result.append(prompt)
+                yield prompt
+                return
+        
+        open_stream = self._open_doubao_stream_async if self.provider == "doubao" else self._open_openai_stream_async
+        events = await call_with_retries_async(lambda timeout: open_stream(prompt, timeout), self.breaker,
+                                               self.limiter, self.retry_policy, hold_slot=True,
+                                               **self._retry_options())
+        if isinstance(events, SummaryFailure):
+            result.append(events)
+            yield events
+            return
+        
+        parts, tokens, failure = [], None, None
+        try:
+            async for delta, usage_tokens in events:
+                tokens = usage_tokens or tokens
+                if delta:
+                    parts.append(delta)
+                    yield delta
         except Exception as e:
-            print(f"Error generating summary: {e}")
-            return ""
+            failure = self._stream_failure(e)
+        finally:
+            self.limiter.release()
+            await events.aclose()
+        if failure is not None:
+            result.append(failure)
+            yield failure
+            return
+        
+        summary, tokens = self._finish((''.join(parts), tokens))
+        await loop.run_in_executor(None, self._record, paper, variant, cache_key, summary,
+                                   time.perf_counter() - start_time, (tokens or 0) + map_tokens or None)
+        result.append(summary)
+        if isinstance(summary, SummaryFailure):
+            yield summary
+    
+    def _retry_options(self) -> Dict[str, Any]:
+        """Provider-specific options for call_with_retries."""
+        if self.provider == "doubao":
+            return dict(label="豆包API", retryable_statuses=DOUBAO_RETRYABLE_STATUSES)
+        return dict(label=self.model_name)
+    
+    @staticmethod
+    def _stream_failure(error: Exception) -> SummaryFailure:
+        error = classify_exception(error)
+        print(f"❌ 流式输出中断 ({error.kind}): {error.message}")
+        return SummaryFailure(error.kind, error.message, error.status_code)
+    
+    @staticmethod
+    def _openai_chunk_event(chunk) -> Tuple[str, Optional[int]]:
+        """(text delta, total tokens if reported) of a streamed chat completion chunk."""
+        choices = getattr(chunk, 'choices', None)
+        delta = choices[0].delta.content if choices else None
+        usage = getattr(chunk, 'usage', None)
+        return delta or '', getattr(usage, 'total_tokens', None)
+    
+    @staticmethod
+    def _doubao_sse_event(line: Union[str, bytes]) -> Optional[Tuple[str, Optional[int]]]:
+        """Parse one server-sent event line of a Doubao stream; None for non-data lines and [DONE]."""
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.startswith('data:'):
+            return None
+        data = line[5:].strip()
+        if not data or data == '[DONE]':
+            return None
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or []
+        delta = (choices[0].get("delta") or {}).get("content") if choices else None
+        return delta or '', (chunk.get("usage") or {}).get("total_tokens")
+    
+    def _open_openai_stream(self, prompt: str, timeout: float) -> Iterator[Tuple[str, Optional[int]]]:
+        stream = self.client.chat.completions.create(**self._openai_request(prompt), stream=True, timeout=timeout)
+        
+        def events():
+            try:
+                for chunk in stream:
+                    yield self._openai_chunk_event(chunk)
+            finally:
+                stream.close()
+        return events()
+    
+    def _open_doubao_stream(self, prompt: str, timeout: float) -> Iterator[Tuple[str, Optional[int]]]:
+        import requests
+        headers, payload = self._doubao_request(prompt)
+        response = requests.post(
+            self.base_url, headers=headers, json=dict(payload, stream=True), stream=True,
+            timeout=(self.retry_policy.connect_timeout, timeout)
+        )
+        if response.status_code != 200:
+            response.close()
+            self._raise_for_doubao_status(response.status_code, response.headers)
+        
+        def events():
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    event = self._doubao_sse_event(line)
+                    if event is not None:
+                        yield event
+            finally:
+                response.close()
+        return events()
+    
+    async def _open_openai_stream_async(self, prompt: str, timeout: float) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        client, _ = self._get_async_clients()
+        stream = await client.chat.completions.create(**self._openai_request(prompt), stream=True, timeout=timeout)
+        
+        async def events():
+            try:
+                async for chunk in stream:
+                    yield self._openai_chunk_event(chunk)
+            finally:
+                await stream.close()
+        return events()
+    
+    async def _open_doubao_stream_async(self, prompt: str, timeout: float) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        import httpx
+        _, http_client = self._get_async_clients()
+        headers, payload = self._doubao_request(prompt)
+        request = http_client.build_request(
+            "POST", self.base_url, headers=headers, json=dict(payload, stream=True),
+            timeout=httpx.Timeout(timeout, connect=self.retry_policy.connect_timeout)
+        )
+        response = await http_client.send(request, stream=True)
+        if response.status_code != 200:
+            await response.aclose()
+            self._raise_for_doubao_status(response.status_code, response.headers)
+        
+        async def events():
+            try:
+                async for line in response.aiter_lines():
+                    event = self._doubao_sse_event(line)
+                    if event is not None:
+                        yield event
+            finally:
+                await response.aclose()
+        return events()
+    
+    def _get_async_clients(self):
+        """Return (AsyncOpenAI client, httpx.AsyncClient) for the running event loop."""
+        loop = asyncio.get_running_loop()
+        clients = self._async_clients.get(loop)
+        if clients is None:
+            import httpx
+            from openai import AsyncOpenAI
+            clients = (
+                AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0),
+                httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=None, max_keepalive_connections=50)),
+            )
+            self._async_clients[loop] = clients
+        return clients
+    
+    def _openai_request(self, prompt: str) -> Dict[str, Any]:
+        """Arguments of a chat completion request to the OpenAI API."""
+        return dict(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": "You are a helpful AI assistant that summarizes research papers."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=self.max_output_tokens
+        )
+    
+    def _doubao_request(self, prompt: str) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Headers and JSON payload of a Doubao request."""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.3,
+            "max_tokens": self.max_output_tokens,
+            # "thinking": {"type": "disabled"}
+        }
+        return headers, payload
+    
+    @staticmethod
+    def _parse_openai_response(response) -> Tuple[str, Optional[int]]:
+        usage = getattr(response, 'usage', None)
+        return response.choices[0].message.content, getattr(usage, 'total_tokens', None)
+    
+    @staticmethod
+    def _raise_for_doubao_status(status_code: int, headers):
+        if status_code != 200:
+            raise ProviderError(classify_status(status_code, DOUBAO_RETRYABLE_STATUSES),
+                                f"豆包API返回{status_code}", status_code,
+                                parse_retry_after(headers.get('Retry-After')))
+    
+    @classmethod
+    def _parse_doubao_response(cls, status_code: int, headers, read_json: Callable[[], Any]) -> Tuple[str, Optional[int]]:
+        """Extract (content, tokens) from a Doubao response, raising ProviderError on failure."""
+        cls._raise_for_doubao_status(status_code, headers)
+        try:
+            result = read_json()
+        except ValueError as json_error:
+            raise ProviderError(INVALID_RESPONSE, f"JSON解析失败: {json_error}", status_code)
+        if "choices" in result and len(result["choices"]) > 0:
+            content = result["choices"][0].get("message", {}).get("content", "")
+            return content, (result.get("usage") or {}).get("total_tokens")
+        raise ProviderError(INVALID_RESPONSE, f"API响应格式异常: {str(result)[:200]}", status_code)
+    
+    def _finish(self, result: Union[Tuple[str, Optional[int]], SummaryFailure]) -> Tuple[str, Optional[int]]:
+        """Turn a provider result into (summary or SummaryFailure, tokens)."""
+        if isinstance(result, SummaryFailure):
+            return result, None
+        content, tokens = result
+        if not content:
+            return SummaryFailure(EMPTY_RESPONSE, f"{self.provider}/{self.model_name} 返回空结果"), tokens
+        return content, tokens
+    
+    async def _summarize_with_openai_async(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """使用标准OpenAI API进行总结（异步），返回 (摘要, token数)"""
+        client, _ = self._get_async_clients()
+        
+        async def request(timeout):
+            response = await client.chat.completions.create(**self._openai_request(prompt), timeout=timeout)
+            return self._parse_openai_response(response)
+        
+        return self._finish(await call_with_retries_async(
+            request, self.breaker, self.limiter, self.retry_policy, label=self.model_name))
+    
+    async def _summarize_with_doubao_async(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """使用豆包API进行总结（异步，重试策略与同步版本一致），返回 (摘要, token数)"""
+        import httpx
+        _, http_client = self._get_async_clients()
+        headers, payload = self._doubao_request(prompt)
+        
+        async def request(timeout):
+            response = await http_client.post(
+                self.base_url, headers=headers, json=payload,
+                timeout=httpx.Timeout(timeout, connect=self.retry_policy.connect_timeout)
+            )
+            return self._parse_doubao_response(response.status_code, response.headers, response.json)
+        
+        return self._finish(await call_with_retries_async(
+            request, self.breaker, self.limiter, self.retry_policy, label="豆包API",
+            retryable_statuses=DOUBAO_RETRYABLE_STATUSES))
+    
+    def _summarize_with_openai(self, prompt: str) -> str:
+        """使用标准OpenAI API进行总结"""
+        def request(timeout):
+            response = self.client.chat.completions.create(**self._openai_request(prompt), timeout=timeout)
+            return self._parse_openai_response(response)
+        
+        summary, self._usage.tokens = self._finish(call_with_retries(
+            request, self.breaker, self.limiter, self.retry_policy, label=self.model_name))
+        return summary
     
     def _summarize_with_doubao(self, prompt: str) -> str:
         """使用豆包API进行总结"""
-        try:
-            import requests
-            import time
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            payload = {
-                "model": self.model_name,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.3,
-                "max_tokens": 2000,
-                # "thinking": {"type": "disabled"}
-            }
-            print(f"base_url: {self.base_url}, model_name: {self.model_name}, api_key: {self.api_key}")
-
-
-            max_retries = 5  # 增加重试次数
-            for attempt in range(max_retries):
-                try:
-                    response = requests.post(
-                        self.base_url,
-                        headers=headers,
-                        json=payload,
-                        timeout=120
-                    )
+        import requests
+        headers, payload = self._doubao_request(prompt)
+        
+        def request(timeout):
+            response = requests.post(
+                self.base_url, headers=headers, json=payload,
+                timeout=(self.retry_policy.connect_timeout, timeout)
+            )
+            return self._parse_doubao_response(response.status_code, response.headers, response.json)
+        
+        summary, self._usage.tokens = self._finish(call_with_retries(
+            request, self.breaker, self.limiter, self.retry_policy, label="豆包API",
+            retryable_statuses=DOUBAO_RETRYABLE_STATUSES))
+        return summary
 
-                    # print(f"🔍 响应状态码: {response.status_code}")
-                    # print(f"🔍 响应头: {dict(response.headers)}")
-                    # print(f"🔍 响应内容: {response.text}")
-                    
-                    # 检查响应状态
-                    if response.status_code == 200:
-                        try:
-                            result = response.json()
-                            if "choices" in result and len(result["choices"]) > 0:
-                                content = result["choices"][0].get("message", {}).get("content", "")
-                                return content
-                            else:
-                                print(f"⚠️  API响应格式异常: {result}")
-                                return ""
-                        except Exception as json_error:
-                            print(f"❌ JSON解析失败: {json_error}")
-                            print(f"🔍 原始响应内容: {response.text}")
-                            return ""
-                    
-                    elif response.status_code == 404:
-                        # 404错误特殊处理 - 可能是临时性问题
-                        wait_time = 2 * (2 ** attempt)  # 更长的等待时间
-                        print(f"🔄 遇到404错误，{wait_time}秒后重试 (尝试 {attempt + 1}/{max_retries})")
-                        if attempt < max_retries - 1:
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            print(f"❌ 豆包API服务暂时不可用 (404)，已达到最大重试次数")
-                            return ""
-                    
-                    elif response.status_code == 429:
-                        # 速率限制
-                        wait_time = 5 * (2 ** attempt)
-                        print(f"⏰ 速率限制，{wait_time}秒后重试 (尝试 {attempt + 1}/{max_retries})")
-                        if attempt < max_retries - 1:
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            print(f"❌ 达到速率限制，已达到最大重试次数")
-                            return ""
-                    
-                    else:
-                        # 其他HTTP错误
-                        response.raise_for_status()
-                    
-                except requests.exceptions.RequestException as e:
-                    wait_time = 1 * (2 ** attempt)
-                    if attempt < max_retries - 1:
-                        print(f"🌐 网络请求失败，{wait_time}秒后重试 (尝试 {attempt + 1}/{max_retries}): {e}")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"❌ 网络请求最终失败: {e}")
-                        return ""
-                        
-                except Exception as e:
-                    wait_time = 1 * (2 ** attempt)
-                    if attempt < max_retries - 1:
-                        print(f"🔧 其他错误，{wait_time}秒后重试 (尝试 {attempt + 1}/{max_retries}): {e}")
-                        print(f"🔍 异常详情: {type(e).__name__}: {str(e)}")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"❌ 豆包API调用最终失败: {e}")
-                        print(f"🔍 异常详情: {type(e).__name__}: {str(e)}")
-                        return ""
-                        
-        except Exception as e:
-            print(f"❌ 豆包API初始化错误: {e}")
-            return ""
+async def summarize_papers_async(summarizer: LLMSummarizer,
+                                 papers: List[Dict[str, Any]],
+                                 concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+                                 refresh: bool = False,
+                                 on_result: Optional[Callable[[int, str], None]] = None,
+                                 on_chunk: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    """
+    Summarize many papers concurrently, with at most `concurrency` requests in flight.
+    
+    Args:
+        summarizer: Summarizer with a summarize_async method
+        papers: Paper dictionaries
+        concurrency: Maximum number of concurrent summaries
+        refresh: Ignore cached summaries
+        on_result: Called as on_result(index, summary) when each paper finishes
+            (on the event loop thread, e.g. to update a progress display)
+        on_chunk: If set, summaries are streamed and on_chunk(index, text) is
+            called with every chunk as it arrives (on the event loop thread)
+        
+    Returns:
+        Summaries in the same order as papers
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def stream(index: int, paper: Dict[str, Any]) -> str:
+        parts, failure = [], None
+        async for chunk in summarizer.summarize_stream_async(paper, refresh=refresh):
+            if isinstance(chunk, SummaryFailure):
+                failure = chunk
+            elif chunk:
+                parts.append(chunk)
+                on_chunk(index, chunk)
+        return failure if failure is not None else ''.join(parts)
+    
+    async def run(index: int, paper: Dict[str, Any]) -> str:
+        async with semaphore:
+            if on_chunk is None:
+                summary = await summarizer.summarize_async(paper, refresh=refresh)
+            else:
+                summary = await stream(index, paper)
+        if on_result is not None:
+            on_result(index, summary)
+        return summary
+    
+    return await asyncio.gather(*(run(i, paper) for i, paper in enumerate(papers)))
 
 # Factory function to get the appropriate summarizer
-def get_summarizer(provider: str = "openai", model_name: str = None, custom_prompt: str = None) -> LLMSummarizer:
+def get_summarizer(provider: str = "openai", model_name: str = None, custom_prompt: str = None,
+                   map_reduce: bool = False, hedge: Optional[HedgePolicy] = None) -> LLMSummarizer:
     """
     Get a summarizer instance based on the provider.
     
@@ -391,11 +1319,14 @@ def get_summarizer(provider: str = "openai", model_name: str = None, custom_prom
         provider: LLM provider (e.g., "openai", "anthropic")
         model_name: Name of the model to use
         custom_prompt: Custom prompt template for summarization
+        map_reduce: Summarize long papers chunk by chunk
+        hedge: Hedge policy for slow requests, defaults to HedgePolicy.from_env()
         
     Returns:
         LLMSummarizer instance
     """
     if provider.lower() == "openai":
-        return OpenAISummarizer(model_name, custom_prompt=custom_prompt)
+        return OpenAISummarizer(model_name, custom_prompt=custom_prompt, map_reduce=map_reduce,
+                                hedge=hedge if hedge is not None else HedgePolicy.from_env())
     else:
         raise ValueError(f"Unsupported provider: {provider}") 
\ No newline at end of file
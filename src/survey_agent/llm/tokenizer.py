@@ -0,0 +1,232 @@
+"""Pluggable token counting and token-bounded text splitting."""
+import math
+import re
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_ENCODING = "cl100k_base"
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?。！？])\s+|\n')
+_encoders = {}
+_registered = {}
+_tokenizers = {}
+
+
+def get_encoder(model_name: Optional[str] = None):
+    """
+    Return the tiktoken encoding for a model.
+
+    Args:
+        model_name: Model name; unknown models use cl100k_base
+
+    Returns:
+        tiktoken Encoding, or None if tiktoken is not installed
+    """
+    if tiktoken is None:
+        return None
+    encoder = _encoders.get(model_name)
+    if encoder is None:
+        try:
+            encoder = tiktoken.encoding_for_model(model_name) if model_name else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            encoder = tiktoken.get_encoding(DEFAULT_ENCODING)
+        _encoders[model_name] = encoder
+    return encoder
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer."""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class Tokenizer:
+    """
+    Counts and truncates text in the tokens of one model family.
+
+    Subclasses implement count and truncate; register them with
+    register_tokenizer to use a model's own tokenizer.
+    """
+
+    name = "base"
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text."""
+        raise NotImplementedError
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text with at most max_tokens tokens."""
+        raise NotImplementedError
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """Cut text into consecutive pieces of at most max_tokens tokens."""
+        pieces = []
+        while text:
+            head = self.truncate(text, max_tokens) or text[:1]
+            pieces.append(head)
+            text = text[len(head):]
+        return pieces
+
+
+class EstimateTokenizer(Tokenizer):
+    """Tokenizer-free estimate: 1 token per CJK character, 1 per 4 other characters."""
+
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text) if text else 0
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count(text) <= max_tokens:
+            return text
+        budget = max_tokens * 4  # 以1/4 token为单位计数
+        for i, char in enumerate(text):
+            budget -= 4 if _CJK_RE.match(char) else 1
+            if budget < 0:
+                return text[:i]
+        return text
+
+
+class TiktokenTokenizer(Tokenizer):
+    """Exact counts with a tiktoken encoding."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return [self.encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def register_tokenizer(model_prefix: str, tokenizer: Tokenizer):
+    """
+    Use a tokenizer for every model whose name starts with model_prefix.
+
+    Args:
+        model_prefix: Model name prefix (e.g. "doubao", "glm-4")
+        tokenizer: Tokenizer instance
+    """
+    _registered[model_prefix] = tokenizer
+    _tokenizers.clear()
+
+
+def get_tokenizer(model_name: Optional[str] = None) -> Tokenizer:
+    """
+    Return the tokenizer for a model.
+
+    Args:
+        model_name: Model name
+
+    Returns:
+        Tokenizer registered for the longest matching prefix, otherwise
+        tiktoken, otherwise the estimate
+    """
+    tokenizer = _tokenizers.get(model_name)
+    if tokenizer is not None:
+        return tokenizer
+    prefixes = [prefix for prefix in _registered if model_name and model_name.startswith(prefix)]
+    if prefixes:
+        tokenizer = _registered[max(prefixes, key=len)]
+    else:
+        encoder = get_encoder(model_name)
+        tokenizer = TiktokenTokenizer(encoder) if encoder is not None else EstimateTokenizer()
+    _tokenizers[model_name] = tokenizer
+    return tokenizer
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text: Text to count
+        model_name: Model whose tokenizer to use
+
+    Returns:
+        Token count (estimated when no tokenizer is available)
+    """
+    return get_tokenizer(model_name).count(text or '')
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: Optional[str] = None) -> str:
+    """
+    Cut text to at most max_tokens tokens.
+
+    Args:
+        text: Text to cut
+        max_tokens: Token limit
+        model_name: Model whose tokenizer to use
+
+    Returns:
+        Longest prefix within the limit
+    """
+    if max_tokens <= 0:
+        return ''
+    return get_tokenizer(model_name).truncate(text or '', max_tokens)
+
+
+def split_into_chunks(text: str, max_tokens: int, model_name: Optional[str] = None) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens tokens.
+
+    Paragraphs are kept together where possible; paragraphs that are too long
+    are split at sentence boundaries, and sentences that are still too long
+    are cut by tokens.
+
+    Args:
+        text: Text to split
+        max_tokens: Maximum tokens per chunk
+        model_name: Model whose tokenizer to use
+
+    Returns:
+        List of chunks
+    """
+    tokenizer = get_tokenizer(model_name)
+    pieces = []  # (text, tokens)
+    for paragraph in _PARAGRAPH_RE.split(text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = tokenizer.count(paragraph)
+        if tokens <= max_tokens:
+            pieces.append((paragraph, tokens))
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            tokens = tokenizer.count(sentence)
+            if tokens <= max_tokens:
+                pieces.append((sentence, tokens))
+            else:
+                pieces.extend((part, tokenizer.count(part)) for part in tokenizer.split(sentence, max_tokens))
+
+    chunks, current, current_tokens = [], [], 0
+    for piece, piece_tokens in pieces:
+        # 段落之间的换行约占1个token
+        if current and current_tokens + piece_tokens + 1 > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens + 1
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -0,0 +1,237 @@
+"""Two-tier summarization: a cheap relevance triage before full summaries."""
+import asyncio
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from tqdm import tqdm
+
+from .summarize import ABSTRACT_MAX_TOKENS, TITLE_MAX_TOKENS, LLMSummarizer
+from ..utils.cache import get_paper_cache, hash_prompt_template
+
+# 相关度达到该分数（0-10）的论文才进行全文总结
+DEFAULT_TRIAGE_THRESHOLD = 6.0
+# 筛选只需要输出分数和一句话总结
+TRIAGE_MAX_OUTPUT_TOKENS = 256
+
+TRIAGE_PROMPT = """### 任务
+你正在为主题为「{query}」的综述筛选论文。请根据论文的标题和摘要，判断这篇论文与该主题的相关程度，并用一句话概括论文。
+
+### 论文标题
+```
+{title}
+```
+
+### 论文摘要
+```
+{abstract}
+```
+
+### 输出格式
+只输出一个JSON对象，不要输出其他内容：
+{"score": <0-10的整数，10表示与主题高度相关，0表示无关>, "tldr": "<不超过80字的中文一句话总结>"}
+"""
+
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+_SCORE_RE = re.compile(r'"?score"?\s*[:：]\s*(\d+(?:\.\d+)?)')
+
+
+def parse_triage_response(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the triage model's answer.
+
+    Args:
+        text: Model output, ideally {"score": ..., "tldr": ...}
+
+    Returns:
+        {'score': float in [0, 10], 'tldr': str}, or None if no score was found
+    """
+    data = None
+    match = _JSON_RE.search(text or '')
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            data = None
+    if not isinstance(data, dict) or 'score' not in data:
+        # 模型没有输出合法JSON时，尽量从文本中找出分数
+        score = _SCORE_RE.search(text or '')
+        if not score:
+            return None
+        data = {'score': score.group(1), 'tldr': ''}
+    try:
+        score = float(data['score'])
+    except (TypeError, ValueError):
+        return None
+    return {'score': min(10.0, max(0.0, score)), 'tldr': str(data.get('tldr') or '').strip()}
+
+
+class PaperTriage:
+    """
+    Score papers' relevance to a survey query with a cheap model.
+    """
+
+    def __init__(self, summarizer: LLMSummarizer, query: str, threshold: float = DEFAULT_TRIAGE_THRESHOLD):
+        """
+        Initialize the triage.
+
+        Args:
+            summarizer: Summarizer of the triage model (an OpenAISummarizer);
+                its output limit is lowered to TRIAGE_MAX_OUTPUT_TOKENS
+            query: Survey topic the papers are scored against
+            threshold: Minimum score for a full summary
+        """
+        self.summarizer = summarizer
+        self.summarizer.max_output_tokens = TRIAGE_MAX_OUTPUT_TOKENS
+        self.query = query
+        self.threshold = threshold
+        self.counts = {'passed': 0, 'skipped': 0, 'failed': 0}
+
+    def get_cache_variant(self) -> Dict[str, str]:
+        """Cache variant of triage results: triage model, prompt and query."""
+        return {
+            'provider': self.summarizer.provider,
+            'model_name': self.summarizer.model_name,
+            'prompt_hash': hash_prompt_template(f"{TRIAGE_PROMPT}\n{self.query}"),
+            'truncation': f"triage:{self.summarizer.get_prompt_builder().policy()}",
+        }
+
+    def get_prompt(self, paper: Dict[str, Any]) -> str:
+        """Triage prompt of a paper: the query, title and abstract only."""
+        elastic = [
+            ('title', str(paper.get('title', '')), TITLE_MAX_TOKENS, False),
+            ('abstract', str(paper.get('summary', '')), ABSTRACT_MAX_TOKENS, False),
+        ]
+        return self.summarizer.get_prompt_builder().build(TRIAGE_PROMPT, {'query': self.query}, elastic)
+
+    def _lookup(self, paper: Dict[str, Any], refresh: bool) -> Optional[Dict[str, Any]]:
+        if refresh:
+            return None
+        cached = get_paper_cache().get_cached_summary(paper, self.get_cache_variant())
+        result = parse_triage_response(cached) if cached else None
+        if result is not None:
+            self.summarizer._count_usage(cache_hits=1)
+        return result
+
+    def _store(self, paper: Dict[str, Any], text: str, latency_s: float, tokens: Optional[int]) -> Optional[Dict[str, Any]]:
+        result = parse_triage_response(text)
+        self.summarizer._count_usage(calls=1, failures=0 if result else 1, tokens=tokens or 0, latency_s=latency_s)
+        if result is None:
+            if text:
+                print(f"⚠️ 无法解析筛选结果: {paper.get('title', 'Unknown')[:50]}...")
+            return None
+        get_paper_cache().cache_summary(paper, json.dumps(result, ensure_ascii=False), self.get_cache_variant(),
+                                        latency_s=latency_s, tokens=tokens)
+        return result
+
+    def triage(self, paper: Dict[str, Any], refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Score one paper.
+
+        Args:
+            paper: Paper information dictionary
+            refresh: Ignore cached triage results
+
+        Returns:
+            {'score', 'tldr'}, or None if the triage call failed
+        """
+        result = self._lookup(paper, refresh)
+        if result is not None:
+            return result
+        start_time = time.perf_counter()
+        text, tokens = self.summarizer._complete(self.get_prompt(paper), "triage")
+        return self._store(paper, text, time.perf_counter() - start_time, tokens)
+
+    async def triage_async(self, paper: Dict[str, Any], refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Asynchronous version of triage."""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self._lookup, paper, refresh)
+        if result is not None:
+            return result
+        prompt = await loop.run_in_executor(None, self.get_prompt, paper)
+        start_time = time.perf_counter()
+        text, tokens = await self.summarizer._complete_async(prompt, "triage")
+        return await loop.run_in_executor(None, self._store, paper, text, time.perf_counter() - start_time, tokens)
+
+    async def _run_async(self, papers: List[Dict[str, Any]], concurrency: int, refresh: bool) -> List[Optional[Dict[str, Any]]]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(paper):
+            async with semaphore:
+                return await self.triage_async(paper, refresh)
+
+        return await asyncio.gather(*(run(paper) for paper in papers))
+
+    def run(self, papers: List[Dict[str, Any]], concurrency: Optional[int] = None,
+            refresh: bool = False) -> List[bool]:
+        """
+        Triage papers and record the result on each of them.
+
+        Sets paper['triage'] to {'score', 'tldr', 'passed'} (or None if the
+        triage call failed).
+
+        Args:
+            papers: Papers to triage
+            concurrency: If set, triage asynchronously with up to this many requests in flight
+            refresh: Ignore cached triage results
+
+        Returns:
+            For each paper, whether it should get a full summary
+        """
+        if concurrency:
+            results = asyncio.run(self._run_async(papers, concurrency, refresh))
+        else:
+            results = [self.triage(paper, refresh) for paper in tqdm(papers, desc="Triaging papers")]
+
+        passed = []
+        for paper, result in zip(papers, results):
+            if result is None:
+                self.counts['failed'] += 1
+                keep = True
+            else:
+                keep = result['score'] >= self.threshold
+                result = dict(result, passed=keep)
+            self.counts['passed' if keep else 'skipped'] += 1
+            paper['triage'] = result
+            passed.append(keep)
+        return passed
+
+    def report(self, full_summarizer: Optional[LLMSummarizer] = None, verbose: bool = True) -> Dict[str, Any]:
+        """
+        Routing counts and per-tier usage.
+
+        Args:
+            full_summarizer: Summarizer of the full-summary tier
+            verbose: Print the report
+
+        Returns:
+            Dictionary with threshold, routing counts and a 'tiers' entry per tier
+        """
+        tiers = {'triage': self.summarizer.get_usage_stats()}
+        if full_summarizer is not None:
+            tiers['full'] = full_summarizer.get_usage_stats()
+        report = dict(self.counts, threshold=self.threshold, tiers=tiers)
+        if verbose:
+            total = self.counts['passed'] + self.counts['skipped']
+            print(f"🧭 分级总结: 筛选 {total} 篇, 全文总结 {self.counts['passed']} 篇, "
+                  f"仅保留TLDR {self.counts['skipped']} 篇 (阈值 {self.threshold:g}, 筛选失败 {self.counts['failed']} 篇)")
+            for tier, stats in tiers.items():
+                avg = f"{stats['avg_latency_s']}s" if stats['avg_latency_s'] is not None else "-"
+                print(f"   {tier} [{stats['model_name']}]: 调用 {stats['calls']} 次, 缓存命中 {stats['cache_hits']} 次, "
+                      f"失败 {stats['failures']} 次, token {stats['tokens']}, 耗时 {stats['latency_s']}s (平均 {avg})")
+        return report
+
+
+def format_triage_note(triage: Dict[str, Any], threshold: float) -> str:
+    """
+    Text shown in place of the full summary for a paper below the threshold.
+
+    Args:
+        triage: Triage result of the paper
+        threshold: Threshold it was compared against
+
+    Returns:
+        Markdown note with the score and TLDR
+    """
+    return f"**TLDR**（相关度 {triage['score']:g}/10，低于阈值 {threshold:g}，未做全文总结）：{triage['tldr']}\n"
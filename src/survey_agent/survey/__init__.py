@@ -1 +1,2 @@
-from .generator import generate_survey, summarize_papers, generate_markdown 
\ No newline at end of file
+from .generator import generate_survey, summarize_papers, generate_markdown 
+from .ingest import ingest_pdf_directory
\ No newline at end of file
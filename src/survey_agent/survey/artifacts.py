@@ -0,0 +1,179 @@
+"""Content-addressed store for pipeline stage artifacts."""
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.cache import CACHE_DIR_ENV
+
+STAGES = ('search', 'process', 'summary')
+
+# 修改某个阶段的代码（输出格式、处理逻辑）后递增对应版本号，旧产物会被重新计算
+STAGE_VERSIONS = {
+    'search': 1,
+    'process': 1,
+    'summary': 1,
+}
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Memoize pipeline stages on disk.
+
+    Layout under root:
+        objects/<stage>/<key[:2]>/<key>.json   artifact payloads, keyed by input hash
+        refs/<stage>/<name hash>.json          last inputs seen for a logical item,
+                                               used to explain recomputations
+    """
+
+    def __init__(self, root: Optional[str] = None, force_stages: Optional[Iterable[str]] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Store directory, defaults to <cache dir>/artifacts
+            force_stages: Stages to recompute even when an artifact exists
+        """
+        self.root = os.path.abspath(root or os.path.join(os.environ.get(CACHE_DIR_ENV, "cache"), "artifacts"))
+        self.force_stages = set(force_stages or ())
+        unknown = self.force_stages - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))} (available: {', '.join(STAGES)})")
+        # (stage, name, reason) for every recomputed artifact in this run
+        self.explanations: List[Tuple[str, str, str]] = []
+        self.reused: Dict[str, int] = {stage: 0 for stage in STAGES}
+
+    def key(self, stage: str, inputs: Dict[str, Any]) -> str:
+        """Content address of a stage result: hash of stage, code version and inputs."""
+        return _digest({'stage': stage, 'version': STAGE_VERSIONS[stage], 'inputs': inputs})
+
+    def _object_path(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, 'objects', stage, key[:2], f"{key}.json")
+
+    def _ref_path(self, stage: str, name: str) -> str:
+        return os.path.join(self.root, 'refs', stage, f"{_digest(name)[:32]}.json")
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def explain(self, stage: str, name: str, inputs: Dict[str, Any]) -> Optional[str]:
+        """
+        Explain why an item would be recomputed.
+
+        Args:
+            stage: Stage name
+            name: Logical item name (e.g. a paper's canonical ID)
+            inputs: Current stage inputs
+
+        Returns:
+            Reason string, or None if a matching artifact exists
+        """
+        if stage in self.force_stages:
+            return "forced (--force-stage)"
+        key = self.key(stage, inputs)
+        if os.path.exists(self._object_path(stage, key)):
+            return None
+
+        ref = self._read_json(self._ref_path(stage, name))
+        if ref is None:
+            return "no previous artifact"
+        if ref.get('version') != STAGE_VERSIONS[stage]:
+            return f"code version changed ({ref.get('version')} -> {STAGE_VERSIONS[stage]})"
+        previous = ref.get('inputs', {})
+        changed = sorted(field for field in set(previous) | set(inputs)
+                         if previous.get(field) != _digest(inputs.get(field)))
+        if changed:
+            return f"inputs changed: {', '.join(changed)}"
+        return "artifact missing"
+
+    def memoize(self, stage: str, name: str, inputs: Dict[str, Any], compute: Callable[[], Any],
+                encode: Callable[[Any], Any] = None, decode: Callable[[Any], Any] = None) -> Any:
+        """
+        Return the stored result for these inputs, or compute and store it.
+
+        Args:
+            stage: Stage name, one of STAGES
+            name: Logical item name, used to explain recomputations
+            inputs: JSON-serializable stage inputs
+            compute: Function producing the result
+            encode: Convert the result to JSON-serializable data
+            decode: Convert stored data back; returning None marks the artifact unusable
+
+        Returns:
+            Stage result
+        """
+        key = self.key(stage, inputs)
+        reason = self.explain(stage, name, inputs)
+
+        if reason is None:
+            artifact = self._read_json(self._object_path(stage, key))
+            value = None
+            if artifact is not None:
+                value = decode(artifact['value']) if decode else artifact['value']
+            if value is not None:
+                self.reused[stage] += 1
+                return value
+            reason = "stored artifact unusable"
+
+        self.explanations.append((stage, name, reason))
+        value = compute()
+        if value is None:
+            return value
+
+        data = encode(value) if encode else value
+        self._write_json(self._object_path(stage, key), {
+            'stage': stage,
+            'name': name,
+            'created_at': datetime.now().isoformat(),
+            'value': data,
+        })
+        self._write_json(self._ref_path(stage, name), {
+            'name': name,
+            'key': key,
+            'version': STAGE_VERSIONS[stage],
+            'inputs': {field: _digest(value) for field, value in inputs.items()},
+        })
+        return value
+
+    def report(self, verbose: bool = True) -> Dict[str, Dict[str, int]]:
+        """
+        Print how many artifacts were reused and why the others were recomputed.
+
+        Args:
+            verbose: Also list every recomputed item whose reason is not "no previous artifact"
+
+        Returns:
+            Per-stage counts of reused and recomputed artifacts
+        """
+        summary = {stage: {'reused': self.reused[stage], 'recomputed': 0} for stage in STAGES}
+        for stage, _, _ in self.explanations:
+            summary[stage]['recomputed'] += 1
+
+        parts = [f"{stage} {counts['reused']}/{counts['reused'] + counts['recomputed']}"
+                 for stage, counts in summary.items() if counts['reused'] or counts['recomputed']]
+        if parts:
+            print(f"♻️ 复用的阶段产物: {', '.join(parts)}")
+        if verbose:
+            for stage, name, reason in self.explanations:
+                if reason != "no previous artifact":
+                    print(f"   🔁 [{stage}] {name[:60]}: {reason}")
+        return summary
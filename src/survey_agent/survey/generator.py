@@ -1,20 +1,113 @@
+import os
 import re
 import json
+import asyncio
 import pandas as pd
+from datetime import date as _date
 from pathlib import Path
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 from tqdm import tqdm
 
 from ..arxiv_tools.search import search_papers
-from ..arxiv_tools.download import process_paper
-from ..llm.summarize import get_summarizer
+from ..arxiv_tools.download import process_paper, summarize_revalidation, wait_for_pdf_writes
+from ..llm.summarize import get_summarizer, summarize_papers_async
+from ..llm.resilience import SummaryFailure
+from ..llm.batch import BatchSummarizer
+from ..llm.triage import DEFAULT_TRIAGE_THRESHOLD, PaperTriage, format_triage_note
 from ..utils.bib_parser import parse_bib_file, BibParser
+from ..utils.fingerprint import fingerprint_paper
+from ..utils.paper import Paper
+from ..utils.text_store import LazyText
+from .artifacts import ArtifactStore
+
+def _paper_to_artifact(paper) -> Dict[str, Any]:
+    """Encode a processed paper for the artifact store (spilled text is stored by reference)."""
+    data = Paper.from_any(paper).to_dict()
+    text = data.get('pdf_text')
+    if isinstance(text, LazyText):
+        data['pdf_text'] = {'__lazy_text__': str(text.path), 'length': len(text)}
+    return data
+
+def _paper_from_artifact(data: Dict[str, Any]) -> Optional[Paper]:
+    """Decode a stored paper; None if its spilled text has been removed."""
+    data = dict(data)
+    text = data.get('pdf_text')
+    if isinstance(text, dict) and '__lazy_text__' in text:
+        if not os.path.exists(text['__lazy_text__']):
+            return None
+        data['pdf_text'] = LazyText(text['__lazy_text__'], text.get('length', 0))
+    # 复用的产物没有重新校验PDF
+    data['pdf_status'] = 'unchanged'
+    return Paper.from_dict(data)
+
+def _process_one(paper, pdf_dir: str = None, artifacts: Optional[ArtifactStore] = None,
+                 in_memory: bool = False, persist_pdf: bool = True, use_latex: bool = False):
+    """Process one paper, reusing the stored 'process' artifact when its metadata is unchanged."""
+    # 已经提取过文本的论文（如本地导入或JSONL加载的）直接使用
+    if isinstance(paper, (dict, Paper)) and 'pdf_text' in paper:
+        return paper
+    paper = Paper.from_any(paper)
+    if artifacts is None:
+        return process_paper(paper, pdf_dir, in_memory=in_memory, persist_pdf=persist_pdf, use_latex=use_latex,
+                             spill_text=True)
+    inputs = {
+        'paper': paper.canonical_id,
+        'version': paper.version,
+        'updated': paper.updated,
+        'pdf_url': paper.pdf_url,
+        'pdf_dir': os.path.abspath(pdf_dir or 'pdfs'),
+        'use_latex': use_latex,
+    }
+    return artifacts.memoize('process', paper.canonical_id, inputs,
+                             lambda: process_paper(paper, pdf_dir, in_memory=in_memory, persist_pdf=persist_pdf,
+                                                   use_latex=use_latex, spill_text=True),
+                             encode=_paper_to_artifact, decode=_paper_from_artifact)
+
+def triage_papers(papers: List[Any],
+                  triage_query: str,
+                  llm_provider: str = "openai",
+                  model_name: str = None,
+                  triage_threshold: float = None,
+                  concurrency: int = None,
+                  refresh: bool = False) -> Tuple[List[Paper], PaperTriage]:
+    """
+    Score papers' relevance from their title and abstract before they are processed.
+    
+    Papers below the threshold get their TLDR note as 'llm_summary_res', so
+    they are neither downloaded nor summarized in full.
+    
+    Args:
+        papers: Search results, BIB entries or paper dictionaries
+        triage_query: Survey topic the papers are scored against
+        llm_provider: LLM provider of the triage model
+        model_name: Triage model
+        triage_threshold: Minimum relevance score (0-10) for a full summary
+        concurrency: Number of concurrent triage requests (None triages one by one)
+        refresh: Ignore cached triage results
+        
+    Returns:
+        Tuple of (papers as Paper records, the triage for its report)
+    """
+    papers = [Paper.from_any(paper) for paper in papers]
+    threshold = DEFAULT_TRIAGE_THRESHOLD if triage_threshold is None else triage_threshold
+    triage = PaperTriage(get_summarizer(llm_provider, model_name), triage_query, threshold)
+    print(f"🧭 使用 {triage.summarizer.model_name} 筛选 {len(papers)} 篇论文 (阈值 {threshold:g})")
+    for paper, passed in zip(papers, triage.run(papers, concurrency, refresh)):
+        if not passed:
+            paper['llm_summary_res'] = format_triage_note(paper['triage'], threshold)
+    return papers, triage
 
 def summarize_papers(papers: List[Dict[str, Any]], 
                     llm_provider: str = "openai", 
                     model_name: str = None,
-                    custom_prompt: str = None) -> List[Dict[str, Any]]:
+                    custom_prompt: str = None,
+                    artifacts: Optional[ArtifactStore] = None,
+                    concurrency: int = None,
+                    batch: bool = False,
+                    batch_dir: str = None,
+                    map_reduce: bool = False,
+                    triage: Optional[PaperTriage] = None) -> List[Dict[str, Any]]:
     """
     Generate summaries for a list of papers.
     
@@ -23,18 +116,157 @@ def summarize_papers(papers: List[Dict[str, Any]],
         llm_provider: LLM provider to use
         model_name: Name of the model to use
         custom_prompt: Custom prompt template for summarization
+        artifacts: Artifact store; summaries are keyed by the paper's content
+            fingerprint and the summarizer variant (model, prompt, truncation)
+        concurrency: If set, papers without a stored summary are summarized
+            asynchronously with up to this many requests in flight
+        batch: Summarize papers without a stored summary through a provider
+            batch job first (cheaper, waits for the job); papers the job could
+            not summarize fall back to normal requests
+        batch_dir: Directory of batch job manifests
+        map_reduce: Summarize papers longer than the truncation limit chunk by
+            chunk, then combine the chunk summaries with the prompt template
+        triage: Triage that routed the papers before they were processed
+            (see triage_papers); its report is printed with the usage of the
+            full summaries
         
     Returns:
         List of paper dictionaries with summaries
     """
-    summarizer = get_summarizer(llm_provider, model_name, custom_prompt)
+    summarizer = get_summarizer(llm_provider, model_name, custom_prompt, map_reduce)
+    variant = summarizer.get_cache_variant()
+    refresh = artifacts is not None and 'summary' in artifacts.force_stages
+    
+    pending = []
+    for paper in papers:
+        if 'llm_summary_res' in paper:
+            continue
+        if artifacts is None:
+            pending.append((paper, None, None))
+        else:
+            pending.append((paper, Paper.from_any(paper).canonical_id, {'content': fingerprint_paper(paper)[0], 'variant': variant}))
     
-    for paper in tqdm(papers, desc="Summarizing papers"):
-        if 'llm_summary_res' not in paper:
-            paper['llm_summary_res'] = summarizer.summarize(paper)
+    to_call = [paper for paper, name, inputs in pending
+               if artifacts is None or artifacts.explain('summary', name, inputs) is not None]
+    
+    # 批处理模式：通过批处理任务把摘要写入缓存，后面的步骤直接命中缓存
+    if batch and to_call:
+        print(f"🗂️ 通过批处理任务总结 {len(to_call)} 篇论文")
+        BatchSummarizer(summarizer, job_dir=batch_dir).run(to_call, refresh=refresh)
+        refresh = False
+    
+    # 并发模式：先并发调用LLM（只针对没有可用产物的论文），再按顺序写回
+    precomputed = {}
+    if concurrency and pending:
+        if to_call:
+            print(f"⚡ 并发总结 {len(to_call)} 篇论文 (并发数 {concurrency})")
+            summaries = asyncio.run(summarize_papers_async(summarizer, to_call, concurrency, refresh=refresh))
+            precomputed = {id(paper): summary for paper, summary in zip(to_call, summaries)}
+    
+    failures = {}
+    
+    def summarize_one(paper):
+        if id(paper) in precomputed:
+            summary = precomputed[id(paper)]
+        else:
+            summary = summarizer.summarize(paper, refresh=refresh)
+        if isinstance(summary, SummaryFailure):
+            failures[summary.kind] = failures.get(summary.kind, 0) + 1
+        return summary
+    
+    for paper, name, inputs in tqdm(pending, desc="Summarizing papers"):
+        if artifacts is None:
+            paper['llm_summary_res'] = summarize_one(paper)
+            continue
+        # 空摘要不保存为产物，下次重新尝试
+        paper['llm_summary_res'] = artifacts.memoize(
+            'summary', name, inputs,
+            lambda: summarize_one(paper) or None
+        ) or ''
+    
+    if failures:
+        details = ', '.join(f"{kind} {count}" for kind, count in sorted(failures.items()))
+        print(f"⚠️ {sum(failures.values())} 篇论文未生成摘要: {details}")
+    hedge = summarizer.get_usage_stats().get('hedge')
+    if hedge and hedge['hedged']:
+        print(f"🐇 对冲请求: {hedge['hedged']}/{hedge['requests']} 次 (对冲胜出 {hedge['hedge_wins']}, "
+              f"原请求胜出 {hedge['primary_wins']}, 受比例上限跳过 {hedge['rate_capped']}, "
+              f"额外token {hedge['extra_tokens']})")
+    if triage is not None:
+        triage.report(summarizer)
     
     return papers
 
+def _survey_query(terms: List[str] = None, multi_terms: List[List[str]] = None, titles: List[str] = None) -> str:
+    """Describe the survey topic from the search inputs, for relevance triage."""
+    if multi_terms:
+        return ' AND '.join('(' + ' OR '.join(group) + ')' for group in multi_terms)
+    if terms:
+        return ' '.join(terms)
+    return '; '.join(titles or [])
+
+def report_version_changes(papers: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Print which papers got a new PDF version in this run.
+    
+    Only these papers are re-extracted and re-summarized; unchanged papers reuse
+    their extracted text and cached summaries.
+    
+    Args:
+        papers: Papers returned by process_paper
+        
+    Returns:
+        Dictionary mapping 'new', 'changed' and 'unchanged' to paper titles
+    """
+    report = summarize_revalidation(papers)
+    print(f"📄 PDF: 新下载 {len(report['new'])} 篇, 有新版本 {len(report['changed'])} 篇, 未变化 {len(report['unchanged'])} 篇")
+    for title in report['changed']:
+        print(f"   🆕 {title}")
+    return report
+
+def render_paper_section(paper: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Render one paper's table-of-contents entry and TLDR section.
+    
+    Args:
+        paper: Paper dictionary with summary
+        
+    Returns:
+        Tuple of (table of contents entry, TLDR section)
+    """
+    # Prepare paper info
+    title = paper['title']
+        
+    # Extract year/month from URL or use provided year
+    year_month_str = "YY/MM"
+    if paper.get('year'):
+        year_month_str = f"{paper['year'][:2]}/{paper['year'][2:]}" if len(paper['year']) >= 4 else paper['year']
+    elif paper.get('url'):
+        url = paper['url']
+        pattern = r"abs/(\d{4})\."
+        match = re.search(pattern, url)
+        year_month_str = match.group(1)[:2] + '/' + match.group(1)[2:] if match else "YY/MM"
+    
+    # Extract project page if available
+    summary_text = paper.get('summary', '')
+    page_url = re.findall(r'https?://[^\s]+', summary_text)
+    code_or_page = page_url[0] if page_url else ""
+    
+    # Generate anchor for linking
+    no_biaodian_title = re.sub(r'[,:.?"\']', ' ', title).replace(' ', '-').lower()
+    
+    # Add to table of contents
+    pdf_url = paper.get('pdf_url', paper.get('url', ''))
+    markdown_table_content = f"""- [{year_month_str}] **{title}**  
+[[Paper]({pdf_url})] [[Code/Page]({code_or_page})] [[TLDR/Notes](#{no_biaodian_title})]"""
+    
+    # Add paper summary
+    cur_paper_tldr = f"## {no_biaodian_title}\n"
+    cur_paper_tldr += f"### Abstract\n{summary_text}\n"
+    if 'llm_summary_res' in paper and paper['llm_summary_res']:
+        cur_paper_tldr += paper['llm_summary_res'].replace('##', '###')
+    return markdown_table_content, cur_paper_tldr
+
 def generate_markdown(papers: List[Dict[str, Any]], 
                      output_file: str,
                      terms: List[str] = None,
@@ -63,41 +295,11 @@ def generate_markdown(papers: List[Dict[str, Any]],
     
     tldr_content = '# TLDR/Notes\n'
     
+    # 渲染很便宜，每次都重新生成，模板修改后立即生效
     for paper in papers:
-        # Prepare paper info
-        title = paper['title']
-        
-        # Extract year/month from URL or use provided year
-        year_month_str = "YY/MM"
-        if paper.get('year'):
-            year_month_str = f"{paper['year'][:2]}/{paper['year'][2:]}" if len(paper['year']) >= 4 else paper['year']
-        elif paper.get('url'):
-            url = paper['url']
-            pattern = r"abs/(\d{4})\."
-            match = re.search(pattern, url)
-            year_month_str = match.group(1)[:2] + '/' + match.group(1)[2:] if match else "YY/MM"
-        
-        # Extract project page if available
-        summary_text = paper.get('summary', '')
-        page_url = re.findall(r'https?://[^\s]+', summary_text)
-        code_or_page = page_url[0] if page_url else ""
-        
-        # Generate anchor for linking
-        no_biaodian_title = re.sub(r'[,:.?"\']', ' ', title).replace(' ', '-').lower()
-        
-        # Add to table of contents
-        pdf_url = paper.get('pdf_url', paper.get('url', ''))
-        markdown_table_content = f"""- [{year_month_str}] **{title}**  
-[[Paper]({pdf_url})] [[Code/Page]({code_or_page})] [[TLDR/Notes](#{no_biaodian_title})]"""
-        
-        table_content += markdown_table_content + '\n\n'
-        
-        # Add paper summary
-        cur_paper_tldr = f"## {no_biaodian_title}\n"
-        cur_paper_tldr += f"### Abstract\n{summary_text}\n"
-        if 'llm_summary_res' in paper and paper['llm_summary_res']:
-            cur_paper_tldr += paper['llm_summary_res'].replace('##', '###')
-        tldr_content += cur_paper_tldr + '\n\n'
+        toc_entry, tldr_section = render_paper_section(paper)
+        table_content += toc_entry + '\n\n'
+        tldr_content += tldr_section + '\n\n'
     
     # Combine content
     markdown_content = table_content + '\n\n' + tldr_content
@@ -113,7 +315,20 @@ def generate_survey_from_bib(bib_file: str,
                            llm_provider: str = "openai",
                            model_name: str = None,
                            custom_prompt: str = None,
-                           pdf_dir: str = None) -> str:
+                           pdf_dir: str = None,
+                           force_stages: List[str] = None,
+                           artifact_dir: str = None,
+                           use_artifacts: bool = True,
+                           concurrency: int = None,
+                           batch: bool = False,
+                           batch_dir: str = None,
+                           map_reduce: bool = False,
+                           triage_query: str = None,
+                           triage_model: str = None,
+                           triage_threshold: float = None,
+                           in_memory: bool = False,
+                           persist_pdf: bool = True,
+                           use_latex: bool = False) -> str:
     """
     Generate a complete survey from a BIB file.
     
@@ -124,10 +339,29 @@ def generate_survey_from_bib(bib_file: str,
         model_name: Name of the model to use
         custom_prompt: Custom prompt template for summarization
         pdf_dir: Directory to save PDFs
+        force_stages: Stages to recompute even if their inputs are unchanged
+            ('process', 'summary')
+        artifact_dir: Directory of the stage artifact store
+        use_artifacts: Reuse stage artifacts whose inputs are unchanged
+        concurrency: Number of concurrent LLM requests (None summarizes one by one)
+        batch: Summarize through a provider batch job (see summarize_papers)
+        batch_dir: Directory of batch job manifests
+        map_reduce: Summarize long papers chunk by chunk (see summarize_papers)
+        triage_query: Survey topic for relevance triage (see triage_papers);
+            BIB files have no search terms, so triage needs an explicit topic
+        triage_model: Model used for triage
+        triage_threshold: Minimum relevance score for a full summary
+        in_memory: Download PDFs into memory and extract text from the bytes
+            (see process_paper)
+        persist_pdf: In memory mode, also write the PDFs to pdf_dir in the background
+        use_latex: Extract text from the arXiv LaTeX source when available
+            (see process_paper)
         
     Returns:
         Path to the generated markdown file
     """
+    artifacts = ArtifactStore(artifact_dir, force_stages) if use_artifacts else None
+    
     # Step 1: Parse BIB file and get arxiv papers
     print(f"📚 Parsing BIB file: {bib_file}")
     papers = parse_bib_file(bib_file)  # 现在返回的是真实的arxiv paper对象列表
@@ -138,12 +372,22 @@ def generate_survey_from_bib(bib_file: str,
     
     print(f"✅ Found {len(papers)} arXiv papers in BIB file")
     
+    # 分级模式：下载之前先用便宜的模型根据标题和摘要筛选，不相关的论文只保留TLDR
+    triage = None
+    if triage_query:
+        refresh = artifacts is not None and 'summary' in artifacts.force_stages
+        papers, triage = triage_papers(papers, triage_query, llm_provider, triage_model or model_name,
+                                       triage_threshold, concurrency, refresh)
+    
     # Step 2: Process papers (download PDFs and extract text)
     print("📥 Processing papers...")
     processed_papers = []
     for paper in tqdm(papers, desc="Processing papers"):
+        if triage is not None and 'llm_summary_res' in paper:
+            processed_papers.append(paper)
+            continue
         try:
-            processed_paper = process_paper(paper, pdf_dir)
+            processed_paper = _process_one(paper, pdf_dir, artifacts, in_memory, persist_pdf, use_latex)
             if processed_paper:  # 只添加成功处理的论文
                 processed_papers.append(processed_paper)
         except Exception as e:
@@ -153,14 +397,20 @@ def generate_survey_from_bib(bib_file: str,
     if not processed_papers:
         print("❌ No papers were successfully processed")
         return None
+    report_version_changes(processed_papers)
     
     # Step 3: Generate summaries
     print("🤖 Generating summaries...")
-    summarized_papers = summarize_papers(processed_papers, llm_provider, model_name, custom_prompt)
+    summarized_papers = summarize_papers(processed_papers, llm_provider, model_name, custom_prompt, artifacts, concurrency,
+                                         batch, batch_dir, map_reduce, triage)
     
     # Step 4: Generate markdown
     print("📝 Generating markdown...")
     generate_markdown(summarized_papers, output_file, bib_file=bib_file)
+    if artifacts is not None:
+        artifacts.report()
+    # 内存模式下PDF在后台落盘，退出前等待写完
+    wait_for_pdf_writes()
     
     return output_file
 
@@ -177,7 +427,21 @@ def generate_survey(papers=None,
                    logic="AND",
                    date=None,
                    date_range=None,
-                   multi_terms=None):
+                   multi_terms=None,
+                   force_stages=None,
+                   artifact_dir=None,
+                   use_artifacts=True,
+                   concurrency=None,
+                   batch=False,
+                   batch_dir=None,
+                   map_reduce=False,
+                   triage=False,
+                   triage_query=None,
+                   triage_model=None,
+                   triage_threshold=None,
+                   in_memory=False,
+                   persist_pdf=True,
+                   use_latex=False):
     """
     Generate a complete survey from search to markdown generation.
     
@@ -196,10 +460,36 @@ def generate_survey(papers=None,
         date: Specific date to search (format: YYYY-MM-DD)
         date_range: Date range to search (format: [start_date, end_date] as YYYY-MM-DD)
         multi_terms: List of term groups, each group uses OR internally, groups use AND between them
+        force_stages: Stages to recompute even if their inputs are unchanged
+            ('search', 'process', 'summary')
+        artifact_dir: Directory of the stage artifact store
+        use_artifacts: Reuse stage artifacts whose inputs are unchanged
+        concurrency: Number of concurrent LLM requests (None summarizes one by one)
+        batch: Summarize through a provider batch job (see summarize_papers)
+        batch_dir: Directory of batch job manifests
+        map_reduce: Summarize long papers chunk by chunk (see summarize_papers)
+        triage: Score papers' relevance with a cheap model first and only
+            download and summarize the relevant ones in full (see triage_papers)
+        triage_query: Survey topic for triage, defaults to the search terms
+        triage_model: Model used for triage, defaults to model_name
+        triage_threshold: Minimum relevance score (0-10) for a full summary
+        in_memory: Download PDFs into memory and extract text from the bytes
+            (see process_paper)
+        persist_pdf: In memory mode, also write the PDFs to pdf_dir in the background
+        use_latex: Extract text from the arXiv LaTeX source when available
+            (see process_paper)
         
     Returns:
         Path to the generated markdown file
     """
+    if triage:
+        triage_query = triage_query or _survey_query(terms, multi_terms, titles)
+        if not triage_query:
+            print("⚠️ 分级总结需要综述主题（--triage_query），本次对所有论文做全文总结")
+    else:
+        triage_query = None
+    artifacts = None if bib_file or not use_artifacts else ArtifactStore(artifact_dir, force_stages)
+    
     # Step 1: Get papers from various sources
     if bib_file:
         # Generate survey from BIB file
@@ -209,22 +499,60 @@ def generate_survey(papers=None,
             llm_provider=llm_provider,
             model_name=model_name,
             custom_prompt=custom_prompt,
-            pdf_dir=pdf_dir
+            pdf_dir=pdf_dir,
+            force_stages=force_stages,
+            artifact_dir=artifact_dir,
+            use_artifacts=use_artifacts,
+            concurrency=concurrency,
+            batch=batch,
+            batch_dir=batch_dir,
+            map_reduce=map_reduce,
+            triage_query=triage_query,
+            triage_model=triage_model,
+            triage_threshold=triage_threshold,
+            in_memory=in_memory,
+            persist_pdf=persist_pdf,
+            use_latex=use_latex
         )
     elif papers is None:
         # Search for papers if not provided
         if not terms and not titles and not multi_terms:
             raise ValueError("Either papers, terms, multi_terms, titles, or bib_file must be provided")
         
-        papers = search_papers(terms=terms, titles=titles, max_results=max_results, logic=logic, date=date, date_range=date_range, multi_terms=multi_terms)
+        search_kwargs = dict(terms=terms, titles=titles, max_results=max_results, logic=logic, date=date, date_range=date_range, multi_terms=multi_terms)
+        if artifacts is None:
+            papers = search_papers(**search_kwargs)
+        else:
+            # 搜索结果按天复用，arXiv每天都会有新论文
+            papers = artifacts.memoize(
+                'search', 'search', dict(search_kwargs, day=_date.today().isoformat()),
+                lambda: search_papers(**search_kwargs),
+                encode=lambda results: [_paper_to_artifact(p) for p in results],
+                decode=lambda data: [Paper.from_dict(d) for d in data]
+            )
+    
+    # 分级模式：下载之前先用便宜的模型根据标题和摘要筛选，不相关的论文只保留TLDR
+    triage = None
+    if triage_query:
+        refresh = artifacts is not None and 'summary' in artifacts.force_stages
+        papers, triage = triage_papers(papers, triage_query, llm_provider, triage_model or model_name,
+                                       triage_threshold, concurrency, refresh)
     
     # Step 2: Process papers (download PDFs and extract text)
-    processed_papers = [process_paper(paper, pdf_dir) for paper in tqdm(papers, desc="Processing papers")]
+    processed_papers = [paper if triage is not None and 'llm_summary_res' in paper
+                        else _process_one(paper, pdf_dir, artifacts, in_memory, persist_pdf, use_latex)
+                        for paper in tqdm(papers, desc="Processing papers")]
+    report_version_changes(processed_papers)
     
     # Step 3: Generate summaries
-    summarized_papers = summarize_papers(processed_papers, llm_provider, model_name, custom_prompt)
+    summarized_papers = summarize_papers(processed_papers, llm_provider, model_name, custom_prompt, artifacts, concurrency,
+                                         batch, batch_dir, map_reduce, triage)
     
     # Step 4: Generate markdown
     generate_markdown(summarized_papers, output_file, terms)
+    if artifacts is not None:
+        artifacts.report()
+    # 内存模式下PDF在后台落盘，退出前等待写完
+    wait_for_pdf_writes()
     
     return output_file 
\ No newline at end of file
@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+
+import fitz  # PyMuPDF
+from tqdm import tqdm
+
+from ..arxiv_tools.download import extract_text_from_doc
+from ..utils.text_processing import extract_arxiv_id
+from ..utils.fingerprint import fingerprint_text
+from ..utils.paper import Paper
+from ..utils.text_store import LazyText
+
+INDEX_FILE_NAME = ".survey_agent_index.json"
+TEXT_DIR_NAME = ".survey_agent_texts"
+
+
+def scan_pdf_directory(pdf_dir: str) -> List[Path]:
+    """
+    Recursively list the PDF files under a directory.
+    
+    Args:
+        pdf_dir: Root directory to scan
+        
+    Returns:
+        Sorted list of PDF paths
+    """
+    root = Path(pdf_dir)
+    return sorted(p for p in root.rglob('*') if p.is_file() and p.suffix.lower() == '.pdf'
+                  and TEXT_DIR_NAME not in p.parts)
+
+
+def fingerprint_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute a content fingerprint of a file.
+    
+    Args:
+        path: File path
+        chunk_size: Read block size
+        
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _guess_title_from_first_page(page) -> str:
+    """Use the largest-font line in the top half of the first page as the title."""
+    try:
+        blocks = page.get_text("dict")["blocks"]
+    except Exception:
+        return ""
+    
+    best_size = 0
+    best_lines = []
+    top_half = page.rect.height / 2
+    for block in blocks:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if len(text) < 3 or line["bbox"][1] > top_half:
+                continue
+            size = max(span["size"] for span in line["spans"])
+            if size > best_size + 0.5:
+                best_size = size
+                best_lines = [text]
+            elif abs(size - best_size) <= 0.5:
+                best_lines.append(text)
+    
+    return " ".join(best_lines[:3])
+
+
+def _extract_abstract(text: str, max_length: int = 3000) -> str:
+    """Pull the abstract paragraph out of a paper's text."""
+    match = re.search(r'\bAbstract\b[\s.:—-]*(.+?)(?:\n\s*\n|\n\s*(?:1\.?|I\.?)?\s*Introduction\b)',
+                      text[:20000], re.IGNORECASE | re.DOTALL)
+    if not match:
+        return ""
+    return ' '.join(match.group(1).split())[:max_length]
+
+
+def extract_local_pdf(path: str) -> Dict[str, Any]:
+    """
+    Extract text and metadata from a local PDF (runs in a worker process).
+    
+    Args:
+        path: PDF path
+        
+    Returns:
+        Dictionary with title, authors, published, arxiv_id, summary, pdf_text,
+        content_fingerprint and simhash
+    """
+    doc = fitz.open(path)
+    metadata = doc.metadata or {}
+    title = (metadata.get('title') or '').strip()
+    if doc.page_count and (len(title) < 5 or title.lower().endswith(('.dvi', '.pdf', '.doc', '.docx'))):
+        title = _guess_title_from_first_page(doc[0])
+    text = extract_text_from_doc(doc, path)
+    
+    if not title:
+        title = next((line.strip() for line in text.splitlines() if line.strip()), Path(path).stem)
+    
+    arxiv_match = re.search(r'arXiv:\s*\S+', text[:5000])
+    title = ' '.join(title.split())
+    summary = _extract_abstract(text)
+    content_fingerprint, sketch = fingerprint_text(title, summary, text)
+    
+    return {
+        'title': title,
+        'authors': (metadata.get('author') or '').strip(),
+        'published': (metadata.get('creationDate') or '').strip(),
+        'arxiv_id': extract_arxiv_id(arxiv_match.group(0), keep_version=False) if arxiv_match else '',
+        'summary': summary,
+        'pdf_text': text,
+        'content_fingerprint': content_fingerprint,
+        'simhash': sketch,
+    }
+
+
+def _load_index(index_file: Path) -> Dict[str, Any]:
+    """Load the ingest index; a missing or corrupt index means a full re-ingest."""
+    if index_file.exists():
+        try:
+            return json.loads(index_file.read_text(encoding='utf-8'))
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"⚠️ 索引文件损坏，重新导入: {e}")
+    return {'files': {}, 'records': {}}
+
+
+def _save_index(index_file: Path, index: Dict[str, Any]):
+    """Atomically write the ingest index."""
+    tmp_file = index_file.with_suffix('.tmp')
+    tmp_file.write_text(json.dumps(index, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_file, index_file)
+
+
+def _to_paper(record: Dict[str, Any], path: Path, fingerprint: str, text: LazyText) -> Paper:
+    """Build a paper record in the shape process_paper produces."""
+    arxiv_id = record.get('arxiv_id', '')
+    return Paper.from_dict({
+        'title': record['title'],
+        'authors': record.get('authors', ''),
+        'summary': record.get('summary', ''),
+        'url': f"https://arxiv.org/abs/{arxiv_id}" if arxiv_id else path.resolve().as_uri(),
+        'pdf_url': f"https://arxiv.org/pdf/{arxiv_id}" if arxiv_id else '',
+        'published': record.get('published', ''),
+        'comment': '',
+        'pdf_path': str(path),
+        'arxiv_id': arxiv_id,
+        'fingerprint': fingerprint,
+        'text_source': 'local_pdf',
+        'content_fingerprint': record.get('content_fingerprint'),
+        'simhash': record.get('simhash'),
+        'pdf_text': text,
+    })
+
+
+def ingest_pdf_directory(pdf_dir: str, index_dir: Optional[str] = None, max_workers: Optional[int] = None) -> List[Paper]:
+    """
+    Bulk-ingest a directory tree of local PDFs into paper records.
+    
+    Files are fingerprinted and extracted in parallel processes. Results are kept
+    in an index next to the PDFs, so later runs only extract new or changed files
+    (renamed or duplicated files are recognised by fingerprint).
+    
+    Args:
+        pdf_dir: Directory to scan recursively
+        index_dir: Where to keep the index and extracted texts, defaults to pdf_dir
+        max_workers: Number of extraction processes, defaults to the CPU count
+        
+    Returns:
+        List of Paper records ready for summarize_papers
+    """
+    index_root = Path(index_dir or pdf_dir)
+    text_dir = index_root / TEXT_DIR_NAME
+    text_dir.mkdir(parents=True, exist_ok=True)
+    index_file = index_root / INDEX_FILE_NAME
+    index = _load_index(index_file)
+    
+    pdf_paths = scan_pdf_directory(pdf_dir)
+    print(f"📂 扫描到 {len(pdf_paths)} 个PDF文件: {pdf_dir}")
+    
+    # Step 1: 计算指纹，大小和修改时间都没变的文件直接复用
+    files = {}
+    for path in tqdm(pdf_paths, desc="Fingerprinting PDFs"):
+        key = str(path.resolve())
+        stat = path.stat()
+        known = index['files'].get(key)
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            fingerprint = known['fingerprint']
+        else:
+            fingerprint = fingerprint_file(path)
+        files[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'fingerprint': fingerprint}
+    
+    # Step 2: 并行提取新文件
+    to_extract = {}
+    for key, info in files.items():
+        fingerprint = info['fingerprint']
+        if fingerprint not in index['records'] or not (text_dir / f"{fingerprint}.txt").exists():
+            to_extract.setdefault(fingerprint, key)
+    
+    print(f"♻️ 复用 {len(set(f['fingerprint'] for f in files.values())) - len(to_extract)} 篇，需要提取 {len(to_extract)} 篇")
+    
+    if to_extract:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(extract_local_pdf, key): fingerprint for fingerprint, key in to_extract.items()}
+            for i, future in enumerate(tqdm(as_completed(futures), total=len(futures), desc="Extracting PDFs"), 1):
+                fingerprint = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    tqdm.write(f"❌ 提取失败: {to_extract[fingerprint]} - {e}")
+                    continue
+                text = record.pop('pdf_text')
+                record['text_length'] = len(text)
+                (text_dir / f"{fingerprint}.txt").write_text(text, encoding='utf-8')
+                index['records'][fingerprint] = record
+                # 定期保存索引，中断后可以续跑
+                if i % 20 == 0:
+                    _save_index(index_file, index)
+    
+    # 删除不再被任何文件引用的记录及其文本（文件已删除或内容已修改）
+    referenced = {info['fingerprint'] for info in files.values()}
+    stale = [fingerprint for fingerprint in index['records'] if fingerprint not in referenced]
+    for fingerprint in stale:
+        del index['records'][fingerprint]
+        (text_dir / f"{fingerprint}.txt").unlink(missing_ok=True)
+    if stale:
+        print(f"🧹 清理 {len(stale)} 条过期记录")
+    
+    index['files'] = files
+    _save_index(index_file, index)
+    
+    # Step 3: 生成论文字典，相同内容的文件只保留一份
+    papers = []
+    seen = set()
+    for key, info in files.items():
+        fingerprint = info['fingerprint']
+        if fingerprint in seen or fingerprint not in index['records']:
+            continue
+        seen.add(fingerprint)
+        record = index['records'][fingerprint]
+        # 文本留在磁盘上，构建prompt时才读取
+        text = LazyText(text_dir / f"{fingerprint}.txt", record.get('text_length', 0))
+        papers.append(_to_paper(record, Path(key), fingerprint, text))
+    
+    print(f"✅ 导入 {len(papers)} 篇本地论文")
+    return papers
@@ -1,2 +1,4 @@
 from .file_utils import save_papers_to_jsonl, load_papers_from_jsonl, ensure_directory
-from .text_processing import clean_title, extract_project_url, truncate_text 
\ No newline at end of file
+from .text_processing import clean_title, extract_project_url, truncate_text, extract_arxiv_id 
+from .paper import Paper
+from .text_store import LazyText, spill_text, materialize_text
\ No newline at end of file
@@ -3,6 +3,9 @@ from typing import List, Dict, Any, Optional
 from pathlib import Path
 import arxiv
 
+from .cache import get_paper_cache
+from .paper import Paper
+
 class BibParser:
     """Parser for BibTeX files to extract arXiv IDs and other information"""
     
@@ -125,6 +128,15 @@ class BibParser:
         if not cleaned_title:
             return None
         
+        # 之前没有找到的标题，在负缓存有效期内不再搜索
+        cache = get_paper_cache()
+        failure_key = cleaned_title.lower()
+        failure_reason = cache.get_failure('title_lookup', failure_key)
+        if failure_reason:
+            if verbose:
+                print(f"⏭️ 跳过之前未找到的标题: {cleaned_title} ({failure_reason})")
+            return None
+        
         if verbose:
             print(f"🔍 标题搜索开始:")
             print(f"   原始标题: {title}")
@@ -221,14 +233,16 @@ class BibParser:
                         arxiv_id = best_match.entry_id.split('/')[-1].split('v')[0]
                         print(f"   arXiv ID: {arxiv_id}")
                         print()
-                    return best_match
+                    return Paper.from_arxiv_result(best_match)
                 else:
+                    cache.remember_failure('title_lookup', failure_key, f"最高匹配分数 {best_score:.3f} 低于阈值")
                     if verbose:
                         print(f"   ❌ 搜索失败: 最高匹配分数 {best_score:.3f} 低于阈值 0.25")
                         if results:
                             print(f"   最佳候选: {results[0].title}")
                         print()
             else:
+                cache.remember_failure('title_lookup', failure_key, "未找到任何候选论文")
                 if verbose:
                     print(f"   ❌ 搜索失败: 未找到任何候选论文")
                     print()
@@ -242,7 +256,7 @@ class BibParser:
             
         return None
     
-    def get_arxiv_papers(self) -> List[Dict[str, Any]]:
+    def get_arxiv_papers(self) -> List[Paper]:
         """Get paper objects from arXiv using extracted IDs"""
         try:
             parse_result = self.parse_string(self.content)
@@ -259,14 +273,14 @@ class BibParser:
                 search = arxiv.Search(id_list=[arxiv_id])
                 results = list(client.results(search))
                 if results:
-                    papers.append(results[0])
+                    papers.append(Paper.from_arxiv_result(results[0]))
             except Exception as e:
                 print(f"Error fetching paper {arxiv_id}: {e}")
                 continue
         
         return papers
 
-def parse_bib_file(file_path: str) -> List[Dict[str, Any]]:
+def parse_bib_file(file_path: str) -> List[Paper]:
     """Convenience function to parse a BibTeX file and return paper objects"""
     parser = BibParser()
     content = Path(file_path).read_text(encoding='utf-8')
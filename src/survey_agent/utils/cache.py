@@ -1,67 +1,398 @@
 import json
 import os
+import re
 import hashlib
-from typing import Dict, Any, Optional
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
+from .fingerprint import fingerprint_paper, is_near_duplicate
+
+# 同一台机器上的多个进程（Streamlit worker、命令行任务）通过该环境变量共享同一个缓存目录
+CACHE_DIR_ENV = "SURVEY_AGENT_CACHE_DIR"
+
+# 摘要变体的组成部分：同一篇论文在不同模型、服务商、prompt模板、截断策略下的摘要分别缓存
+VARIANT_FIELDS = ('provider', 'model_name', 'prompt_hash', 'truncation')
+
+# 导出/导入缓存条目时使用的列
+ENTRY_FIELDS = (
+    'cache_key', 'arxiv_id', 'title', 'summary', 'content_hash', 'cached_at',
+    'provider', 'model_name', 'prompt_hash', 'truncation', 'variant_key',
+    'size_bytes', 'latency_s', 'tokens', 'simhash', 'arxiv_version',
+)
+
+
+# 负缓存：各类失败结果的保留时间
+NEGATIVE_CACHE_TTLS = {
+    'title_lookup': timedelta(days=7),        # 标题在arXiv上找不到
+    'pdf_404': timedelta(days=1),             # PDF返回404
+    'empty_llm_response': timedelta(hours=1), # LLM返回空内容
+}
+DEFAULT_NEGATIVE_TTL = timedelta(hours=1)
+
+# 运行期统计的计数器（按模型分别统计）
+STAT_COUNTERS = (
+    'hits', 'memory_hits', 'near_duplicate_hits', 'misses', 'invalidations', 'writes',
+    'bytes_read', 'bytes_written', 'llm_seconds_saved', 'tokens_saved',
+)
+
+
+def normalize_prompt_template(template: str) -> str:
+    """规范化prompt模板（合并空白），格式上的差异不影响缓存命中"""
+    return ' '.join((template or '').split())
+
+
+def hash_prompt_template(template: str) -> str:
+    """计算prompt模板的哈希"""
+    return hashlib.sha256(normalize_prompt_template(template).encode('utf-8')).hexdigest()[:16]
+
+
+def make_variant_key(variant: Dict[str, str]) -> str:
+    """把变体描述转换为稳定的短键"""
+    payload = json.dumps([variant.get(field, '') for field in VARIANT_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
 
 class PaperCache:
-    """论文摘要缓存管理器"""
+    """
+    论文摘要缓存管理器（SQLite WAL存储）
+    
+    所有写入都直接落到数据库，每条写入是一个独立的事务，因此同一台机器上的多个进程
+    和线程共享同一份缓存。进程内的LRU层只用来省去读取摘要正文：每次命中都先用主键
+    查询核对数据库中条目的缓存时间和内容指纹，其他进程覆盖、删除或清空后的条目
+    不会再从内存层返回。
+    """
     
-    def __init__(self, cache_dir: str = "cache", cache_expire_days: int = 30):
+    def __init__(self, cache_dir: str = None, cache_expire_days: int = 30,
+                 memory_entries: int = 1024, max_disk_entries: int = 500000, max_disk_mb: int = 2048,
+                 compact_interval: int = 3600, background_compaction: bool = True):
         """
         初始化缓存管理器
         
         Args:
-            cache_dir: 缓存目录路径
+            cache_dir: 缓存目录路径，默认取环境变量 SURVEY_AGENT_CACHE_DIR，否则为 ./cache
             cache_expire_days: 缓存过期天数，默认30天
+            memory_entries: 内存LRU层最多保存的条目数
+            max_disk_entries: 磁盘层最多保存的条目数，超出后按最近访问时间淘汰
+            max_disk_mb: 磁盘层摘要总大小上限（MB）
+            compact_interval: 后台整理（过期清理、配额淘汰）的间隔秒数
+            background_compaction: 是否启动后台整理线程
         """
+        # 使用绝对路径，避免不同工作目录的进程各自使用一份缓存
+        cache_dir = os.path.abspath(cache_dir or os.environ.get(CACHE_DIR_ENV, "cache"))
         self.cache_dir = cache_dir
         self.cache_expire_days = cache_expire_days
+        self.db_file = os.path.join(cache_dir, "paper_summaries.db")
+        # 旧版JSON缓存文件，首次打开时自动迁移
         self.cache_file = os.path.join(cache_dir, "paper_summaries.json")
         
         # 确保缓存目录存在
         os.makedirs(cache_dir, exist_ok=True)
         
-        # 加载现有缓存
-        self._cache = self._load_cache()
+        # 每个线程使用自己的连接，写入通过锁串行化
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        
+        # 内存LRU层: cache_key -> (summary, content_hash, cached_at, latency_s, tokens, simhash, arxiv_version)
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        
+        # 运行期计数器: model_name -> {counter: value}
+        self._counters = {}
+        self._counters_lock = threading.Lock()
+        
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.compact_interval = compact_interval
+        
+        self._init_db()
+        self._migrate_json_cache()
+        
+        # 启动时不再扫描全部条目，过期清理和配额淘汰交给后台线程
+        if background_compaction:
+            threading.Thread(target=self._compaction_loop, name="paper-cache-compaction", daemon=True).start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接（fork之后的子进程会重新建立连接）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def _write(self, sql: str, params=(), max_retries: int = 5):
+        """
+        执行一条写语句
+        
+        进程内的写入通过锁串行化；其他进程持有写锁时由busy_timeout等待，
+        超时后再退避重试。
+        """
+        for attempt in range(max_retries):
+            try:
+                with self._write_lock:
+                    return self._connect().execute(sql, params)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or attempt == max_retries - 1:
+                    raise
+                time.sleep(0.1 * (2 ** attempt))
     
-    def _load_cache(self) -> Dict[str, Any]:
-        """加载缓存文件"""
-        if os.path.exists(self.cache_file):
+    def _init_db(self):
+        """创建数据表"""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                cache_key TEXT PRIMARY KEY,
+                arxiv_id TEXT NOT NULL,
+                title TEXT,
+                summary TEXT NOT NULL,
+                content_hash TEXT,
+                cached_at TEXT NOT NULL,
+                provider TEXT,
+                model_name TEXT
+            )
+        """)
+        # 旧版数据库升级：补充变体相关的列
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(summaries)")}
+        for column, column_type in (('prompt_hash', 'TEXT'), ('truncation', 'TEXT'), ('variant_key', 'TEXT'),
+                                    ('accessed_at', 'TEXT'), ('size_bytes', 'INTEGER'),
+                                    ('latency_s', 'REAL'), ('tokens', 'INTEGER'), ('simhash', 'TEXT'),
+                                    ('arxiv_version', 'TEXT')):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE summaries ADD COLUMN {column} {column_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_arxiv_id ON summaries (arxiv_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed_at ON summaries (accessed_at)")
+        
+        # 负缓存：记住失败的查询，在TTL内不再重复尝试
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS failures (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                reason TEXT,
+                created_at TEXT NOT NULL,
+                expires_at TEXT NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_failures_expires_at ON failures (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_cached_at ON summaries (cached_at)")
+        
+        # 长论文分块总结（map阶段）的中间结果，键为分块prompt与模型的哈希
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_summaries (
+                chunk_key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                model_name TEXT,
+                tokens INTEGER,
+                cached_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_summaries_cached_at ON chunk_summaries (cached_at)")
+        
+        # 正在进行的LLM调用（租约），共享缓存的多个进程据此合并同一篇论文的并发请求
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS inflight (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                acquired_at TEXT NOT NULL,
+                expires_at TEXT NOT NULL
+            )
+        """)
+    
+    def _migrate_json_cache(self):
+        """把旧版的 paper_summaries.json 导入数据库"""
+        if not os.path.exists(self.cache_file):
+            return
+        
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache_data = json.load(f)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"旧缓存文件损坏，跳过迁移: {e}")
+            return
+        
+        rows = []
+        for arxiv_id, entry in cache_data.items():
+            if not entry.get('summary'):
+                continue
+            model_info = entry.get('model_info', {})
+            rows.append((
+                arxiv_id, arxiv_id, entry.get('title', ''), entry['summary'],
+                entry.get('content_hash', ''), entry.get('cached_at', '1970-01-01'),
+                model_info.get('provider', 'unknown'), model_info.get('model_name', 'unknown'),
+            ))
+        
+        with self._write_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                # 清理过期缓存
-                current_time = datetime.now()
-                cleaned_cache = {}
-                
-                for arxiv_id, entry in cache_data.items():
-                    cached_time = datetime.fromisoformat(entry.get('cached_at', '1970-01-01'))
-                    if current_time - cached_time < timedelta(days=self.cache_expire_days):
-                        cleaned_cache[arxiv_id] = entry
-                
-                # 如果清理了缓存，保存更新后的缓存
-                if len(cleaned_cache) != len(cache_data):
-                    self._save_cache(cleaned_cache)
-                
-                return cleaned_cache
-                
-            except (json.JSONDecodeError, KeyError, ValueError) as e:
-                print(f"缓存文件损坏，重新创建: {e}")
-                return {}
-        
-        return {}
-    
-    def _save_cache(self, cache_data: Dict[str, Any] = None):
-        """保存缓存到文件"""
-        data_to_save = cache_data if cache_data is not None else self._cache
+                # 旧缓存不知道使用的prompt模板，先以arxiv_id为键保存（variant_key为空），
+                # 由使用默认模板的摘要器通过 adopt_legacy_entries 认领
+                conn.executemany(
+                    "INSERT OR IGNORE INTO summaries (cache_key, arxiv_id, title, summary, content_hash, cached_at, provider, model_name) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        
+        try:
+            os.replace(self.cache_file, self.cache_file + ".migrated")
+        except FileNotFoundError:
+            # 其他进程已经完成了迁移
+            return
+        print(f"📦 已将 {len(rows)} 条旧缓存迁移到 {self.db_file}")
+    
+    def adopt_legacy_entries(self, variant: Dict[str, str]) -> int:
+        """
+        把旧版JSON缓存迁移来的条目归入一个摘要变体
+        
+        旧缓存只记录了服务商和模型，摘要都是用当时的默认prompt模板生成的；
+        使用默认模板的摘要器把同一服务商、同一模型的旧条目换成自己的变体键，
+        之后的查询即可命中（内容指纹在首次命中时校验并升级）。
+        
+        Args:
+            variant: 默认prompt模板对应的摘要变体（provider、model_name、prompt_hash、truncation）
+            
+        Returns:
+            认领的条目数
+        """
+        variant = self._resolve_variant(variant)
+        variant_key = make_variant_key(variant)
+        adopted = self._write(
+            "UPDATE OR IGNORE summaries SET cache_key = arxiv_id || '#' || ?, prompt_hash = ?, truncation = ?, "
+            "variant_key = ? WHERE variant_key IS NULL AND cache_key = arxiv_id AND provider = ? AND model_name = ?",
+            (variant_key, variant['prompt_hash'], variant['truncation'], variant_key,
+             variant['provider'], variant['model_name'])
+        ).rowcount
+        if adopted:
+            print(f"📦 已将 {adopted} 条旧缓存归入 {variant['provider']}/{variant['model_name']} 的默认摘要")
+        return adopted
+    
+    def _expire_cutoff(self) -> str:
+        """过期时间点（ISO格式字符串可以直接比较大小）"""
+        return (datetime.now() - timedelta(days=self.cache_expire_days)).isoformat()
+    
+    def _purge_expired(self) -> int:
+        """删除过期缓存"""
+        self._write("DELETE FROM failures WHERE expires_at < ?", (datetime.now().isoformat(),))
+        self._write("DELETE FROM inflight WHERE expires_at < ?", (datetime.now().isoformat(),))
+        self._write("DELETE FROM chunk_summaries WHERE cached_at < ?", (self._expire_cutoff(),))
+        return self._write("DELETE FROM summaries WHERE cached_at < ?", (self._expire_cutoff(),)).rowcount
+    
+    def _evict_over_quota(self, batch_size: int = 500) -> int:
+        """按最近访问时间淘汰超出条目数或字节数配额的条目"""
+        evicted = 0
+        while True:
+            count, total_bytes = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM summaries"
+            ).fetchone()
+            if count <= self.max_disk_entries and total_bytes <= self.max_disk_bytes:
+                return evicted
+            
+            over_entries = count - self.max_disk_entries
+            if over_entries > 0:
+                n = min(batch_size, over_entries)
+            else:
+                # 按平均条目大小估算需要淘汰的条数
+                n = min(batch_size, int((total_bytes - self.max_disk_bytes) * count / total_bytes) + 1)
+            deleted = self._write(
+                "DELETE FROM summaries WHERE cache_key IN "
+                "(SELECT cache_key FROM summaries ORDER BY accessed_at LIMIT ?)", (n,)
+            ).rowcount
+            if not deleted:
+                return evicted
+            evicted += deleted
+    
+    def compact(self):
+        """
+        整理磁盘层：删除过期条目、淘汰超出配额的条目、回收WAL空间
+        
+        由后台线程定期调用，也可以手动调用。
+        """
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存缓存失败: {e}")
+            expired = self._purge_expired()
+            evicted = self._evict_over_quota()
+            self._connect().execute("PRAGMA wal_checkpoint(PASSIVE)")
+            if expired or evicted:
+                print(f"🧹 缓存整理: 删除过期 {expired} 条，淘汰 {evicted} 条")
+        except sqlite3.Error as e:
+            print(f"缓存整理失败: {e}")
+    
+    def _compaction_loop(self):
+        """后台整理线程"""
+        while True:
+            self.compact()
+            time.sleep(self.compact_interval)
+    
+    def _memory_get(self, cache_key: str):
+        """从内存LRU层读取"""
+        with self._memory_lock:
+            entry = self._memory.get(cache_key)
+            if entry is not None:
+                self._memory.move_to_end(cache_key)
+            return entry
+    
+    def _memory_put(self, cache_key: str, entry):
+        """写入内存LRU层，超出容量时淘汰最久未使用的条目"""
+        with self._memory_lock:
+            self._memory[cache_key] = entry
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+    
+    def _memory_is_current(self, cache_key: str, entry) -> bool:
+        """核对内存条目与数据库中的条目是否仍是同一份（按主键只读取缓存时间和内容指纹）"""
+        current = self._connect().execute(
+            "SELECT cached_at, content_hash FROM summaries WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        return current is not None and tuple(current) == (entry[2], entry[1])
+    
+    def _memory_discard(self, cache_key: str):
+        with self._memory_lock:
+            self._memory.pop(cache_key, None)
+    
+    def _count(self, model_name: str, **increments):
+        """累加某个模型的计数器"""
+        with self._counters_lock:
+            counters = self._counters.get(model_name)
+            if counters is None:
+                counters = self._counters[model_name] = dict.fromkeys(STAT_COUNTERS, 0)
+            for name, value in increments.items():
+                counters[name] += value
+    
+    def get_counters(self) -> Dict[str, Any]:
+        """
+        获取本进程的运行期计数器
+        
+        Returns:
+            包含 total（所有模型合计）和 by_model（按模型拆分）的字典，
+            每项包含 STAT_COUNTERS 中的计数和 hit_rate
+        """
+        with self._counters_lock:
+            by_model = {model: dict(counters) for model, counters in self._counters.items()}
+        total = dict.fromkeys(STAT_COUNTERS, 0)
+        for counters in by_model.values():
+            for name in STAT_COUNTERS:
+                total[name] += counters[name]
+        for counters in list(by_model.values()) + [total]:
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+            counters['llm_seconds_saved'] = round(counters['llm_seconds_saved'], 2)
+        return {'total': total, 'by_model': by_model}
+    
+    def reset_counters(self):
+        """清零运行期计数器"""
+        with self._counters_lock:
+            self._counters.clear()
     
     def _extract_arxiv_id(self, paper: Dict[str, Any]) -> Optional[str]:
         """从论文信息中提取arxiv.id"""
@@ -74,7 +405,6 @@ class PaperCache:
         url = paper.get('url', '')
         if 'arxiv.org' in url:
             # 匹配类似 "http://arxiv.org/pdf/2406.09172v2" 的URL
-            import re
             match = re.search(r'arxiv\.org/(?:pdf|abs)/(\d+\.\d+)', url)
             if match:
                 return match.group(1)
@@ -88,105 +418,476 @@ class PaperCache:
         
         return None
     
+    def _extract_paper_id(self, paper: Dict[str, Any]) -> Optional[str]:
+        """缓存使用的论文ID：arXiv ID，没有时使用DOI或本地PDF的文件指纹"""
+        arxiv_id = self._extract_arxiv_id(paper)
+        if arxiv_id:
+            return arxiv_id
+        doi = paper.get('doi', '')
+        if doi:
+            return f"doi:{doi.lower()}"
+        # 本地导入的PDF（见 survey.ingest）以文件内容指纹标识
+        fingerprint = paper.get('fingerprint')
+        if fingerprint:
+            return f"file:{fingerprint}"
+        return None
+    
+    def _extract_arxiv_version(self, paper: Dict[str, Any]) -> Optional[str]:
+        """论文的arXiv版本号（如 "v2"），未知时返回None"""
+        version = paper.get('version')
+        if version:
+            return version
+        match = re.search(r'arxiv\.org/(?:pdf|abs)/\d+\.\d+(v\d+)', paper.get('url', '') or '')
+        return match.group(1) if match else None
+    
     def _generate_content_hash(self, paper: Dict[str, Any]) -> str:
-        """生成论文内容的哈希值，用于检测内容变化"""
-        # 使用标题、摘要和PDF文本的前1000字符生成哈希
+        """
+        论文内容指纹，用于检测内容变化
+        
+        覆盖标题、摘要和完整全文；提取文本时已经计算过的指纹直接复用
+        """
+        return fingerprint_paper(paper)[0]
+    
+    def _legacy_content_hash(self, paper: Dict[str, Any]) -> str:
+        """旧版内容哈希（MD5，只覆盖全文前1000字符），用于校验从JSON缓存迁移来的条目（见 adopt_legacy_entries）"""
         content_parts = [
             paper.get('title', ''),
             paper.get('summary', ''),
-            paper.get('pdf_text', '')[:1000]
+            (paper.get('pdf_text') or '')[:1000]
         ]
         content = ''.join(content_parts)
         return hashlib.md5(content.encode('utf-8')).hexdigest()
     
-    def get_cached_summary(self, paper: Dict[str, Any]) -> Optional[str]:
+    def _resolve_variant(self, variant: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """补全变体描述；未指定时使用 set_model_info 设置的模型信息"""
+        resolved = {
+            'provider': getattr(self, '_last_provider', 'unknown'),
+            'model_name': getattr(self, '_last_model', 'unknown'),
+            'prompt_hash': '',
+            'truncation': '',
+        }
+        resolved.update({k: v for k, v in (variant or {}).items() if v is not None})
+        return resolved
+    
+    def get_cache_key(self, paper: Dict[str, Any], variant: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """
+        生成缓存键：论文ID（arXiv ID，没有时为DOI或本地文件指纹）+ 变体（模型、服务商、prompt模板哈希、截断策略）
+        
+        Args:
+            paper: 论文信息字典
+            variant: 变体描述，见 VARIANT_FIELDS
+            
+        Returns:
+            缓存键，无法确定论文ID时返回None
+        """
+        arxiv_id = self._extract_paper_id(paper)
+        if not arxiv_id:
+            return None
+        return f"{arxiv_id}#{make_variant_key(self._resolve_variant(variant))}"
+    
+    def get_cached_summary(self, paper: Dict[str, Any], variant: Optional[Dict[str, str]] = None) -> Optional[str]:
         """
         获取缓存的论文摘要
         
         Args:
             paper: 论文信息字典
+            variant: 摘要变体（provider、model_name、prompt_hash、truncation）
             
         Returns:
             缓存的摘要字符串，如果没有缓存则返回None
         """
-        arxiv_id = self._extract_arxiv_id(paper)
+        arxiv_id = self._extract_paper_id(paper)
         if not arxiv_id:
             return None
+        variant = self._resolve_variant(variant)
+        model_name = variant['model_name']
+        cache_key = f"{arxiv_id}#{make_variant_key(variant)}"
         
-        if arxiv_id in self._cache:
-            cached_entry = self._cache[arxiv_id]
-            
-            # 检查内容是否有变化（可选）
-            current_hash = self._generate_content_hash(paper)
-            cached_hash = cached_entry.get('content_hash', '')
-            
-            if current_hash == cached_hash:
-                print(f"📁 使用缓存摘要: {paper.get('title', 'Unknown')[:50]}...")
-                return cached_entry.get('summary', '')
+        # 先查内存层，再查磁盘层；内存条目需与数据库中的条目一致（其他进程可能已覆盖或删除）
+        row = self._memory_get(cache_key)
+        if row is not None and not self._memory_is_current(cache_key, row):
+            self._memory_discard(cache_key)
+            row = None
+        from_memory = row is not None
+        if row is None:
+            row = self._connect().execute(
+                "SELECT summary, content_hash, cached_at, latency_s, tokens, simhash, arxiv_version FROM summaries WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+        if row is None:
+            self._count(model_name, misses=1)
+            return None
+        
+        # 访问时才检查过期
+        summary, cached_hash, cached_at, latency_s, tokens, cached_simhash, cached_version = row
+        if cached_at < self._expire_cutoff():
+            self._memory_discard(cache_key)
+            self._count(model_name, misses=1)
+            return None
+        
+        # 检查内容是否有变化
+        current_hash, current_simhash = fingerprint_paper(paper)
+        current_version = self._extract_arxiv_version(paper)
+        near_duplicate = False
+        if current_hash != cached_hash:
+            if cached_hash and ':' not in cached_hash and cached_hash == self._legacy_content_hash(paper):
+                # 迁移来的旧版MD5条目：内容未变，升级为新指纹，之后的命中不再计算MD5
+                row = (summary, current_hash, cached_at, latency_s, tokens, current_simhash, current_version)
+                self._write("UPDATE summaries SET content_hash = ?, simhash = ?, arxiv_version = ? WHERE cache_key = ?",
+                            (current_hash, current_simhash, current_version, cache_key))
+                from_memory = False
+            elif cached_version == current_version and is_near_duplicate(cached_simhash, current_simhash):
+                # 同一arXiv版本只有空白、错别字级别的改动（如换了文本提取方式），沿用已有摘要；
+                # 新版本一律重新总结
+                near_duplicate = True
+                print(f"🪞 论文内容仅有细微变化，沿用缓存摘要: {arxiv_id}")
             else:
-                print(f"🔄 论文内容已更新，重新生成摘要: {arxiv_id}")
-                # 删除过期缓存
-                del self._cache[arxiv_id]
+                row = None
         
+        if row is not None:
+            if not from_memory:
+                self._memory_put(cache_key, tuple(row))
+                self._touch(cache_key)
+            self._count(
+                model_name,
+                hits=1,
+                memory_hits=int(from_memory),
+                near_duplicate_hits=int(near_duplicate),
+                bytes_read=len(summary.encode('utf-8')),
+                llm_seconds_saved=latency_s or 0.0,
+                tokens_saved=tokens or 0,
+            )
+            print(f"📁 使用缓存摘要: {paper.get('title', 'Unknown')[:50]}...")
+            return summary
+        
+        print(f"🔄 论文内容已更新，重新生成摘要: {arxiv_id}")
+        self._count(model_name, misses=1, invalidations=1)
+        # 只删除旧内容对应的条目，其他进程刚写入的新摘要不受影响
+        self._memory_discard(cache_key)
+        self._write("DELETE FROM summaries WHERE cache_key = ? AND content_hash = ?", (cache_key, cached_hash))
         return None
     
-    def cache_summary(self, paper: Dict[str, Any], summary: str):
+    def _touch(self, cache_key: str):
+        """更新磁盘条目的最近访问时间（一小时内最多更新一次，避免每次命中都写库）"""
+        now = datetime.now()
+        self._write(
+            "UPDATE summaries SET accessed_at = ? WHERE cache_key = ? AND (accessed_at IS NULL OR accessed_at < ?)",
+            (now.isoformat(), cache_key, (now - timedelta(hours=1)).isoformat())
+        )
+    
+    def cache_summary(self, paper: Dict[str, Any], summary: str, variant: Optional[Dict[str, str]] = None,
+                      provider: str = None, model_name: str = None,
+                      latency_s: float = None, tokens: int = None):
         """
         缓存论文摘要
         
         Args:
             paper: 论文信息字典
             summary: 生成的摘要
+            variant: 摘要变体（provider、model_name、prompt_hash、truncation）
+            provider: 生成摘要的服务商，覆盖variant中的值
+            model_name: 生成摘要的模型，覆盖variant中的值
+            latency_s: 生成摘要的LLM调用耗时（秒），命中时计入节省的时间
+            tokens: 生成摘要消耗的token数，命中时计入节省的token
         """
-        arxiv_id = self._extract_arxiv_id(paper)
+        arxiv_id = self._extract_paper_id(paper)
         if not arxiv_id or not summary:
             return
         
-        cache_entry = {
-            'arxiv_id': arxiv_id,
-            'title': paper.get('title', ''),
-            'summary': summary,
-            'content_hash': self._generate_content_hash(paper),
-            'cached_at': datetime.now().isoformat(),
-            'model_info': {
-                'provider': getattr(self, '_last_provider', 'unknown'),
-                'model_name': getattr(self, '_last_model', 'unknown')
-            }
-        }
+        variant = dict(variant or {})
+        if provider:
+            variant['provider'] = provider
+        if model_name:
+            variant['model_name'] = model_name
+        variant = self._resolve_variant(variant)
+        variant_key = make_variant_key(variant)
+        
+        cache_key = f"{arxiv_id}#{variant_key}"
+        content_hash, content_simhash = fingerprint_paper(paper)
+        arxiv_version = self._extract_arxiv_version(paper)
+        now = datetime.now().isoformat()
+        size_bytes = len(summary.encode('utf-8'))
+        row = (
+            cache_key,
+            arxiv_id,
+            paper.get('title', ''),
+            summary,
+            content_hash,
+            now,
+            variant['provider'],
+            variant['model_name'],
+            variant['prompt_hash'],
+            variant['truncation'],
+            variant_key,
+            now,
+            size_bytes,
+            latency_s,
+            tokens,
+            content_simhash,
+            arxiv_version,
+        )
+        
+        # 单条插入，不再重写整个缓存文件
+        self._write(
+            "INSERT OR REPLACE INTO summaries (cache_key, arxiv_id, title, summary, content_hash, cached_at, "
+            "provider, model_name, prompt_hash, truncation, variant_key, accessed_at, size_bytes, latency_s, tokens, simhash, "
+            "arxiv_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            row
+        )
+        self._memory_put(cache_key, (summary, content_hash, now, latency_s, tokens, content_simhash, arxiv_version))
+        self._count(variant['model_name'], writes=1, bytes_written=size_bytes)
+        print(f"💾 已缓存摘要: {paper.get('title', 'Unknown')[:50]}... ({arxiv_id})")
+    
+    def list_variants(self, paper: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        列出一篇论文已缓存的所有摘要变体
+        
+        Args:
+            paper: 论文信息字典
+            
+        Returns:
+            变体信息列表
+        """
+        arxiv_id = self._extract_paper_id(paper)
+        if not arxiv_id:
+            return []
+        rows = self._connect().execute(
+            "SELECT provider, model_name, prompt_hash, truncation, cached_at FROM summaries WHERE arxiv_id = ?",
+            (arxiv_id,)
+        ).fetchall()
+        return [dict(zip(VARIANT_FIELDS + ('cached_at',), row)) for row in rows]
+    
+    def export_entries(self, arxiv_ids: Optional[List[str]] = None, model_names: Optional[List[str]] = None,
+                       since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        导出缓存条目
+        
+        Args:
+            arxiv_ids: 只导出这些论文（不含版本号），默认全部
+            model_names: 只导出这些模型生成的摘要，默认全部
+            since: 只导出该时间（ISO格式）之后缓存的条目
+            
+        Returns:
+            条目字典列表，字段见 ENTRY_FIELDS
+        """
+        conditions, params = ["cached_at >= ?"], [self._expire_cutoff()]
+        if since:
+            conditions.append("cached_at >= ?")
+            params.append(since)
+        for column, values in (('arxiv_id', arxiv_ids), ('model_name', model_names)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        rows = self._connect().execute(
+            f"SELECT {', '.join(ENTRY_FIELDS)} FROM summaries WHERE {' AND '.join(conditions)}", params
+        ).fetchall()
+        return [dict(zip(ENTRY_FIELDS, row)) for row in rows]
+    
+    def import_entry(self, entry: Dict[str, Any], model_priority: Optional[List[str]] = None) -> str:
+        """
+        合并一条导入的缓存条目
+        
+        冲突规则：
+        1. 同一缓存键已存在时，保留缓存时间较新的一条；
+        2. 指定 model_priority 时，如果同一篇论文在相同prompt模板和截断策略下
+           已有优先级更高的模型生成的摘要，则跳过优先级较低的导入条目。
+        
+        Args:
+            entry: export_entries 导出的条目字典
+            model_priority: 模型优先级列表，靠前的优先；不在列表中的模型优先级最低
+            
+        Returns:
+            'added'、'replaced' 或 'skipped'
+        """
+        if not entry.get('cache_key') or not entry.get('summary'):
+            return 'skipped'
+        conn = self._connect()
+        existing = conn.execute(
+            "SELECT cached_at FROM summaries WHERE cache_key = ?", (entry['cache_key'],)
+        ).fetchone()
+        if existing and existing[0] >= entry['cached_at']:
+            return 'skipped'
+        
+        if model_priority and not existing:
+            rank = {model: i for i, model in enumerate(model_priority)}
+            incoming_rank = rank.get(entry['model_name'], len(rank))
+            models = conn.execute(
+                "SELECT model_name FROM summaries WHERE arxiv_id = ? AND prompt_hash IS ? AND truncation IS ?",
+                (entry['arxiv_id'], entry['prompt_hash'], entry['truncation'])
+            ).fetchall()
+            if any(rank.get(model, len(rank)) < incoming_rank for (model,) in models):
+                return 'skipped'
+        
+        self._write(
+            f"INSERT OR REPLACE INTO summaries ({', '.join(ENTRY_FIELDS)}, accessed_at) "
+            f"VALUES ({', '.join('?' * len(ENTRY_FIELDS))}, ?)",
+            tuple(entry.get(field) for field in ENTRY_FIELDS) + (datetime.now().isoformat(),)
+        )
+        self._memory_discard(entry['cache_key'])
+        return 'replaced' if existing else 'added'
+    
+    def remember_failure(self, kind: str, key: str, reason: str = ''):
+        """
+        记录一次失败，TTL内再次查询同一个key会直接跳过
         
-        self._cache[arxiv_id] = cache_entry
-        self._save_cache()
-        print(f"💾 已缓存摘要: {paper.get('title', 'Unknown')[:50]}... (arxiv:{arxiv_id})")
+        Args:
+            kind: 失败类型，见 NEGATIVE_CACHE_TTLS
+            key: 失败对象（标题、URL或缓存键）
+            reason: 失败原因
+        """
+        if not key:
+            return
+        now = datetime.now()
+        expires_at = now + NEGATIVE_CACHE_TTLS.get(kind, DEFAULT_NEGATIVE_TTL)
+        self._write(
+            "INSERT OR REPLACE INTO failures (kind, key, reason, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, key, reason, now.isoformat(), expires_at.isoformat())
+        )
+    
+    def get_failure(self, kind: str, key: str) -> Optional[str]:
+        """
+        查询负缓存
+        
+        Args:
+            kind: 失败类型
+            key: 失败对象
+            
+        Returns:
+            未过期时返回失败原因，否则返回None
+        """
+        if not key:
+            return None
+        row = self._connect().execute(
+            "SELECT reason, expires_at FROM failures WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        if row is None or row[1] < datetime.now().isoformat():
+            return None
+        return row[0] or kind
+    
+    def forget_failure(self, kind: str, key: str):
+        """删除一条负缓存记录"""
+        self._write("DELETE FROM failures WHERE kind = ? AND key = ?", (kind, key))
+    
+    def acquire_inflight(self, key: str, owner: str, ttl_s: float) -> bool:
+        """
+        获取一个键的租约，表示本调用方正在为它调用LLM
+        
+        同一个键同时只有一个调用方持有未过期的租约；持有者崩溃时租约到期后可被其他调用方接管。
+        
+        Args:
+            key: 租约键（摘要缓存键）
+            owner: 调用方标识（主机名、进程号和随机串）
+            ttl_s: 租约有效秒数
+            
+        Returns:
+            是否获得租约
+        """
+        now = datetime.now()
+        cursor = self._write(
+            "INSERT INTO inflight (key, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, acquired_at = excluded.acquired_at, "
+            "expires_at = excluded.expires_at "
+            "WHERE inflight.expires_at < excluded.acquired_at OR inflight.owner = excluded.owner",
+            (key, owner, now.isoformat(), (now + timedelta(seconds=ttl_s)).isoformat())
+        )
+        return cursor.rowcount > 0
+    
+    def is_inflight(self, key: str) -> bool:
+        """
+        只读检查一个键是否有未过期的租约（等待方轮询用，不占用写锁）
+        
+        Args:
+            key: 租约键（摘要缓存键）
+            
+        Returns:
+            是否有其他调用方持有未过期的租约
+        """
+        row = self._connect().execute("SELECT expires_at FROM inflight WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] >= datetime.now().isoformat()
+    
+    def release_inflight(self, key: str, owner: str):
+        """释放自己持有的租约（已被其他调用方接管的租约不受影响）"""
+        self._write("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, owner))
+    
+    def get_chunk_summary(self, chunk_key: str) -> Optional[str]:
+        """
+        获取缓存的分块总结
+        
+        Args:
+            chunk_key: 分块缓存键（分块prompt、服务商和模型的哈希）
+            
+        Returns:
+            分块总结，没有缓存时返回None
+        """
+        row = self._connect().execute(
+            "SELECT summary, cached_at FROM chunk_summaries WHERE chunk_key = ?", (chunk_key,)
+        ).fetchone()
+        if row is None or row[1] < self._expire_cutoff():
+            return None
+        return row[0]
+    
+    def cache_chunk_summary(self, chunk_key: str, summary: str, model_name: str = None, tokens: Optional[int] = None):
+        """
+        缓存分块总结，同一篇论文重新总结（换模板、重试失败的分块）时不必重新调用LLM
+        
+        Args:
+            chunk_key: 分块缓存键
+            summary: 分块总结
+            model_name: 生成总结的模型
+            tokens: 消耗的token数
+        """
+        if not summary:
+            return
+        self._write(
+            "INSERT OR REPLACE INTO chunk_summaries (chunk_key, summary, model_name, tokens, cached_at) VALUES (?, ?, ?, ?, ?)",
+            (chunk_key, summary, model_name, tokens, datetime.now().isoformat())
+        )
     
     def set_model_info(self, provider: str, model_name: str):
         """设置当前使用的模型信息，用于缓存记录"""
         self._last_provider = provider
         self._last_model = model_name
     
+    def _db_size_bytes(self) -> int:
+        """数据库文件（含WAL）总大小"""
+        return sum(os.path.getsize(path) for path in (self.db_file, self.db_file + "-wal") if os.path.exists(path))
+    
     def get_cache_stats(self) -> Dict[str, Any]:
-        """获取缓存统计信息"""
+        """获取缓存统计信息（条目数、文件大小，以及本进程的命中/未命中等计数器）"""
+        total, oldest, newest = self._connect().execute(
+            "SELECT COUNT(*), MIN(cached_at), MAX(cached_at) FROM summaries"
+        ).fetchone()
         return {
-            'total_entries': len(self._cache),
-            'cache_file': self.cache_file,
-            'cache_size_mb': round(os.path.getsize(self.cache_file) / 1024 / 1024, 2) if os.path.exists(self.cache_file) else 0,
-            'oldest_entry': min([entry.get('cached_at', '') for entry in self._cache.values()]) if self._cache else None,
-            'newest_entry': max([entry.get('cached_at', '') for entry in self._cache.values()]) if self._cache else None
+            'total_entries': total,
+            'memory_entries': len(self._memory),
+            'cache_file': self.db_file,
+            'cache_size_mb': round(self._db_size_bytes() / 1024 / 1024, 2),
+            'oldest_entry': oldest,
+            'newest_entry': newest,
+            'counters': self.get_counters(),
         }
     
     def clear_cache(self):
         """清空所有缓存"""
-        self._cache = {}
-        self._save_cache()
+        self._write("DELETE FROM summaries")
+        self._write("DELETE FROM failures")
+        self._write("DELETE FROM chunk_summaries")
+        self._write("DELETE FROM inflight")
+        with self._memory_lock:
+            self._memory.clear()
         print("🗑️  已清空所有缓存")
 
 
 # 全局缓存实例
 _global_cache = None
+_global_cache_lock = threading.Lock()
 
 
 def get_paper_cache() -> PaperCache:
-    """获取全局缓存实例"""
+    """获取全局缓存实例（数据保存在共享的数据库中，实例本身只持有连接）"""
     global _global_cache
     if _global_cache is None:
-        _global_cache = PaperCache()
+        with _global_cache_lock:
+            if _global_cache is None:
+                _global_cache = PaperCache()
     return _global_cache 
\ No newline at end of file
@@ -0,0 +1,278 @@
+"""Portable cache bundles: summaries, extracted texts and PDFs in one .tar.gz."""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .cache import PaperCache, get_paper_cache
+from .text_store import get_text_dir
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+ENTRIES_NAME = "summaries.jsonl"
+# PDF版本信息sidecar的后缀（与 arxiv_tools.download 一致）
+META_SUFFIX = ".meta.json"
+# sidecar中描述已提取全文的字段
+TEXT_META_FIELDS = ('text_path', 'text_length', 'content_fingerprint', 'simhash')
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _pdf_file_name(title: str) -> str:
+    """File name download.py stores a paper's PDF under."""
+    return "".join([c if c.isalnum() else "_" for c in title]) + ".pdf"
+
+
+def _find_text_files(text_dir: str, arxiv_ids: set) -> List[str]:
+    """Find spilled text files (named after the versioned arXiv ID) for the given papers."""
+    if not os.path.isdir(text_dir):
+        return []
+    names = []
+    for name in sorted(os.listdir(text_dir)):
+        match = re.match(r'^(\d{4}\.\d{4,5})(v\d+)?\.txt$', name)
+        if match and match.group(1) in arxiv_ids:
+            names.append(name)
+    return names
+
+
+def _read_sidecar(pdf_path: str) -> Dict[str, Any]:
+    try:
+        with open(pdf_path + META_SUFFIX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _rewrite_sidecar(data: bytes, text_dir: str) -> bytes:
+    """Point an imported sidecar's text_path at the local text directory; drop it if the text is missing."""
+    meta = json.loads(data.decode('utf-8'))
+    if meta.get('text_path'):
+        text_path = os.path.join(text_dir, os.path.basename(meta['text_path']))
+        if os.path.exists(text_path):
+            meta['text_path'] = text_path
+        else:
+            for field in TEXT_META_FIELDS:
+                meta.pop(field, None)
+    return json.dumps(meta, ensure_ascii=False).encode('utf-8')
+
+
+def _add_member(tar: tarfile.TarFile, name: str, data: bytes, manifest: Optional[Dict[str, Any]] = None):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.now().timestamp())
+    tar.addfile(info, io.BytesIO(data))
+    if manifest is not None:
+        manifest['files'][name] = {'sha256': _sha256(data), 'size': len(data)}
+
+
+def export_bundle(output_path: str,
+                  arxiv_ids: Optional[List[str]] = None,
+                  model_names: Optional[List[str]] = None,
+                  since: Optional[str] = None,
+                  include_texts: bool = True,
+                  include_pdfs: bool = False,
+                  text_dir: Optional[str] = None,
+                  pdf_dir: str = "pdfs",
+                  cache: Optional[PaperCache] = None) -> Dict[str, int]:
+    """
+    Pack selected cache entries into a compressed bundle.
+
+    Args:
+        output_path: Path of the bundle to write (.tar.gz)
+        arxiv_ids: Only export these papers (IDs without version), default all
+        model_names: Only export summaries from these models, default all
+        since: Only export entries cached after this ISO timestamp
+        include_texts: Include extracted paper texts (reused on import only
+            for papers whose PDF is included as well)
+        include_pdfs: Include downloaded PDFs and their version sidecars
+        text_dir: Directory of extracted texts, default from text_store
+        pdf_dir: Directory of downloaded PDFs
+        cache: Cache to export from, default the global cache
+
+    Returns:
+        Counts of exported entries, texts and PDFs
+    """
+    cache = cache or get_paper_cache()
+    entries = cache.export_entries(arxiv_ids=arxiv_ids, model_names=model_names, since=since)
+    exported_ids = {entry['arxiv_id'] for entry in entries}
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'entries': len(entries),
+        'files': {},
+    }
+    stats = {'entries': len(entries), 'texts': 0, 'pdfs': 0}
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.part"
+    with tarfile.open(tmp_path, "w:gz") as tar:
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode('utf-8')
+        _add_member(tar, ENTRIES_NAME, data, manifest)
+
+        text_paths = {}
+        if include_texts:
+            text_dir = get_text_dir(text_dir)
+            for name in _find_text_files(text_dir, exported_ids):
+                text_paths[name] = os.path.join(text_dir, name)
+
+        if include_pdfs:
+            seen = set()
+            for entry in entries:
+                name = _pdf_file_name(entry.get('title') or '')
+                path = os.path.join(pdf_dir, name)
+                if name in seen or not os.path.exists(path):
+                    continue
+                seen.add(name)
+                with open(path, 'rb') as f:
+                    _add_member(tar, f"pdfs/{name}", f.read(), manifest)
+                stats['pdfs'] += 1
+                # sidecar记录了PDF的校验信息和全文位置，导入后才能复用全文、发条件请求
+                meta = _read_sidecar(path)
+                if meta:
+                    _add_member(tar, f"pdfs/{name}{META_SUFFIX}",
+                                json.dumps(meta, ensure_ascii=False).encode('utf-8'), manifest)
+                    text_path = meta.get('text_path')
+                    if include_texts and text_path and os.path.exists(text_path):
+                        text_paths.setdefault(os.path.basename(text_path), text_path)
+
+        for name, path in sorted(text_paths.items()):
+            with open(path, 'rb') as f:
+                _add_member(tar, f"texts/{name}", f.read(), manifest)
+            stats['texts'] += 1
+
+        # 清单放在最后，包含前面所有文件的校验和
+        _add_member(tar, MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    os.replace(tmp_path, output_path)
+
+    print(f"📦 已导出缓存包: {output_path} (摘要 {stats['entries']} 条, 全文 {stats['texts']} 篇, PDF {stats['pdfs']} 个)")
+    return stats
+
+
+def _read_bundle(bundle_path: str) -> Dict[str, bytes]:
+    """Read all members of a bundle and verify them against the manifest."""
+    members = {}
+    with tarfile.open(bundle_path, "r:gz") as tar:
+        for member in tar.getmembers():
+            if not member.isfile():
+                continue
+            name = member.name
+            if name.startswith('/') or '..' in name.split('/'):
+                raise ValueError(f"缓存包包含非法路径: {name}")
+            members[name] = tar.extractfile(member).read()
+
+    if MANIFEST_NAME not in members:
+        raise ValueError(f"缓存包缺少清单文件: {bundle_path}")
+    manifest = json.loads(members.pop(MANIFEST_NAME).decode('utf-8'))
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"不支持的缓存包版本: {manifest.get('format_version')}")
+
+    expected = manifest.get('files', {})
+    if set(expected) != set(members):
+        raise ValueError("缓存包文件列表与清单不一致")
+    for name, data in members.items():
+        if _sha256(data) != expected[name]['sha256']:
+            raise ValueError(f"缓存包校验失败: {name}")
+    return members
+
+
+def import_bundle(bundle_path: str,
+                  model_priority: Optional[List[str]] = None,
+                  include_pdfs: bool = True,
+                  text_dir: Optional[str] = None,
+                  pdf_dir: str = "pdfs",
+                  cache: Optional[PaperCache] = None) -> Dict[str, int]:
+    """
+    Verify a bundle and merge it into the local cache.
+
+    Nothing is written unless every member matches the manifest checksums.
+    Summary conflicts are resolved by PaperCache.import_entry (newer entry
+    wins; optional model priority). Texts, PDFs and sidecars that already
+    exist locally are kept. Restored sidecars point at the local text
+    directory.
+
+    Args:
+        bundle_path: Path of the bundle to import
+        model_priority: Preferred models, best first
+        include_pdfs: Also restore PDFs (and their sidecars) contained in the bundle
+        text_dir: Directory of extracted texts, default from text_store
+        pdf_dir: Directory of downloaded PDFs
+        cache: Cache to import into, default the global cache
+
+    Returns:
+        Counts of added, replaced and skipped entries and restored texts and PDFs
+    """
+    cache = cache or get_paper_cache()
+    members = _read_bundle(bundle_path)
+
+    stats = {'added': 0, 'replaced': 0, 'skipped': 0, 'texts': 0, 'pdfs': 0}
+    for line in members.get(ENTRIES_NAME, b"").decode('utf-8').splitlines():
+        if line.strip():
+            stats[cache.import_entry(json.loads(line), model_priority=model_priority)] += 1
+
+    text_dir = get_text_dir(text_dir)
+    targets = {'texts/': (text_dir, 'texts')}
+    if include_pdfs:
+        os.makedirs(pdf_dir, exist_ok=True)
+        targets['pdfs/'] = (pdf_dir, 'pdfs')
+    # 先写全文和PDF，再写sidecar：sidecar中的全文路径要指向已经存在的本地文件
+    for name in sorted(members, key=lambda name: name.endswith(META_SUFFIX)):
+        prefix = name[:name.find('/') + 1]
+        if prefix not in targets:
+            continue
+        target_dir, counter = targets[prefix]
+        path = os.path.join(target_dir, os.path.basename(name))
+        if os.path.exists(path):
+            continue
+        data = members[name]
+        if name.endswith(META_SUFFIX):
+            data, counter = _rewrite_sidecar(data, text_dir), None
+        tmp_path = f"{path}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if counter:
+            stats[counter] += 1
+
+    print(f"📥 已导入缓存包: {bundle_path} (新增 {stats['added']}, 更新 {stats['replaced']}, 跳过 {stats['skipped']}, "
+          f"全文 {stats['texts']} 篇, PDF {stats['pdfs']} 个)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or import portable summary cache bundles')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Pack cache entries into a bundle')
+    export_parser.add_argument('output', help='Bundle path (.tar.gz)')
+    export_parser.add_argument('--ids', nargs='*', default=None, help='Only export these arXiv IDs')
+    export_parser.add_argument('--models', nargs='*', default=None, help='Only export summaries from these models')
+    export_parser.add_argument('--since', default=None, help='Only export entries cached after this ISO timestamp')
+    export_parser.add_argument('--no-texts', action='store_true', help='Do not include extracted texts')
+    export_parser.add_argument('--include-pdfs', action='store_true', help='Include downloaded PDFs and their sidecars')
+    export_parser.add_argument('--pdf_dir', default='pdfs', help='PDF directory')
+
+    import_parser = subparsers.add_parser('import', help='Merge a bundle into the local cache')
+    import_parser.add_argument('bundle', help='Bundle path (.tar.gz)')
+    import_parser.add_argument('--model-priority', nargs='*', default=None, help='Preferred models, best first')
+    import_parser.add_argument('--no-pdfs', action='store_true', help='Do not restore PDFs')
+    import_parser.add_argument('--pdf_dir', default='pdfs', help='PDF directory')
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_bundle(args.output, arxiv_ids=args.ids, model_names=args.models, since=args.since,
+                      include_texts=not args.no_texts, include_pdfs=args.include_pdfs, pdf_dir=args.pdf_dir)
+    else:
+        import_bundle(args.bundle, model_priority=args.model_priority, include_pdfs=not args.no_pdfs,
+                      pdf_dir=args.pdf_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ import pandas as pd
 from pathlib import Path
 from typing import List, Dict, Any, Union
 
+from .paper import Paper
+from .text_store import materialize_text, LazyText
+
 def ensure_directory(directory: str) -> str:
     """
     Ensure a directory exists.
@@ -22,7 +25,7 @@ def save_papers_to_jsonl(papers: List[Dict[str, Any]], output_file: str) -> str:
     Save papers to a JSONL file.
     
     Args:
-        papers: List of paper dictionaries
+        papers: List of Paper records or paper dictionaries
         output_file: Path to save the JSONL file
         
     Returns:
@@ -31,6 +34,9 @@ def save_papers_to_jsonl(papers: List[Dict[str, Any]], output_file: str) -> str:
     output_path = Path(output_file)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
+    # 磁盘上的懒加载文本在写出时展开
+    papers = [{k: materialize_text(v) if isinstance(v, LazyText) else v for k, v in paper.items()} for paper in papers]
+    
     pd.DataFrame(papers).to_json(
         output_path, 
         orient='records', 
@@ -41,19 +47,22 @@ def save_papers_to_jsonl(papers: List[Dict[str, Any]], output_file: str) -> str:
     print(f"Saved papers to {output_path}")
     return str(output_path)
 
-def load_papers_from_jsonl(input_file: str) -> List[Dict[str, Any]]:
+def load_papers_from_jsonl(input_file: str, as_records: bool = False) -> List[Union[Dict[str, Any], Paper]]:
     """
     Load papers from a JSONL file.
     
     Args:
         input_file: Path to the JSONL file
+        as_records: Return Paper records instead of dictionaries
         
     Returns:
-        List of paper dictionaries
+        List of paper dictionaries (or Paper records)
     """
     input_path = Path(input_file)
     if not input_path.exists():
         raise FileNotFoundError(f"File not found: {input_file}")
     
     papers = pd.read_json(input_path, lines=True).to_dict(orient='records')
+    if as_records:
+        return [Paper.from_dict(paper) for paper in papers]
     return papers 
\ No newline at end of file
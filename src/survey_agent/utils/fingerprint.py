@@ -0,0 +1,138 @@
+"""Content fingerprints (hash and simhash) for papers."""
+import hashlib
+import re
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+SIMHASH_BITS = 64
+# 汉明距离不超过该值、且词数相差不超过 NEAR_DUPLICATE_LENGTH_DELTA 的两个版本视为"几乎相同"
+NEAR_DUPLICATE_DISTANCE = 2
+# 词数允许的相对变化，以及至少允许的词数差（错别字、空白修改基本不改变词数）
+NEAR_DUPLICATE_LENGTH_DELTA = 0.002
+NEAR_DUPLICATE_MIN_WORDS = 2
+SHINGLE_SIZE = 4
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case and collapse whitespace so layout-only changes do not alter the fingerprint."""
+    return ' '.join(str(text or '').lower().split())
+
+
+def content_fingerprint(title: str, summary: str, text: str) -> str:
+    """
+    Hash the normalized title, abstract and full text.
+
+    Args:
+        title: Paper title
+        summary: Paper abstract
+        text: Full paper text
+
+    Returns:
+        Fingerprint string prefixed with the algorithm, e.g. "xxh3:..." or "b2:..."
+    """
+    data = '\x1f'.join(normalize_text(part) for part in (title, summary, text)).encode('utf-8')
+    if xxhash is not None:
+        return f"xxh3:{xxhash.xxh3_128_hexdigest(data)}"
+    return f"b2:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> str:
+    """
+    Compute a 64-bit simhash over word shingles.
+
+    Each distinct shingle is hashed to 64 bits; bit i of the sketch is set when
+    more shingles have bit i set than not. Counting is done per byte value
+    (8 table updates per shingle instead of 64 bit tests).
+
+    Args:
+        text: Text to sketch
+        shingle_size: Number of words per shingle
+
+    Returns:
+        "<16 hex digits>:<word count>", empty for empty text
+    """
+    words = _WORD_RE.findall(str(text or '').lower())
+    if not words:
+        return ''
+    if len(words) < shingle_size:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+    tables = [[0] * 256 for _ in range(8)]
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        for position, byte in enumerate(digest):
+            tables[position][byte] += 1
+
+    half = len(shingles) / 2
+    value = 0
+    for position, table in enumerate(tables):
+        for bit in range(8):
+            mask = 1 << bit
+            if sum(count for byte, count in enumerate(table) if byte & mask) > half:
+                value |= 1 << (position * 8 + bit)
+    return f"{value:016x}:{len(words)}"
+
+
+def _split_sketch(sketch: str) -> Tuple[int, Optional[int]]:
+    """Parse a simhash into (value, word count); sketches from older versions have no word count."""
+    value, _, words = sketch.partition(':')
+    return int(value, 16), int(words) if words else None
+
+
+def hamming_distance(a: str, b: str) -> int:
+    """Number of differing bits between two simhashes."""
+    return bin(_split_sketch(a)[0] ^ _split_sketch(b)[0]).count('1')
+
+
+def is_near_duplicate(a: str, b: str, max_distance: int = NEAR_DUPLICATE_DISTANCE,
+                      max_length_delta: float = NEAR_DUPLICATE_LENGTH_DELTA) -> bool:
+    """
+    Whether two simhashes describe (almost) the same text.
+
+    Both the bit distance and the change in word count must be tiny, so only
+    whitespace- and typo-level edits match. Empty sketches and sketches
+    without a word count never match.
+    """
+    if not (a and b):
+        return False
+    (value_a, words_a), (value_b, words_b) = _split_sketch(a), _split_sketch(b)
+    if words_a is None or words_b is None:
+        return False
+    allowed = max(NEAR_DUPLICATE_MIN_WORDS, max(words_a, words_b) * max_length_delta)
+    return abs(words_a - words_b) <= allowed and bin(value_a ^ value_b).count('1') <= max_distance
+
+
+def fingerprint_text(title: str, summary: str, text: str) -> Tuple[str, str]:
+    """Return (content_fingerprint, simhash) for a paper's content."""
+    return content_fingerprint(title, summary, text), simhash(text or summary)
+
+
+def fingerprint_paper(paper: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Fingerprint a paper record and store the result on it.
+
+    Already computed values are reused, so this is cheap after extraction.
+
+    Args:
+        paper: Paper record or paper dictionary
+
+    Returns:
+        (content_fingerprint, simhash)
+    """
+    if paper.get('content_fingerprint'):
+        return paper['content_fingerprint'], paper.get('simhash') or ''
+    text = paper.get('pdf_text') or ''
+    if not isinstance(text, str):
+        text = str(text)
+    fingerprint, sketch = fingerprint_text(paper.get('title', ''), paper.get('summary', ''), text)
+    paper['content_fingerprint'] = fingerprint
+    paper['simhash'] = sketch
+    return fingerprint, sketch
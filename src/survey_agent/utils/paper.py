@@ -0,0 +1,250 @@
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .text_processing import extract_arxiv_id
+
+_MISSING = object()
+
+
+def split_arxiv_version(short_id: str) -> Tuple[str, str]:
+    """Split "2406.09172v2" into ("2406.09172", "v2")."""
+    match = re.match(r'^(.*?)(v\d+)?$', short_id or '')
+    return match.group(1), match.group(2) or ''
+
+
+class Paper:
+    """
+    Compact paper record used from search to markdown.
+
+    Replaces both the retained arxiv.Result objects and the per-stage paper
+    dictionaries. It supports the attribute access of arxiv.Result
+    (paper.title, paper.entry_id, paper.authors, ...) and the dictionary
+    access of the old paper dicts (paper['title'], paper.get('pdf_text', '')),
+    so existing code keeps working while each paper only costs one slotted object.
+
+    The 'authors' key returns the formatted author string, built lazily from the
+    author name tuple; unknown keys are kept in a small 'extra' dictionary.
+    """
+
+    __slots__ = (
+        'arxiv_id', 'version', 'title', 'author_names', 'summary', 'url', 'pdf_url',
+        'published', 'updated', 'comment', 'categories', 'doi', 'year',
+        'pdf_path', 'pdf_text', 'text_source', 'content_fingerprint', 'simhash', 'llm_summary_res',
+        'extra', '_authors_text',
+    )
+
+    # 字典接口可以访问的字段；值为None表示"尚未设置"
+    FIELDS = (
+        'arxiv_id', 'version', 'title', 'authors', 'summary', 'url', 'pdf_url',
+        'published', 'updated', 'comment', 'categories', 'doi', 'year',
+        'pdf_path', 'pdf_text', 'text_source', 'content_fingerprint', 'simhash', 'llm_summary_res',
+    )
+
+    def __init__(self, title: str = '', authors: Iterable[str] = (), summary: str = '', url: str = '',
+                 pdf_url: str = '', published: str = '', updated: str = '', comment: str = '',
+                 categories: Iterable[str] = (), doi: str = '', year: str = '',
+                 arxiv_id: str = '', version: str = '', extra: Optional[Dict[str, Any]] = None):
+        self.arxiv_id = arxiv_id
+        self.version = version
+        self.title = title
+        self.author_names = tuple(authors)
+        self.summary = summary
+        self.url = url
+        self.pdf_url = pdf_url or (f"https://arxiv.org/pdf/{arxiv_id}{version}" if arxiv_id else '')
+        self.published = published
+        self.updated = updated
+        self.comment = comment
+        self.categories = tuple(sys.intern(c) for c in categories)
+        self.doi = doi
+        self.year = year
+        self.pdf_path = None
+        self.pdf_text = None
+        self.text_source = None
+        self.content_fingerprint = None
+        self.simhash = None
+        self.llm_summary_res = None
+        self.extra = extra
+        self._authors_text = None
+
+    # ------------------------------------------------------------------
+    # 构造与转换
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_arxiv_result(cls, result) -> 'Paper':
+        """
+        Build a record from an arxiv.Result, dropping author objects and links.
+
+        Args:
+            result: arxiv.Result object
+
+        Returns:
+            Paper record
+        """
+        arxiv_id, version = split_arxiv_version(result.get_short_id())
+        return cls(
+            title=result.title,
+            authors=[author.name for author in result.authors],
+            summary=result.summary,
+            url=result.entry_id,
+            pdf_url=result.pdf_url or '',
+            published=result.published.isoformat() if result.published else '',
+            updated=result.updated.isoformat() if getattr(result, 'updated', None) else '',
+            comment=result.comment or '',
+            categories=result.categories or (),
+            doi=result.doi or '',
+            arxiv_id=arxiv_id,
+            version=version,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Paper':
+        """
+        Build a record from a paper dictionary (e.g. a JSONL line or a BIB entry).
+
+        Args:
+            data: Paper dictionary
+
+        Returns:
+            Paper record
+        """
+        short_id = data.get('arxiv_id') or extract_arxiv_id(data.get('url') or '') or extract_arxiv_id(data.get('pdf_url') or '')
+        arxiv_id, version = split_arxiv_version(short_id)
+
+        authors = data.get('authors') or ()
+        if isinstance(authors, str):
+            authors = (authors,)
+
+        paper = cls(
+            title=data.get('title') or '',
+            authors=authors,
+            summary=data.get('summary') or '',
+            url=data.get('url') or (f"https://arxiv.org/abs/{arxiv_id}" if arxiv_id else ''),
+            pdf_url=data.get('pdf_url') or '',
+            published=str(data.get('published') or ''),
+            updated=str(data.get('updated') or ''),
+            comment=data.get('comment') or '',
+            categories=data.get('categories') or (),
+            doi=data.get('doi') or '',
+            year=str(data.get('year') or ''),
+            arxiv_id=arxiv_id,
+            version=data.get('version') or version,
+        )
+        for key in ('pdf_path', 'pdf_text', 'text_source', 'content_fingerprint', 'simhash', 'llm_summary_res'):
+            if data.get(key) is not None:
+                setattr(paper, key, data[key])
+
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS}
+        paper.extra = extra or None
+        return paper
+
+    @classmethod
+    def from_any(cls, paper) -> 'Paper':
+        """Convert an arxiv.Result, a paper dictionary or a Paper into a Paper."""
+        if isinstance(paper, Paper):
+            return paper
+        if isinstance(paper, dict):
+            return cls.from_dict(paper)
+        return cls.from_arxiv_result(paper)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dictionary (the JSONL line format)."""
+        data = {key: value for key, value in self.items()}
+        if 'categories' in data:
+            data['categories'] = list(data['categories'])
+        return data
+
+    # ------------------------------------------------------------------
+    # arxiv.Result 兼容接口
+    # ------------------------------------------------------------------
+
+    @property
+    def authors(self) -> Tuple[str, ...]:
+        """Author names."""
+        return self.author_names
+
+    @property
+    def authors_text(self) -> str:
+        """Comma-separated author list, formatted on first use."""
+        if self._authors_text is None:
+            self._authors_text = ', '.join(self.author_names)
+        return self._authors_text
+
+    @property
+    def entry_id(self) -> str:
+        return self.url
+
+    def get_short_id(self) -> str:
+        """arXiv ID with version, e.g. "2406.09172v2"."""
+        return f"{self.arxiv_id}{self.version}"
+
+    @property
+    def canonical_id(self) -> str:
+        """Stable identifier across versions and sources."""
+        if self.arxiv_id:
+            return self.arxiv_id
+        if self.doi:
+            return f"doi:{self.doi.lower()}"
+        return f"title:{' '.join(self.title.lower().split())}"
+
+    # ------------------------------------------------------------------
+    # 字典兼容接口
+    # ------------------------------------------------------------------
+
+    def _lookup(self, key: str, default: Any = _MISSING) -> Any:
+        if key == 'authors':
+            return self.authors_text
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __setitem__(self, key: str, value: Any):
+        if key == 'authors':
+            self.author_names = (value,) if isinstance(value, str) else tuple(value)
+            self._authors_text = None
+        elif key == 'categories':
+            self.categories = tuple(sys.intern(c) for c in value)
+        elif key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def keys(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if key in self:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.keys())
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key in self.keys():
+            yield key, self[key]
+
+    def __repr__(self) -> str:
+        return f"Paper({self.canonical_id!r}, title={self.title[:40]!r})"
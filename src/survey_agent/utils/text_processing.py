@@ -49,4 +49,23 @@ def truncate_text(text: str, max_length: int = 10000) -> str:
         return '\n\n'.join(paragraphs[:-1]) + '\n\n[Text truncated...]'
     
     # If no paragraph boundary, truncate at the maximum length
-    return text[:max_length] + '\n[Text truncated...]' 
\ No newline at end of file
+    return text[:max_length] + '\n[Text truncated...]' 
+
+def extract_arxiv_id(text: str, keep_version: bool = True) -> str:
+    """
+    Extract an arXiv identifier from a URL, DOI or free text.
+    
+    Args:
+        text: Text that may contain an arXiv ID (e.g. "http://arxiv.org/abs/2406.09172v2")
+        keep_version: Whether to keep the version suffix (e.g. "v2")
+        
+    Returns:
+        arXiv ID if found, empty string otherwise
+    """
+    if not text:
+        return ""
+    match = re.search(r'(\d{4}\.\d{4,5})(v\d+)?', text)
+    if not match:
+        return ""
+    version = match.group(2) if keep_version and match.group(2) else ""
+    return match.group(1) + version
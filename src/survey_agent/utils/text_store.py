@@ -0,0 +1,85 @@
+import os
+import re
+from pathlib import Path
+from typing import Any, Optional
+
+DEFAULT_TEXT_DIR = os.path.join("cache", "texts")
+
+
+class LazyText:
+    """
+    Handle to paper text stored on disk.
+    
+    Behaves like a read-only string for the operations the pipeline uses
+    (slicing, str(), len(), truth value), but only loads the text while it is
+    being used, so hundreds of papers can be kept alive without their full text.
+    """
+    
+    __slots__ = ('path', '_length')
+    
+    def __init__(self, path: str, length: int):
+        """
+        Args:
+            path: File holding the UTF-8 text
+            length: Length of the text in characters
+        """
+        self.path = str(path)
+        self._length = length
+    
+    def read(self) -> str:
+        """Load the text from disk."""
+        try:
+            return Path(self.path).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            print(f"⚠️ 文本文件不存在: {self.path}")
+            return ""
+    
+    def __str__(self) -> str:
+        return self.read()
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __bool__(self) -> bool:
+        return self._length > 0
+    
+    def __getitem__(self, item) -> str:
+        return self.read()[item]
+    
+    def __repr__(self) -> str:
+        return f"LazyText({self.path!r}, length={self._length})"
+
+
+def get_text_dir(text_dir: Optional[str] = None) -> str:
+    """Return (and create) the directory spilled texts are written to."""
+    text_dir = text_dir or os.environ.get("SURVEY_AGENT_TEXT_DIR", DEFAULT_TEXT_DIR)
+    os.makedirs(text_dir, exist_ok=True)
+    return text_dir
+
+
+def spill_text(text: str, key: str, text_dir: Optional[str] = None) -> LazyText:
+    """
+    Write text to disk and return a lazy handle to it.
+    
+    Args:
+        text: Text to spill
+        key: Stable name for the blob (e.g. arXiv ID)
+        text_dir: Directory to write to, defaults to $SURVEY_AGENT_TEXT_DIR or cache/texts
+        
+    Returns:
+        LazyText handle
+    """
+    safe_key = re.sub(r'[^\w.\-]', '_', key)[:150] or "untitled"
+    path = os.path.join(get_text_dir(text_dir), f"{safe_key}.txt")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return LazyText(path, len(text))
+
+
+def materialize_text(value: Any) -> str:
+    """Return the text behind a LazyText handle, or the value itself for plain strings."""
+    if isinstance(value, LazyText):
+        return value.read()
+    return value or ""
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+测试共用的fixture
+"""
+
+import pytest
+
+from survey_agent.utils import cache as cache_module
+from survey_agent.utils.cache import PaperCache
+
+
+@pytest.fixture
+def paper_cache(tmp_path, monkeypatch):
+    """临时目录中的全局摘要缓存（get_paper_cache 返回它）"""
+    cache = PaperCache(cache_dir=str(tmp_path / 'cache'), background_compaction=False)
+    monkeypatch.setattr(cache_module, '_global_cache', cache)
+    return cache
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+阶段产物存储测试（复用与重新计算的原因）
+"""
+
+import pytest
+
+from survey_agent.survey import artifacts
+from survey_agent.survey.artifacts import ArtifactStore
+
+INPUTS = {'content': 'fingerprint-1', 'variant': {'model_name': 'gpt-4o-mini'}}
+
+
+class Compute:
+    """记录调用次数的计算函数"""
+
+    def __init__(self, value='summary'):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_first_run_computes_then_reuses(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    compute = Compute()
+    assert store.explain('summary', 'paper', INPUTS) == "no previous artifact"
+
+    assert store.memoize('summary', 'paper', INPUTS, compute) == 'summary'
+    assert store.explain('summary', 'paper', INPUTS) is None
+    assert store.memoize('summary', 'paper', INPUTS, compute) == 'summary'
+    assert compute.calls == 1
+    assert store.explanations == [('summary', 'paper', "no previous artifact")]
+    assert store.report(verbose=False)['summary'] == {'reused': 1, 'recomputed': 1}
+
+    # 新的存储实例（下一次运行）同样复用
+    assert ArtifactStore(str(tmp_path)).memoize('summary', 'paper', INPUTS, compute) == 'summary'
+    assert compute.calls == 1
+
+
+def test_forced_stage_is_recomputed(tmp_path):
+    ArtifactStore(str(tmp_path)).memoize('summary', 'paper', INPUTS, Compute())
+    store = ArtifactStore(str(tmp_path), force_stages=['summary'])
+    compute = Compute('new summary')
+
+    assert store.explain('summary', 'paper', INPUTS) == "forced (--force-stage)"
+    assert store.memoize('summary', 'paper', INPUTS, compute) == 'new summary'
+    assert compute.calls == 1
+    # 其他阶段不受影响
+    assert store.explain('process', 'paper', INPUTS) == "no previous artifact"
+
+
+def test_code_version_change_is_explained(tmp_path, monkeypatch):
+    ArtifactStore(str(tmp_path)).memoize('summary', 'paper', INPUTS, Compute())
+    monkeypatch.setitem(artifacts.STAGE_VERSIONS, 'summary', 2)
+    store = ArtifactStore(str(tmp_path))
+    compute = Compute()
+
+    assert store.explain('summary', 'paper', INPUTS) == "code version changed (1 -> 2)"
+    store.memoize('summary', 'paper', INPUTS, compute)
+    assert compute.calls == 1
+
+
+def test_changed_inputs_are_named(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.memoize('summary', 'paper', INPUTS, Compute())
+
+    changed = dict(INPUTS, content='fingerprint-2')
+    assert store.explain('summary', 'paper', changed) == "inputs changed: content"
+    added = dict(INPUTS, use_latex=True)
+    assert store.explain('summary', 'paper', added) == "inputs changed: use_latex"
+    both = {'content': 'fingerprint-2', 'variant': {'model_name': 'gpt-4o'}}
+    assert store.explain('summary', 'paper', both) == "inputs changed: content, variant"
+
+    compute = Compute('updated')
+    assert store.memoize('summary', 'paper', changed, compute) == 'updated'
+    assert store.explanations[-1] == ('summary', 'paper', "inputs changed: content")
+    # 原来的输入对应的产物仍然可以复用
+    assert store.explain('summary', 'paper', INPUTS) is None
+
+
+def test_unusable_artifact_is_recomputed(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.memoize('process', 'paper', INPUTS, Compute({'text': 'spilled'}))
+    compute = Compute({'text': 'fresh'})
+
+    value = store.memoize('process', 'paper', INPUTS, compute, decode=lambda data: None)
+    assert value == {'text': 'fresh'}
+    assert compute.calls == 1
+    assert store.explanations[-1] == ('process', 'paper', "stored artifact unusable")
+
+
+def test_none_result_is_not_stored(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    assert store.memoize('summary', 'paper', INPUTS, Compute(None)) is None
+    assert store.explain('summary', 'paper', INPUTS) == "no previous artifact"
+
+
+def test_unknown_stage_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="markdown"):
+        ArtifactStore(str(tmp_path), force_stages=['markdown'])
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+批处理总结测试（使用 examples/batch_stub_server.py 模拟批处理接口）
+"""
+
+import importlib.util
+import json
+import os
+import threading
+
+import pytest
+
+from survey_agent.llm.batch import BatchSummarizer
+from survey_agent.llm.summarize import OpenAISummarizer
+
+STUB_PATH = os.path.join(os.path.dirname(__file__), '..', 'examples', 'batch_stub_server.py')
+PROMPT = "Summary of {title}\n{abstract}"
+
+
+def load_stub():
+    spec = importlib.util.spec_from_file_location('batch_stub_server', STUB_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def stub_server():
+    stub = load_stub()
+    handler = type('Handler', (stub.Handler,), {'delay': 0.1, 'fail_rate': 0.0})
+    server = stub.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield stub, handler, f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def make_papers(n):
+    return [{'title': f'Paper {i}', 'summary': f'Abstract {i}', 'url': f'http://arxiv.org/abs/2401.0000{i}v1'}
+            for i in range(n)]
+
+
+def make_batch(base_url, job_dir):
+    summarizer = OpenAISummarizer('gpt-4o-mini', api_key='test', base_url=base_url, custom_prompt=PROMPT)
+    return summarizer, BatchSummarizer(summarizer, job_dir=str(job_dir), poll_interval=0.05)
+
+
+def test_results_are_mapped_back_by_custom_id(stub_server, paper_cache, tmp_path):
+    stub, _, base_url = stub_server
+    summarizer, batch = make_batch(base_url, tmp_path / 'jobs')
+    papers = make_papers(3)
+
+    stats = batch.run(papers)
+    assert stats == {'submitted': 3, 'completed': 3, 'failed': 0, 'unmatched': 0}
+
+    (batch_info,) = stub.BATCHES.values()
+    lines = stub.FILES[batch_info['input_file_id']]['data'].decode('utf-8').splitlines()
+    prompts = [json.loads(line)['body']['messages'][-1]['content'] for line in lines]
+    assert sorted(prompts) == sorted(PROMPT.format(title=p['title'], abstract=p['summary']) for p in papers)
+
+    variant = summarizer.get_cache_variant()
+    for paper in papers:
+        assert f"Summary of {paper['title']}" in paper_cache.get_cached_summary(paper, variant)
+
+
+def test_failed_requests_are_resubmitted_on_the_next_run(stub_server, paper_cache, tmp_path):
+    """--fail_rate 的失败请求计入失败数，下次运行时重新提交"""
+    stub, handler, base_url = stub_server
+    summarizer, batch = make_batch(base_url, tmp_path / 'jobs')
+    papers = make_papers(2)
+
+    handler.fail_rate = 1.0
+    assert batch.run(papers) == {'submitted': 2, 'completed': 0, 'failed': 2, 'unmatched': 0}
+    assert paper_cache.get_cached_summary(papers[0], summarizer.get_cache_variant()) is None
+
+    handler.fail_rate = 0.0
+    assert batch.run(papers) == {'submitted': 2, 'completed': 2, 'failed': 0, 'unmatched': 0}
+    assert len(stub.BATCHES) == 2
+    assert batch.run(papers)['submitted'] == 0
+
+
+def test_interrupted_job_resumes_from_manifest(stub_server, paper_cache, tmp_path):
+    """wait=False 提交后中断，重新运行时从 manifest.json 继续，不重复提交"""
+    stub, _, base_url = stub_server
+    papers = make_papers(3)
+
+    _, batch = make_batch(base_url, tmp_path / 'jobs')
+    assert batch.run(papers, wait=False)['submitted'] == 3
+    (job,) = os.listdir(tmp_path / 'jobs')
+    with open(tmp_path / 'jobs' / job / 'manifest.json', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert len(manifest['batches']) == 1 and not manifest['batches'][0]['collected']
+
+    summarizer, resumed = make_batch(base_url, tmp_path / 'jobs')
+    stats = resumed.run(papers)
+    assert stats == {'submitted': 0, 'completed': 3, 'failed': 0, 'unmatched': 0}
+    assert len(stub.BATCHES) == 1
+    assert paper_cache.get_cached_summary(papers[2], summarizer.get_cache_variant()).startswith("[stub summary]")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+BIB标题搜索的负缓存测试（arXiv客户端被替换为假实现）
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from survey_agent.utils import bib_parser
+from survey_agent.utils.bib_parser import BibParser
+
+TITLE = "Attention Is All You Need"
+
+
+def arxiv_result(title):
+    return SimpleNamespace(
+        title=title, authors=[SimpleNamespace(name="Ashish Vaswani")], summary="We propose the Transformer.",
+        entry_id="http://arxiv.org/abs/1706.03762v5", pdf_url="http://arxiv.org/pdf/1706.03762v5",
+        published=datetime(2017, 6, 12), updated=None, comment=None, categories=["cs.CL"], doi=None,
+        get_short_id=lambda: "1706.03762v5",
+    )
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """记录发出的搜索；results 为每次搜索返回的结果（异常则抛出）"""
+    state = SimpleNamespace(queries=[], results=[])
+
+    class FakeClient:
+        def results(self, search):
+            state.queries.append(search.query)
+            if isinstance(state.results, Exception):
+                raise state.results
+            return list(state.results)
+
+    monkeypatch.setattr(bib_parser.arxiv, 'Client', FakeClient)
+    return state
+
+
+def test_title_found(paper_cache, searches):
+    searches.results = [arxiv_result(TITLE)]
+    paper = BibParser().search_paper_by_title(TITLE)
+    assert paper.arxiv_id == "1706.03762"
+    assert paper_cache.get_failure('title_lookup', TITLE.lower()) is None
+
+
+def test_title_without_candidates_is_not_searched_again(paper_cache, searches):
+    parser = BibParser()
+    assert parser.search_paper_by_title(TITLE) is None
+    searched = len(searches.queries)
+    assert searched >= 2
+    assert paper_cache.get_failure('title_lookup', TITLE.lower()) == "未找到任何候选论文"
+
+    assert parser.search_paper_by_title(TITLE) is None
+    assert len(searches.queries) == searched
+
+
+def test_low_scoring_candidates_are_remembered(paper_cache, searches):
+    searches.results = [arxiv_result("Protein Folding With Graph Networks")]
+    parser = BibParser()
+    assert parser.search_paper_by_title(TITLE) is None
+    assert paper_cache.get_failure('title_lookup', TITLE.lower()).startswith("最高匹配分数")
+
+    searches.queries.clear()
+    searches.results = [arxiv_result(TITLE)]
+    # 负缓存有效期内不再搜索，即使现在能找到
+    assert parser.search_paper_by_title(TITLE) is None
+    assert searches.queries == []
+
+
+def test_search_errors_are_not_remembered(paper_cache, searches):
+    searches.results = ConnectionError("network down")
+    parser = BibParser()
+    assert parser.search_paper_by_title(TITLE) is None
+    assert paper_cache.get_failure('title_lookup', TITLE.lower()) is None
+
+    searches.results = [arxiv_result(TITLE)]
+    assert parser.search_paper_by_title(TITLE).arxiv_id == "1706.03762"
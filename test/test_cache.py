@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+摘要缓存（PaperCache）测试
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from survey_agent.utils.cache import DEFAULT_NEGATIVE_TTL, NEGATIVE_CACHE_TTLS, PaperCache
+from survey_agent.utils.fingerprint import fingerprint_paper
+
+PAPER = {
+    'title': 'Attention Is All You Need',
+    'summary': 'We propose the Transformer.',
+    'pdf_text': 'The dominant sequence transduction models are based on recurrent networks.',
+    'url': 'http://arxiv.org/abs/1706.03762v5',
+}
+
+
+def make_cache(cache_dir) -> PaperCache:
+    cache = PaperCache(cache_dir=str(cache_dir), background_compaction=False)
+    cache.set_model_info('openai', 'gpt-4o-mini')
+    return cache
+
+
+def test_memory_layer_sees_writes_of_other_instances(tmp_path):
+    """同一数据库上的两个实例：一方覆盖、清空后，另一方的内存层不再返回旧摘要"""
+    a = make_cache(tmp_path)
+    b = make_cache(tmp_path)
+
+    a.cache_summary(dict(PAPER), "OLD")
+    assert a.get_cached_summary(dict(PAPER)) == "OLD"
+
+    b.cache_summary(dict(PAPER), "NEW")
+    assert a.get_cached_summary(dict(PAPER)) == "NEW"
+
+    b.clear_cache()
+    assert a.get_cached_summary(dict(PAPER)) is None
+
+
+def test_memory_hits_are_counted(tmp_path):
+    """数据库中的条目未变化时，命中内存层"""
+    cache = make_cache(tmp_path)
+    cache.cache_summary(dict(PAPER), "SUMMARY")
+    assert cache.get_cached_summary(dict(PAPER)) == "SUMMARY"
+    assert cache.get_counters()['total']['memory_hits'] == 1
+
+
+def test_legacy_json_entries_are_adopted_by_the_default_variant(tmp_path):
+    """旧版JSON缓存迁移后，使用默认模板的变体可以命中"""
+    paper = dict(PAPER)
+    legacy_hash = hashlib.md5((paper['title'] + paper['summary'] + paper['pdf_text'][:1000]).encode('utf-8')).hexdigest()
+    with open(tmp_path / "paper_summaries.json", 'w', encoding='utf-8') as f:
+        json.dump({'1706.03762': {
+            'summary': "LEGACY", 'title': paper['title'], 'content_hash': legacy_hash,
+            'cached_at': datetime.now().isoformat(),
+            'model_info': {'provider': 'openai', 'model_name': 'gpt-4o-mini'},
+        }}, f)
+
+    cache = make_cache(tmp_path)
+    variant = {'prompt_hash': 'default', 'truncation': 'policy'}
+    assert cache.get_cached_summary(dict(paper), variant) is None
+    assert cache.adopt_legacy_entries(variant) == 1
+    assert cache.get_cached_summary(dict(paper), variant) == "LEGACY"
+    assert cache.get_cached_summary(dict(paper), {'prompt_hash': 'custom', 'truncation': 'policy'}) is None
+
+
+def test_legacy_content_hash_is_upgraded_on_first_hit(tmp_path):
+    """迁移来的条目首次命中时校验旧版MD5，并升级为新的内容指纹"""
+    paper = dict(PAPER)
+    legacy_hash = hashlib.md5((paper['title'] + paper['summary'] + paper['pdf_text'][:1000]).encode('utf-8')).hexdigest()
+    with open(tmp_path / "paper_summaries.json", 'w', encoding='utf-8') as f:
+        json.dump({'1706.03762': {
+            'summary': "LEGACY", 'content_hash': legacy_hash, 'cached_at': datetime.now().isoformat(),
+            'model_info': {'provider': 'openai', 'model_name': 'gpt-4o-mini'},
+        }}, f)
+
+    cache = make_cache(tmp_path)
+    cache.adopt_legacy_entries({})
+    assert cache.get_cached_summary(dict(paper)) == "LEGACY"
+    (content_hash,) = cache._connect().execute("SELECT content_hash FROM summaries").fetchone()
+    assert content_hash == fingerprint_paper(dict(paper))[0]
+
+    changed = dict(paper, pdf_text="Completely different text.")
+    assert cache.get_cached_summary(changed) is None
+
+
+def test_near_duplicate_reuse_requires_the_same_arxiv_version(tmp_path):
+    """细微改动只在同一arXiv版本内沿用旧摘要，新版本重新总结"""
+    text = ' '.join(f"word{i % 700}" for i in range(5000))
+    paper = dict(PAPER, pdf_text=text)
+    cache = make_cache(tmp_path)
+    cache.cache_summary(dict(paper), "V5")
+
+    typo_fixed = text.replace("word42 ", "wrd42 ", 1)
+    assert cache.get_cached_summary(dict(paper, pdf_text=typo_fixed)) == "V5"
+    assert cache.get_counters()['total']['near_duplicate_hits'] == 1
+
+    new_version = dict(paper, pdf_text=typo_fixed, url='http://arxiv.org/abs/1706.03762v6')
+    assert cache.get_cached_summary(new_version) is None
+
+
+def test_inflight_lease_is_visible_until_released_or_expired(tmp_path):
+    """等待方通过只读查询看到租约，释放或过期后可以接管"""
+    cache = make_cache(tmp_path)
+    assert not cache.is_inflight('key')
+    assert cache.acquire_inflight('key', 'a', 600)
+    assert cache.is_inflight('key')
+    assert not cache.acquire_inflight('key', 'b', 600)
+    cache.release_inflight('key', 'a')
+    assert not cache.is_inflight('key')
+
+    assert cache.acquire_inflight('key', 'a', -1)
+    assert not cache.is_inflight('key')
+    assert cache.acquire_inflight('key', 'b', 600)
+
+
+def test_negative_cache_ttl_depends_on_failure_kind(tmp_path):
+    """每种失败按各自的TTL保留，未知类型使用默认TTL"""
+    cache = make_cache(tmp_path)
+    kinds = list(NEGATIVE_CACHE_TTLS) + ['unknown_kind']
+    for kind in kinds:
+        cache.remember_failure(kind, 'key', f"{kind} failed")
+        assert cache.get_failure(kind, 'key') == f"{kind} failed"
+
+    rows = cache._connect().execute("SELECT kind, created_at, expires_at FROM failures").fetchall()
+    ttls = {kind: datetime.fromisoformat(expires) - datetime.fromisoformat(created) for kind, created, expires in rows}
+    assert ttls == dict(NEGATIVE_CACHE_TTLS, unknown_kind=DEFAULT_NEGATIVE_TTL)
+
+
+def test_negative_cache_entries_expire(tmp_path, monkeypatch):
+    """过期的失败记录不再生效；不同类型、不同key互不影响"""
+    cache = make_cache(tmp_path)
+    monkeypatch.setitem(NEGATIVE_CACHE_TTLS, 'pdf_404', timedelta(seconds=-1))
+    cache.remember_failure('pdf_404', 'http://example.com/a.pdf', "HTTP 404")
+    cache.remember_failure('title_lookup', 'some title')
+
+    assert cache.get_failure('pdf_404', 'http://example.com/a.pdf') is None
+    # 没有原因时返回失败类型
+    assert cache.get_failure('title_lookup', 'some title') == 'title_lookup'
+    assert cache.get_failure('pdf_404', 'some title') is None
+    assert cache.get_failure('title_lookup', 'other title') is None
+    assert cache.get_failure('title_lookup', '') is None
+
+    cache.forget_failure('title_lookup', 'some title')
+    assert cache.get_failure('title_lookup', 'some title') is None
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+缓存包导出/导入测试
+"""
+
+import json
+
+from survey_agent.utils.cache import PaperCache
+from survey_agent.utils.cache_bundle import export_bundle, import_bundle
+
+PAPER = {
+    'title': 'Attention Is All You Need',
+    'summary': 'We propose the Transformer.',
+    'pdf_text': 'The dominant sequence transduction models are based on recurrent networks.',
+    'url': 'http://arxiv.org/abs/1706.03762v5',
+}
+PDF_NAME = 'Attention_Is_All_You_Need.pdf'
+
+
+def make_cache(cache_dir) -> PaperCache:
+    cache = PaperCache(cache_dir=str(cache_dir), background_compaction=False)
+    cache.set_model_info('openai', 'gpt-4o-mini')
+    return cache
+
+
+def test_sidecars_are_restored_with_local_text_path(tmp_path):
+    """导入后sidecar保留校验信息，全文路径指向本机的全文目录"""
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    for root in (src, dst):
+        (root / 'pdfs').mkdir(parents=True)
+        (root / 'texts').mkdir()
+
+    cache = make_cache(src / 'cache')
+    cache.cache_summary(dict(PAPER), "SUMMARY")
+    (src / 'texts' / '1706.03762v5.txt').write_text(PAPER['pdf_text'], encoding='utf-8')
+    (src / 'pdfs' / PDF_NAME).write_bytes(b'%PDF-1.4')
+    (src / 'pdfs' / (PDF_NAME + '.meta.json')).write_text(json.dumps({
+        'arxiv_id': '1706.03762', 'version': 'v5', 'etag': '"abc"',
+        'text_path': str(src / 'texts' / '1706.03762v5.txt'),
+        'text_length': len(PAPER['pdf_text']), 'content_fingerprint': 'fp',
+    }), encoding='utf-8')
+
+    bundle = str(tmp_path / 'bundle.tar.gz')
+    stats = export_bundle(bundle, include_pdfs=True, text_dir=str(src / 'texts'),
+                          pdf_dir=str(src / 'pdfs'), cache=cache)
+    assert stats == {'entries': 1, 'texts': 1, 'pdfs': 1}
+
+    stats = import_bundle(bundle, text_dir=str(dst / 'texts'), pdf_dir=str(dst / 'pdfs'),
+                          cache=make_cache(dst / 'cache'))
+    assert stats['texts'] == 1 and stats['pdfs'] == 1
+
+    meta = json.loads((dst / 'pdfs' / (PDF_NAME + '.meta.json')).read_text(encoding='utf-8'))
+    assert meta['etag'] == '"abc"'
+    assert meta['text_path'] == str(dst / 'texts' / '1706.03762v5.txt')
+    assert meta['content_fingerprint'] == 'fp'
+
+
+def test_sidecar_without_bundled_text_drops_text_fields(tmp_path):
+    """缓存包中没有全文时，导入的sidecar不再指向全文"""
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    (src / 'pdfs').mkdir(parents=True)
+    cache = make_cache(src / 'cache')
+    cache.cache_summary(dict(PAPER), "SUMMARY")
+    (src / 'pdfs' / PDF_NAME).write_bytes(b'%PDF-1.4')
+    (src / 'pdfs' / (PDF_NAME + '.meta.json')).write_text(json.dumps({
+        'etag': '"abc"', 'text_path': '/elsewhere/1706.03762v5.txt', 'content_fingerprint': 'fp',
+    }), encoding='utf-8')
+
+    bundle = str(tmp_path / 'bundle.tar.gz')
+    export_bundle(bundle, include_texts=False, include_pdfs=True, pdf_dir=str(src / 'pdfs'), cache=cache)
+    import_bundle(bundle, text_dir=str(dst / 'texts'), pdf_dir=str(dst / 'pdfs'), cache=make_cache(dst / 'cache'))
+
+    meta = json.loads((dst / 'pdfs' / (PDF_NAME + '.meta.json')).read_text(encoding='utf-8'))
+    assert meta == {'etag': '"abc"'}
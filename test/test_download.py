@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+PDF下载的404负缓存测试（requests.get 被替换为假实现）
+"""
+
+import pytest
+import requests
+
+from survey_agent.arxiv_tools import download
+
+URL = "https://example.com/missing.pdf"
+
+
+class NotFound:
+    status_code = 404
+    headers = {}
+
+    def raise_for_status(self):
+        raise requests.exceptions.HTTPError(response=self)
+
+
+@pytest.fixture
+def requests_get(monkeypatch):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return NotFound()
+
+    monkeypatch.setattr(download.requests, 'get', get)
+    return calls
+
+
+def test_download_without_cache_does_not_open_one(requests_get, monkeypatch):
+    def no_cache():
+        raise AssertionError("没有传入缓存时不应创建全局缓存")
+
+    monkeypatch.setattr(download, 'get_paper_cache', no_cache)
+    assert download.download_to_memory(URL) is None
+    assert download.download_to_memory(URL) is None
+    assert requests_get == [URL, URL]
+
+
+def test_404_is_remembered_in_the_given_cache(requests_get, paper_cache, tmp_path):
+    assert download.download_to_memory(URL, cache=paper_cache) is None
+    assert paper_cache.get_failure('pdf_404', URL) == "HTTP 404"
+
+    assert download.download_to_memory(URL, cache=paper_cache) is None
+    assert not download.download_with_retry(URL, str(tmp_path / 'a.pdf'), cache=paper_cache)
+    assert requests_get == [URL]
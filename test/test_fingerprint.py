@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+内容指纹（simhash近似重复判断）测试
+"""
+
+import random
+
+from survey_agent.utils.fingerprint import is_near_duplicate, simhash
+
+
+def make_words(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(2000)]
+    return [rng.choice(vocab) for _ in range(n)]
+
+
+def test_whitespace_and_typo_changes_are_near_duplicates():
+    words = make_words(5000)
+    fixed = list(words)
+    fixed[1234] = "typo"
+    assert is_near_duplicate(simhash(' '.join(words)), simhash('  '.join(words)))
+    assert is_near_duplicate(simhash(' '.join(words)), simhash(' '.join(fixed)))
+
+
+def test_appended_text_is_not_a_near_duplicate():
+    """追加2%以上的新内容时不沿用旧摘要"""
+    for seed in range(10):
+        words = make_words(5000, seed)
+        extended = words + make_words(len(words) // 50, seed + 100)
+        assert not is_near_duplicate(simhash(' '.join(words)), simhash(' '.join(extended)))
+
+
+def test_sketches_without_word_count_never_match():
+    sketch = simhash(' '.join(make_words(100)))
+    assert not is_near_duplicate(sketch.split(':')[0], sketch)
+    assert not is_near_duplicate('', sketch)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+对冲请求测试（使用可控快慢的假请求）
+"""
+
+import asyncio
+import threading
+import time
+
+from survey_agent.llm.hedging import HedgePolicy
+from survey_agent.llm.resilience import SERVER_ERROR, SummaryFailure
+
+
+def make_policy(**kwargs) -> HedgePolicy:
+    options = dict(percentile=50, max_hedge_rate=1.0, min_delay=0.05, min_samples=3)
+    options.update(kwargs)
+    policy = HedgePolicy(**options)
+    for _ in range(3):
+        policy.observe(0.05, 'summary')
+    return policy
+
+
+def slow(seconds, result, calls=None, name=None):
+    def call():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(seconds)
+        return result
+    return call
+
+
+def test_fast_primary_runs_in_the_calling_thread_without_hedging():
+    policy = make_policy()
+    threads = []
+    calls = []
+
+    def primary():
+        threads.append(threading.current_thread())
+        return "fast", 10
+
+    assert policy.run(primary, slow(0, ("hedge", 10), calls, 'hedge'), kind='summary') == ("fast", 10)
+    assert threads == [threading.current_thread()]
+    assert not calls
+    assert policy.stats()['hedged'] == 0
+
+
+def test_hedge_that_finishes_first_wins():
+    policy = make_policy()
+    result = policy.run(slow(0.4, ("primary", 30)), slow(0, ("hedge", 20)), kind='summary')
+    assert result == ("hedge", 20)
+    stats = policy.stats()
+    assert (stats['hedged'], stats['hedge_wins'], stats['primary_wins']) == (1, 1, 0)
+    assert stats['extra_tokens'] == 30
+
+
+def test_hedge_is_used_when_the_primary_fails():
+    policy = make_policy()
+    failure = SummaryFailure(SERVER_ERROR, "boom")
+    assert policy.run(slow(0.1, (failure, None)), slow(0.3, ("hedge", 20)), kind='summary') == ("hedge", 20)
+    assert policy.stats()['hedge_wins'] == 1
+
+
+def test_primary_win_counts_the_losing_hedge_tokens():
+    policy = make_policy()
+    assert policy.run(slow(0.15, ("primary", 30)), slow(0.3, ("hedge", 20)), kind='summary') == ("primary", 30)
+    assert policy.stats()['primary_wins'] == 1
+    policy._executor.shutdown(wait=True)
+    assert policy.stats()['extra_tokens'] == 20
+
+
+def test_hedge_rate_is_capped():
+    policy = make_policy(max_hedge_rate=0.5)
+    calls = []
+    for _ in range(4):
+        policy.run(slow(0.12, ("primary", 1)), slow(0, ("hedge", 1), calls, 'hedge'), kind='summary')
+    stats = policy.stats()
+    assert stats['requests'] == 4
+    assert stats['hedged'] == len(calls) == 2
+    assert stats['rate_capped'] == 2
+
+
+def test_latency_windows_are_kept_per_kind():
+    policy = HedgePolicy(percentile=95, min_delay=0.01, min_samples=5)
+    for _ in range(20):
+        policy.observe(0.02, 'chunk')
+    assert policy.hedge_delay('summary') is None
+    for _ in range(20):
+        policy.observe(3.0, 'summary')
+    assert policy.hedge_delay('chunk') == 0.02
+    assert policy.hedge_delay('summary') == 3.0
+    assert policy.stats()['hedge_delay_s'] == {'chunk': 0.02, 'summary': 3.0}
+
+
+def test_async_loser_is_cancelled():
+    policy = make_policy()
+    cancelled = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(5)
+            return "primary", 30
+        except asyncio.CancelledError:
+            cancelled.append('primary')
+            raise
+
+    async def hedge():
+        return "hedge", 20
+
+    async def main():
+        start = time.monotonic()
+        result = await policy.run_async(primary, hedge, kind='summary')
+        await asyncio.sleep(0)
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(main())
+    assert result == ("hedge", 20) and elapsed < 1
+    assert cancelled == ['primary']
+    stats = policy.stats()
+    assert (stats['hedge_wins'], stats['cancelled']) == (1, 1)
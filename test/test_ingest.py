@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+本地PDF批量导入测试（增量导入与缓存键）
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from survey_agent.survey import ingest
+
+
+def write_pdf(path, title, body):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), title, fontsize=20)
+    page.insert_text((72, 120), f"Abstract\n{body}\n\n1 Introduction\nMore text.", fontsize=10)
+    doc.save(str(path))
+    doc.close()
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """在线程中提取并记录被提取的文件"""
+    paths = []
+
+    def extract(path):
+        paths.append(os.path.basename(path))
+        return extract_local_pdf(path)
+
+    extract_local_pdf = ingest.extract_local_pdf
+    monkeypatch.setattr(ingest, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(ingest, 'extract_local_pdf', extract)
+    return paths
+
+
+def test_second_ingest_does_not_reextract(tmp_path, extracted):
+    pdf_dir = tmp_path / 'pdfs'
+    (pdf_dir / 'sub').mkdir(parents=True)
+    write_pdf(pdf_dir / 'a.pdf', 'First Paper', 'About the first topic.')
+    write_pdf(pdf_dir / 'sub' / 'b.pdf', 'Second Paper', 'About the second topic.')
+
+    first = ingest.ingest_pdf_directory(str(pdf_dir), max_workers=2)
+    assert sorted(extracted) == ['a.pdf', 'b.pdf']
+
+    extracted.clear()
+    second = ingest.ingest_pdf_directory(str(pdf_dir), max_workers=2)
+    assert extracted == []
+    assert [p['content_fingerprint'] for p in second] == [p['content_fingerprint'] for p in first]
+    assert 'About the first topic.' in str(second[0]['pdf_text'])
+
+
+def test_modified_file_is_reextracted_and_old_record_pruned(tmp_path, extracted):
+    pdf_dir = tmp_path / 'pdfs'
+    pdf_dir.mkdir()
+    write_pdf(pdf_dir / 'a.pdf', 'First Paper', 'Original abstract.')
+    write_pdf(pdf_dir / 'b.pdf', 'Second Paper', 'Unchanged abstract.')
+    ingest.ingest_pdf_directory(str(pdf_dir), max_workers=2)
+    index = ingest._load_index(pdf_dir / ingest.INDEX_FILE_NAME)
+    old = index['files'][str((pdf_dir / 'a.pdf').resolve())]['fingerprint']
+
+    extracted.clear()
+    write_pdf(pdf_dir / 'a.pdf', 'First Paper', 'Revised abstract with new results.')
+    papers = ingest.ingest_pdf_directory(str(pdf_dir), max_workers=2)
+
+    assert extracted == ['a.pdf']
+    assert any('Revised abstract' in str(p['pdf_text']) for p in papers)
+    index = ingest._load_index(pdf_dir / ingest.INDEX_FILE_NAME)
+    assert old not in index['records']
+    assert len(index['records']) == 2
+    assert not (pdf_dir / ingest.TEXT_DIR_NAME / f"{old}.txt").exists()
+
+
+def test_deleted_file_record_is_pruned(tmp_path, extracted):
+    pdf_dir = tmp_path / 'pdfs'
+    pdf_dir.mkdir()
+    write_pdf(pdf_dir / 'a.pdf', 'First Paper', 'First abstract.')
+    write_pdf(pdf_dir / 'b.pdf', 'Second Paper', 'Second abstract.')
+    ingest.ingest_pdf_directory(str(pdf_dir), max_workers=2)
+
+    os.remove(pdf_dir / 'b.pdf')
+    assert len(ingest.ingest_pdf_directory(str(pdf_dir), max_workers=2)) == 1
+    index = ingest._load_index(pdf_dir / ingest.INDEX_FILE_NAME)
+    assert len(index['records']) == 1
+    assert len(list((pdf_dir / ingest.TEXT_DIR_NAME).iterdir())) == 1
+
+
+def test_local_papers_get_a_summary_cache_key(tmp_path, extracted, paper_cache):
+    pdf_dir = tmp_path / 'pdfs'
+    pdf_dir.mkdir()
+    write_pdf(pdf_dir / 'a.pdf', 'Local Paper', 'No arXiv identifier here.')
+    paper, = ingest.ingest_pdf_directory(str(pdf_dir), max_workers=1)
+    assert not paper.arxiv_id
+
+    variant = {'provider': 'openai', 'model_name': 'gpt-4o-mini', 'prompt_hash': 'p', 'truncation': 't'}
+    key = paper_cache.get_cache_key(paper, variant)
+    assert key.startswith(f"file:{paper['fingerprint']}#")
+    paper_cache.cache_summary(paper, "local summary", variant)
+    assert paper_cache.get_cached_summary(paper, variant) == "local summary"
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+LaTeX源码解析测试
+"""
+
+import gzip
+
+from survey_agent.arxiv_tools import download, latex
+from survey_agent.arxiv_tools.latex import latex_to_text, unpack_source
+from survey_agent.survey import generator
+from survey_agent.survey.artifacts import ArtifactStore
+from survey_agent.utils.paper import Paper
+
+
+def test_drop_commands_do_not_match_longer_names():
+    """\\cite 不应匹配 \\citet、\\citeauthor 等更长的命令名"""
+    text = latex_to_text(r"As \citet{smith} and \citeauthor{jones} show \citep{doe}, see \refname.")
+    assert "tsmith" not in text
+    assert "authorjones" not in text
+    assert "name" not in text
+    assert "doe" not in text
+
+
+def test_section_heading_with_nested_macro_keeps_label():
+    text = latex_to_text(r"\section{Intro with \emph{LLMs}}\label{sec:intro} Body text. \subsection{A \textbf{bold} \cite{x} part}")
+    assert "## Intro with LLMs" in text
+    assert "### A bold part" in text
+    assert "sec:intro" not in text
+
+
+def test_single_file_source_decompression_is_bounded(tmp_path, monkeypatch):
+    """单文件e-print按上限读取，超限的源码被拒绝"""
+    monkeypatch.setattr(latex, 'MAX_SOURCE_BYTES', 1024)
+    small = gzip.compress(b"\\documentclass{article}\\begin{document}Hi\\end{document}")
+    assert unpack_source(small, str(tmp_path))
+    assert (tmp_path / 'main.tex').read_bytes().startswith(b"\\documentclass")
+
+    (tmp_path / 'main.tex').unlink()
+    bomb = gzip.compress(b"\\documentclass{article}" + b" " * (10 * 1024 * 1024))
+    assert not unpack_source(bomb, str(tmp_path))
+    assert not (tmp_path / 'main.tex').exists()
+
+
+def test_process_paper_uses_latex_source(monkeypatch):
+    monkeypatch.setattr(latex, 'extract_text_from_latex_source', lambda arxiv_id: f"LaTeX text of {arxiv_id}")
+
+    def no_pdf(*args, **kwargs):
+        raise AssertionError("源码可用时不应下载PDF")
+
+    monkeypatch.setattr(download, 'download_paper_pdf', no_pdf)
+    paper = download.process_paper(Paper(title='T', arxiv_id='2406.00001', version='v2'), use_latex=True)
+
+    assert paper.pdf_text == "LaTeX text of 2406.00001v2"
+    assert paper.text_source == 'latex'
+    assert paper.pdf_path is None
+    assert paper['pdf_status'] == 'new'
+    assert download.summarize_revalidation([paper])['new'] == ['T']
+
+
+def test_use_latex_reaches_process_paper_and_artifact_inputs(tmp_path, monkeypatch):
+    calls = []
+
+    def process_paper(paper, pdf_dir=None, **kwargs):
+        calls.append(kwargs['use_latex'])
+        paper['pdf_text'] = 'text'
+        return paper
+
+    monkeypatch.setattr(generator, 'process_paper', process_paper)
+    store = ArtifactStore(str(tmp_path / 'artifacts'))
+
+    def paper():
+        return {'title': 'T', 'arxiv_id': '2406.00001', 'version': 'v1'}
+
+    generator._process_one(paper(), str(tmp_path), store, use_latex=True)
+    generator._process_one(paper(), str(tmp_path), store, use_latex=True)
+    # 切换文本来源后重新处理
+    generator._process_one(paper(), str(tmp_path), store, use_latex=False)
+    assert calls == [True, False]
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Paper记录的字典兼容接口测试
+"""
+
+from survey_agent.utils.paper import Paper
+
+
+def test_paper_iterates_like_a_dict():
+    paper = Paper.from_dict({'title': 'Attention Is All You Need', 'url': 'http://arxiv.org/abs/1706.03762v5',
+                             'note': 'extra'})
+    keys = list(paper)
+    assert keys == list(paper.keys())
+    assert 'title' in keys and 'note' in keys
+    assert len(paper) == len(keys)
+    assert dict(paper.items())['note'] == 'extra'
+    assert {k: paper[k] for k in paper}['title'] == 'Attention Is All You Need'
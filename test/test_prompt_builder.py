@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+按token预算构建prompt的测试（注册每个字符计为一个token的分词器）
+"""
+
+import pytest
+
+from survey_agent.llm import prompt_builder, tokenizer
+from survey_agent.llm.prompt_builder import (
+    DEFAULT_CONTEXT_WINDOW, TRUNCATION_MARKER, PromptBuilder, get_context_window, register_context_window,
+    split_sections,
+)
+from survey_agent.llm.tokenizer import Tokenizer, count_tokens, get_tokenizer, split_into_chunks
+
+MODEL = "test-char-model"
+
+
+class CharTokenizer(Tokenizer):
+    """每个字符一个token"""
+
+    name = "char"
+
+    def count(self, text):
+        return len(text)
+
+    def truncate(self, text, max_tokens):
+        return text[:max_tokens]
+
+
+@pytest.fixture(autouse=True)
+def char_tokenizer(monkeypatch):
+    monkeypatch.delenv("SURVEY_AGENT_CONTEXT_TOKENS", raising=False)
+    monkeypatch.setattr(tokenizer, '_registered', {})
+    monkeypatch.setattr(tokenizer, '_tokenizers', {})
+    monkeypatch.setattr(prompt_builder, '_context_windows', {})
+    tokenizer.register_tokenizer(MODEL, CharTokenizer())
+
+
+def section(heading, body_char, length):
+    return f"{heading}\n{body_char * length}\n"
+
+
+FRONT = "A Paper Title\nSome Author\n"
+ABSTRACT = section("Abstract", "a", 60)
+INTRO = section("1 Introduction", "i", 60)
+METHOD = section("2 Method", "m", 100)
+EXPERIMENTS = section("3 Experiments", "e", 300)
+RELATED = section("4 Related Work", "r", 80)
+REFERENCES = section("References", "x", 200)
+PAPER = FRONT + ABSTRACT + INTRO + METHOD + EXPERIMENTS + RELATED + REFERENCES
+
+
+def test_registered_tokenizer_is_used():
+    assert get_tokenizer(MODEL + "-v2").name == "char"
+    assert count_tokens("abcde", MODEL) == 5
+
+
+def test_split_sections_priorities():
+    sections = split_sections(PAPER)
+    assert ''.join(text for text, _ in sections) == PAPER
+    assert [priority for _, priority in sections] == [1, 5, 4, 3, 3, 1, 0]
+    assert sections[0][0] == FRONT
+    assert sections[3][0] == METHOD
+
+
+def test_split_sections_keeps_subsections_and_long_lines():
+    text = ("II. Introduction\nintro\n"
+            "2.1 Unknown Subsection\ndetails\n"
+            + "results " * 20 + "\n"
+            "A Appendix\nextra\n")
+    sections = split_sections(text)
+    assert [priority for _, priority in sections] == [4, 0]
+    assert "2.1 Unknown Subsection\ndetails\n" in sections[0][0]
+    assert sections[1][0] == "A Appendix\nextra\n"
+
+
+def test_fit_text_within_limit_is_unchanged():
+    builder = PromptBuilder(MODEL)
+    assert builder.fit_text(PAPER, len(PAPER)) == PAPER
+    assert builder.fit_text(PAPER, 0) == ''
+
+
+def test_fit_text_drops_lowest_priority_sections_first():
+    builder = PromptBuilder(MODEL)
+    fitted = builder.fit_text(PAPER, len(PAPER) - len(REFERENCES))
+    assert fitted == FRONT + ABSTRACT + INTRO + METHOD + EXPERIMENTS + RELATED
+
+    # 再少一些：参考文献之后丢弃优先级1的前言和相关工作
+    fitted = builder.fit_text(PAPER, len(ABSTRACT + INTRO + METHOD + EXPERIMENTS))
+    assert fitted == ABSTRACT + INTRO + METHOD + EXPERIMENTS
+
+
+def test_fit_text_shrinks_a_level_proportionally():
+    builder = PromptBuilder(MODEL)
+    room = 200
+    fitted = builder.fit_text(PAPER, len(ABSTRACT + INTRO) + room)
+
+    total = len(METHOD) + len(EXPERIMENTS)
+    method_keep = len(METHOD) * room // total
+    experiments_keep = len(EXPERIMENTS) * room // total
+    marker = len(TRUNCATION_MARKER)
+    assert fitted == (ABSTRACT + INTRO
+                      + METHOD[:method_keep - marker] + TRUNCATION_MARKER
+                      + EXPERIMENTS[:experiments_keep - marker] + TRUNCATION_MARKER)
+    assert len(fitted) <= len(ABSTRACT + INTRO) + room
+
+
+def test_prompt_budget_and_field_priority():
+    register_context_window(MODEL, 1000)
+    builder = PromptBuilder(MODEL, max_output_tokens=100, max_prompt_tokens=10000, safety_margin=0)
+    assert builder.prompt_budget == 900
+
+    template = "{title}|{abstract}|{pdf_text}"
+    elastic = [
+        ('title', 't' * 50, 20, False),
+        ('abstract', 'b' * 300, None, False),
+        ('pdf_text', PAPER, None, True),
+    ]
+    values, truncated = builder.fit(template, {}, elastic)
+    assert values['title'] == 't' * 20
+    assert values['abstract'] == 'b' * 300
+    assert truncated == ['title', 'pdf_text']
+    # 标题和摘要先占用预算，正文使用剩余部分
+    assert 0 < len(values['pdf_text']) <= 900 - len("||") - 20 - 300
+    assert len(builder.build(template, {}, elastic)) <= 900
+
+
+def test_get_context_window_longest_prefix(monkeypatch):
+    assert get_context_window('gpt-4o-mini') == 128000
+    assert get_context_window('GPT-4o') == 128000
+    assert get_context_window('gpt-4-32k-0613') == 32768
+    assert get_context_window('gpt-4-0613') == 8192
+    assert get_context_window('unknown-model') == DEFAULT_CONTEXT_WINDOW
+    assert get_context_window(None) == DEFAULT_CONTEXT_WINDOW
+
+    register_context_window('gpt-4o-mini', 64000)
+    assert get_context_window('gpt-4o-mini-2024') == 64000
+    assert get_context_window('gpt-4o') == 128000
+
+    monkeypatch.setenv("SURVEY_AGENT_CONTEXT_TOKENS", "4096")
+    assert get_context_window('gpt-4o') == 4096
+
+
+def test_split_into_chunks_keeps_paragraphs_together():
+    text = "aaaa\n\nbbbb\n\ncccc"
+    assert split_into_chunks(text, 10, MODEL) == ["aaaa\n\nbbbb", "cccc"]
+
+
+def test_split_into_chunks_splits_long_paragraphs():
+    sentences = ["First sentence here.", "Second one is here.", "x" * 45]
+    chunks = split_into_chunks(' '.join(sentences), 20, MODEL)
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert chunks[:2] == sentences[:2]
+    # 超长句子按token切开
+    assert chunks[2:] == ["x" * 20, "x" * 20, "x" * 5]
+
+
+def test_split_into_chunks_empty():
+    assert split_into_chunks("", 10, MODEL) == []
+    assert split_into_chunks("\n\n  \n\n", 10, MODEL) == []
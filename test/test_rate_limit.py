@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+自适应并发上限（AIMD）测试
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from survey_agent.llm import rate_limit
+from survey_agent.llm.rate_limit import AIMDLimiter, parse_retry_after
+from survey_agent.llm.resilience import (RATE_LIMITED, SERVER_ERROR, CircuitBreaker, ProviderError, RetryPolicy,
+                                         call_with_retries)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def test_additive_increase_adds_about_one_per_window():
+    limiter = AIMDLimiter(initial_limit=4, max_limit=100)
+    for _ in range(5):
+        limiter.on_success(0.1)
+    assert limiter.current_limit == 5
+    for _ in range(6):
+        limiter.on_success(0.1)
+    assert limiter.current_limit == 6
+
+
+def test_overload_halves_the_limit_once_per_cooldown(clock):
+    limiter = AIMDLimiter(initial_limit=16)
+    limiter.on_overload()
+    assert limiter.current_limit == 8
+    # 同一窗口内的多个错误只降一次
+    limiter.on_overload()
+    assert limiter.current_limit == 8
+    clock.now += 2
+    limiter.on_overload()
+    assert limiter.current_limit == 4
+    assert limiter.stats()['overloads'] == 3 and limiter.stats()['decreases'] == 2
+
+
+@pytest.mark.parametrize('kind', [RATE_LIMITED, SERVER_ERROR])
+def test_429_and_5xx_responses_decrease_the_limit(kind):
+    limiter = AIMDLimiter(initial_limit=8)
+    errors = [ProviderError(kind, "overloaded", 429 if kind == RATE_LIMITED else 503)]
+
+    def request(timeout):
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    policy = RetryPolicy(base_delay=0.01)
+    assert call_with_retries(request, CircuitBreaker(), limiter, policy) == "ok"
+    assert limiter.stats()['decreases'] == 1
+    assert limiter.current_limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_latency_spike_decreases_the_limit():
+    limiter = AIMDLimiter(initial_limit=8, min_latency_samples=10)
+    for _ in range(10):
+        limiter.on_success(0.1)
+    limit = limiter.current_limit
+    limiter.on_success(1.0)
+    assert limiter.stats()['latency_spikes'] == 1
+    assert limiter.current_limit == limit // 2
+
+
+def test_limit_stays_between_floor_and_ceiling(clock):
+    limiter = AIMDLimiter(initial_limit=4, min_limit=2, max_limit=6)
+    for _ in range(10):
+        clock.now += 10
+        limiter.on_overload()
+    assert limiter.current_limit == 2
+    for _ in range(1000):
+        limiter.on_success(0.1)
+    assert limiter.current_limit == 6
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('5') == 5.0
+    assert parse_retry_after('1.5') == 1.5
+    assert parse_retry_after('-3') == 0.0
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(later, usegmt=True)) <= 30
+    earlier = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(earlier, usegmt=True)) == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+
+
+def test_retry_after_pauses_new_requests():
+    limiter = AIMDLimiter(initial_limit=4)
+    limiter.on_overload(retry_after=0.2)
+    start = time.monotonic()
+    assert limiter.acquire()
+    assert time.monotonic() - start >= 0.19
+    limiter.on_overload(retry_after=0.2)
+    start = time.monotonic()
+    assert asyncio.run(limiter.acquire_async())
+    assert time.monotonic() - start >= 0.19
+
+
+def test_async_waiters_get_slots_in_arrival_order():
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1)
+    order = []
+
+    async def worker(i):
+        await limiter.acquire_async()
+        order.append(i)
+        await asyncio.sleep(0.01)
+        limiter.release()
+
+    async def main():
+        await limiter.acquire_async()
+        tasks = []
+        for i in range(5):
+            tasks.append(asyncio.create_task(worker(i)))
+            await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.in_flight == 0
+
+
+def test_release_from_another_thread_wakes_the_waiter():
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1)
+    limiter.acquire()
+    threading.Timer(0.1, limiter.release).start()
+
+    async def main():
+        start = time.monotonic()
+        assert await limiter.acquire_async(timeout=5)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) < 1
+    assert limiter.in_flight == 1
+
+
+def test_timed_out_and_cancelled_waiters_do_not_leak_slots():
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1)
+
+    async def main():
+        await limiter.acquire_async()
+        assert not await limiter.acquire_async(timeout=0.05)
+        task = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limiter.release()
+        assert limiter.in_flight == 0
+        assert await limiter.acquire_async(timeout=0.05)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1 and not limiter._waiters
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+重试、熔断与错误分类测试
+"""
+
+import asyncio
+import json
+import random
+import threading
+
+import pytest
+
+from survey_agent.llm import resilience
+from survey_agent.llm.rate_limit import AIMDLimiter
+from survey_agent.llm.resilience import (AUTH, BAD_REQUEST, DEADLINE_EXCEEDED, INVALID_RESPONSE, NETWORK,
+                                         RATE_LIMITED, SERVER_ERROR, TIMEOUT, UNEXPECTED, CircuitBreaker,
+                                         ProviderError, RetryPolicy, SummaryFailure, call_with_retries,
+                                         call_with_retries_async, classify_exception, classify_status)
+
+
+class FakeClock:
+    """替换 resilience 模块中的 time：sleep 只推进时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    return clock
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.response = FakeResponse(status_code, headers)
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+def test_classify_status():
+    assert classify_status(429) == RATE_LIMITED
+    assert classify_status(500) == SERVER_ERROR
+    assert classify_status(503) == SERVER_ERROR
+    assert classify_status(408) == TIMEOUT
+    assert classify_status(401) == AUTH
+    assert classify_status(403) == AUTH
+    assert classify_status(400) == BAD_REQUEST
+    assert classify_status(404) == BAD_REQUEST
+    assert classify_status(404, retryable_statuses=(404,)) == SERVER_ERROR
+
+
+def test_classify_exception():
+    error = classify_exception(APIStatusError(429, {'retry-after': '3'}))
+    assert (error.kind, error.status_code, error.retry_after) == (RATE_LIMITED, 429, 3.0)
+    assert error.retryable
+    assert classify_exception(APIStatusError(401)).kind == AUTH
+    assert not classify_exception(APIStatusError(400)).retryable
+    assert classify_exception(ReadTimeout()).kind == TIMEOUT
+    assert classify_exception(asyncio.TimeoutError()).kind == TIMEOUT
+    assert classify_exception(APIConnectionError()).kind == NETWORK
+    assert classify_exception(ConnectionResetError()).kind == NETWORK
+    assert classify_exception(json.JSONDecodeError('bad', '', 0)).kind == INVALID_RESPONSE
+    assert classify_exception(KeyError('x')).kind == UNEXPECTED
+    original = ProviderError(SERVER_ERROR, "boom", 502)
+    assert classify_exception(original) is original
+
+
+def test_backoff_is_jittered_under_an_exponential_ceiling():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0)
+    random.seed(0)
+    for attempt in range(1, 8):
+        ceiling = min(8.0, 2 ** (attempt - 1))
+        delays = [policy.backoff(attempt) for _ in range(50)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
+    assert policy.backoff(3, retry_after=12.0) == 12.0
+
+
+def test_retries_stop_before_the_deadline(clock):
+    """重试间隔之和不超过总时限，超时前停止"""
+    random.seed(1)
+    policy = RetryPolicy(max_attempts=100, base_delay=1.0, max_delay=4.0, deadline=20.0)
+    calls = []
+
+    def request(timeout):
+        calls.append((clock.now, timeout))
+        raise ProviderError(SERVER_ERROR, "unavailable", 503)
+
+    result = call_with_retries(request, CircuitBreaker(failure_threshold=1000), policy=policy)
+    assert isinstance(result, SummaryFailure) and result.kind == DEADLINE_EXCEEDED
+    assert len(calls) > 2
+    assert clock.now < 1000.0 + policy.deadline
+    assert all(timeout <= 1000.0 + policy.deadline - started for started, timeout in calls)
+
+
+def test_non_retryable_errors_fail_immediately(clock):
+    calls = []
+
+    def request(timeout):
+        calls.append(timeout)
+        raise ProviderError(AUTH, "bad key", 401)
+
+    result = call_with_retries(request, CircuitBreaker(), policy=RetryPolicy())
+    assert result.kind == AUTH and result.attempts == 1
+    assert len(calls) == 1 and not clock.sleeps
+
+
+def test_time_queued_on_the_limiter_counts_against_the_deadline():
+    """并发槽一直被占用时，在总时限内返回超时，不发送请求"""
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1)
+    assert limiter.acquire()
+    calls = []
+    policy = RetryPolicy(deadline=0.2)
+
+    result = call_with_retries(lambda timeout: calls.append(timeout), CircuitBreaker(), limiter, policy)
+    assert isinstance(result, SummaryFailure) and result.kind == TIMEOUT
+    result = asyncio.run(call_with_retries_async(lambda timeout: calls.append(timeout), CircuitBreaker(),
+                                                 limiter, policy))
+    assert isinstance(result, SummaryFailure) and result.kind == TIMEOUT
+    assert not calls and limiter.in_flight == 1
+
+
+def test_request_timeout_shrinks_by_the_time_spent_queued():
+    limiter = AIMDLimiter(initial_limit=1, max_limit=1)
+    limiter.acquire()
+    threading.Timer(0.3, limiter.release).start()
+    timeouts = []
+    policy = RetryPolicy(deadline=2.0, request_timeout=10.0)
+
+    assert call_with_retries(lambda timeout: timeouts.append(timeout) or "ok", CircuitBreaker(), limiter, policy) == "ok"
+    assert timeouts[0] <= 1.75
+    assert limiter.in_flight == 0
+
+
+def test_circuit_breaker_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    assert breaker.state == 'closed' and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    clock.now += 31
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+    assert breaker.stats()['opened'] == 1
+
+
+def test_open_circuit_rejects_calls_without_sending(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+    calls = []
+    result = call_with_retries(lambda timeout: calls.append(timeout), breaker)
+    assert result.kind == 'circuit_open' and not calls
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+同一篇论文的并发总结请求合并测试（使用计数的假 _complete）
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from survey_agent.llm import summarize as summarize_module
+from survey_agent.llm.summarize import OpenAISummarizer
+from survey_agent.utils.paper import Paper
+
+N_CALLERS = 8
+
+
+class CountingComplete:
+    """记录调用次数的假LLM调用，每次调用耗时 delay 秒"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> str:
+        with self._lock:
+            self.calls += 1
+            return f"summary #{self.calls}"
+
+    def __call__(self, prompt, kind="summary"):
+        time.sleep(self.delay)
+        return self._count(), 100
+
+    async def complete_async(self, prompt, kind="summary"):
+        await asyncio.sleep(self.delay)
+        return self._count(), 100
+
+
+def make_summarizer(fake: CountingComplete) -> OpenAISummarizer:
+    summarizer = OpenAISummarizer('gpt-4o-mini', api_key='test', base_url='http://127.0.0.1:9',
+                                  custom_prompt="Summary of {title}\n{abstract}")
+    summarizer._complete = fake
+    summarizer._complete_async = fake.complete_async
+    return summarizer
+
+
+def make_paper() -> Paper:
+    return Paper(title='Coalesced paper', summary='Abstract.', arxiv_id='2406.00001', version='v1')
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(summarize_module, 'INFLIGHT_POLL_S', 0.02)
+
+
+def run_in_threads(fn, n=N_CALLERS):
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_concurrent_threads_make_one_call(paper_cache):
+    fake = CountingComplete()
+    paper = make_paper()
+    summarizer = make_summarizer(fake)
+
+    results = run_in_threads(lambda: summarizer.summarize(paper))
+
+    assert fake.calls == 1
+    assert results == ["summary #1"] * N_CALLERS
+
+
+def test_threads_of_different_summarizers_make_one_call(paper_cache):
+    # 合并按缓存键进行，不同的总结器实例（相同模型和模板）也共享
+    fake = CountingComplete()
+    paper = make_paper()
+    summarizers = [make_summarizer(fake) for _ in range(N_CALLERS)]
+    index = iter(range(N_CALLERS))
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            summarizer = summarizers[next(index)]
+        return summarizer.summarize(paper)
+
+    assert run_in_threads(call) == ["summary #1"] * N_CALLERS
+    assert fake.calls == 1
+
+
+def test_concurrent_coroutines_make_one_call(paper_cache):
+    fake = CountingComplete()
+    paper = make_paper()
+    summarizer = make_summarizer(fake)
+
+    async def main():
+        return await asyncio.gather(*(summarizer.summarize_async(paper) for _ in range(N_CALLERS)))
+
+    assert asyncio.run(main()) == ["summary #1"] * N_CALLERS
+    assert fake.calls == 1
+
+
+def test_follower_uses_cached_summary_after_lease_release(paper_cache):
+    # 模拟另一个进程持有租约：等待方在租约释放后直接读取它写入的缓存
+    fake = CountingComplete(delay=0)
+    paper = make_paper()
+    summarizer = make_summarizer(fake)
+    variant = summarizer.get_cache_variant()
+    key = paper_cache.get_cache_key(paper, variant)
+    assert paper_cache.acquire_inflight(key, 'other-process', 600)
+
+    results = []
+    follower = threading.Thread(target=lambda: results.append(summarizer.summarize(paper)))
+    follower.start()
+    time.sleep(0.1)
+    assert follower.is_alive()
+
+    paper_cache.cache_summary(paper, "leader summary", variant)
+    paper_cache.release_inflight(key, 'other-process')
+    follower.join(timeout=5)
+
+    assert results == ["leader summary"]
+    assert fake.calls == 0
+    assert summarizer.get_usage_stats()['cache_hits'] == 1
+
+
+def test_async_follower_uses_cached_summary_after_lease_release(paper_cache):
+    fake = CountingComplete(delay=0)
+    paper = make_paper()
+    summarizer = make_summarizer(fake)
+    variant = summarizer.get_cache_variant()
+    key = paper_cache.get_cache_key(paper, variant)
+    assert paper_cache.acquire_inflight(key, 'other-process', 600)
+
+    async def leader_finishes():
+        await asyncio.sleep(0.1)
+        paper_cache.cache_summary(paper, "leader summary", variant)
+        paper_cache.release_inflight(key, 'other-process')
+
+    async def main():
+        result, _ = await asyncio.gather(summarizer.summarize_async(paper), leader_finishes())
+        return result
+
+    assert asyncio.run(main()) == "leader summary"
+    assert fake.calls == 0
+
+
+def test_crashed_leader_lease_expires(paper_cache):
+    # 持有者崩溃后不会释放租约，到期后由等待方接管并调用LLM
+    fake = CountingComplete(delay=0)
+    paper = make_paper()
+    summarizer = make_summarizer(fake)
+    key = paper_cache.get_cache_key(paper, summarizer.get_cache_variant())
+    assert paper_cache.acquire_inflight(key, 'crashed-process', 0.3)
+    assert not paper_cache.acquire_inflight(key, 'someone-else', 600)
+
+    start = time.monotonic()
+    assert summarizer.summarize(paper) == "summary #1"
+    assert time.monotonic() - start >= 0.2
+    assert fake.calls == 1
+    # 接管方完成后释放了租约
+    assert not paper_cache.is_inflight(key)
+
+
+def test_lease_takeover_after_expiry(paper_cache):
+    assert paper_cache.acquire_inflight('key', 'crashed', 0.1)
+    assert paper_cache.is_inflight('key')
+    assert not paper_cache.acquire_inflight('key', 'other', 600)
+    time.sleep(0.15)
+    assert not paper_cache.is_inflight('key')
+    assert paper_cache.acquire_inflight('key', 'other', 600)
+    # 过期持有者的释放不影响接管方
+    paper_cache.release_inflight('key', 'crashed')
+    assert paper_cache.is_inflight('key')
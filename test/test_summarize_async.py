@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+异步批量总结测试（使用可控耗时的假 _complete_async）
+"""
+
+import asyncio
+
+from survey_agent.llm.summarize import OpenAISummarizer, summarize_papers_async
+from survey_agent.utils.paper import Paper
+
+
+class FakeCompleteAsync:
+    """记录调用次数和最大并发数；耗时由 delays 按标题给出"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, prompt, kind="summary"):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        title = prompt.splitlines()[0][len("Summary of "):]
+        try:
+            await asyncio.sleep(self.delays.get(title, 0.02))
+        finally:
+            self.in_flight -= 1
+        return f"summary of {title}", 100
+
+
+def make_summarizer(fake: FakeCompleteAsync) -> OpenAISummarizer:
+    summarizer = OpenAISummarizer('gpt-4o-mini', api_key='test', base_url='http://127.0.0.1:9',
+                                  custom_prompt="Summary of {title}\n{abstract}")
+    summarizer._complete_async = fake
+    return summarizer
+
+
+def make_papers(n, with_ids=True):
+    return [Paper(title=f"Paper {i}", summary=f"Abstract {i}.",
+                  arxiv_id=f"2406.{i:05d}" if with_ids else '', version='v1' if with_ids else '')
+            for i in range(n)]
+
+
+def test_results_keep_paper_order(paper_cache):
+    papers = make_papers(6)
+    # 靠前的论文最慢，完成顺序与输入顺序相反
+    fake = FakeCompleteAsync({p.title: 0.02 * (6 - i) for i, p in enumerate(papers)})
+    finished = []
+
+    summaries = asyncio.run(summarize_papers_async(make_summarizer(fake), papers, concurrency=6,
+                                                   on_result=lambda i, s: finished.append(i)))
+
+    assert summaries == [f"summary of Paper {i}" for i in range(6)]
+    assert finished == list(reversed(range(6)))
+
+
+def test_concurrency_is_bounded(paper_cache):
+    fake = FakeCompleteAsync()
+    papers = make_papers(12, with_ids=False)
+
+    summaries = asyncio.run(summarize_papers_async(make_summarizer(fake), papers, concurrency=3))
+
+    assert fake.calls == 12
+    assert fake.max_in_flight == 3
+    assert all(summaries)
+
+
+def test_cached_summaries_are_reported_through_on_result(paper_cache):
+    papers = make_papers(4)
+    fake = FakeCompleteAsync()
+    first = {}
+    asyncio.run(summarize_papers_async(make_summarizer(fake), papers, concurrency=2,
+                                       on_result=lambda i, s: first.__setitem__(i, s)))
+    assert fake.calls == 4
+    assert first == {i: f"summary of Paper {i}" for i in range(4)}
+
+    # 第二次运行全部命中缓存，不再调用LLM，on_result 仍然收到每篇论文的结果
+    fake = FakeCompleteAsync()
+    summarizer = make_summarizer(fake)
+    second = {}
+    summaries = asyncio.run(summarize_papers_async(summarizer, papers, concurrency=2,
+                                                   on_result=lambda i, s: second.__setitem__(i, s)))
+    assert fake.calls == 0
+    assert second == first
+    assert summaries == [first[i] for i in range(4)]
+    assert summarizer.get_usage_stats()['cache_hits'] == 4
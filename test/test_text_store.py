@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+论文全文落盘（LazyText）测试
+"""
+
+import fitz
+import pytest
+
+from survey_agent.arxiv_tools import download
+from survey_agent.utils.file_utils import load_papers_from_jsonl, save_papers_to_jsonl
+from survey_agent.utils.paper import Paper
+from survey_agent.utils.text_store import LazyText, materialize_text, spill_text
+
+MARKER = "UniqueBodyMarker"
+TEXT = "第一段：中文内容。\nSecond paragraph with ünïcode.\n" * 20
+
+
+def pdf_bytes() -> bytes:
+    doc = fitz.open()
+    for i in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{MARKER} page {i}\n" + "Transformers attend to everything. " * 3)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture(autouse=True)
+def text_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SURVEY_AGENT_TEXT_DIR", str(tmp_path / 'texts'))
+    return tmp_path / 'texts'
+
+
+def strings_held_by(paper: Paper):
+    values = [getattr(paper, slot) for slot in Paper.__slots__]
+    values.extend((paper.extra or {}).values())
+    return [value for value in values if isinstance(value, str)]
+
+
+@pytest.mark.parametrize('in_memory', [False, True])
+def test_spilled_paper_holds_no_full_text(tmp_path, paper_cache, monkeypatch, in_memory):
+    data = pdf_bytes()
+
+    def download_paper_pdf(paper, pdf_dir=None, revalidate=True):
+        path = download._get_pdf_path(paper, pdf_dir)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    monkeypatch.setattr(download, 'download_paper_pdf', download_paper_pdf)
+    monkeypatch.setattr(download, 'download_to_memory', lambda url, **kwargs: data)
+    paper = Paper(title='Spilled Paper', summary='Abstract.', arxiv_id='2406.00001', version='v1')
+
+    paper = download.process_paper(paper, str(tmp_path / 'pdfs'), in_memory=in_memory, persist_pdf=False,
+                                   spill_text=True)
+
+    assert isinstance(paper.pdf_text, LazyText)
+    assert not any(MARKER in value for value in strings_held_by(paper))
+    assert MARKER in str(paper.pdf_text)
+    assert len(paper.pdf_text) == len(str(paper.pdf_text))
+    assert paper.content_fingerprint
+
+
+def test_lazy_text_behaves_like_the_original():
+    lazy = spill_text(TEXT, '2406.00001v1')
+    assert isinstance(lazy, LazyText)
+    assert str(lazy) == TEXT
+    assert len(lazy) == len(TEXT)
+    assert bool(lazy)
+    for item in (slice(0, 10), slice(5, None), slice(-30, None), slice(None, None, 3), 0, -1):
+        assert lazy[item] == TEXT[item]
+    assert materialize_text(lazy) == TEXT
+    assert materialize_text("plain") == "plain"
+    assert materialize_text(None) == ""
+
+
+def test_lazy_text_keys_are_sanitized(text_dir):
+    lazy = spill_text("text", "title: with / slashes")
+    assert lazy.path.startswith(str(text_dir))
+    assert "/" not in lazy.path[len(str(text_dir)) + 1:]
+
+
+def test_empty_or_missing_lazy_text(tmp_path):
+    assert not spill_text("", 'empty')
+    missing = LazyText(tmp_path / 'missing.txt', 10)
+    assert str(missing) == ""
+    assert missing[:5] == ""
+
+
+def test_save_papers_to_jsonl_writes_the_real_text(tmp_path):
+    paper = Paper(title='Spilled Paper', summary='Abstract.', arxiv_id='2406.00001', version='v1')
+    paper.pdf_text = spill_text(TEXT, paper.get_short_id())
+    output = tmp_path / 'papers.jsonl'
+
+    save_papers_to_jsonl([paper, {'title': 'Plain', 'pdf_text': 'plain text'}], str(output))
+
+    assert 'LazyText' not in output.read_text(encoding='utf-8')
+    loaded = load_papers_from_jsonl(str(output))
+    assert loaded[0]['pdf_text'] == TEXT
+    assert loaded[1]['pdf_text'] == 'plain text'
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+分级总结测试（筛选模型的 _complete 被替换为按标题打分的假实现）
+"""
+
+import json
+
+import pytest
+
+from survey_agent.llm.summarize import OpenAISummarizer
+from survey_agent.llm.triage import PaperTriage, format_triage_note, parse_triage_response
+from survey_agent.survey import generator
+from survey_agent.utils.paper import Paper
+
+SCORES = {'Relevant paper': 9, 'Borderline paper': 6, 'Off-topic paper': 2}
+
+
+def fake_summarizer(calls=None) -> OpenAISummarizer:
+    """按标题返回固定分数的摘要器；标题不在 SCORES 中时模拟调用失败"""
+    summarizer = OpenAISummarizer('gpt-4o-mini', api_key='test', base_url='http://127.0.0.1:9')
+
+    def complete(prompt, kind="summary"):
+        if calls is not None:
+            calls.append(kind)
+        if kind != "triage":
+            return "full summary", 100
+        for title, score in SCORES.items():
+            if title in prompt:
+                return json.dumps({'score': score, 'tldr': f"about {title}"}), 10
+        return "", None
+
+    summarizer._complete = complete
+    return summarizer
+
+
+def make_papers(*titles):
+    return [Paper(title=title, summary=f"Abstract of {title}.") for title in titles]
+
+
+def test_parse_json_response():
+    assert parse_triage_response('{"score": 7, "tldr": " 一句话 "}') == {'score': 7.0, 'tldr': '一句话'}
+
+
+def test_parse_json_embedded_in_text():
+    text = '结果如下：\n```json\n{"score": 8.5, "tldr": "x"}\n```'
+    assert parse_triage_response(text) == {'score': 8.5, 'tldr': 'x'}
+
+
+def test_parse_score_without_json():
+    assert parse_triage_response('score: 7，与主题相关') == {'score': 7.0, 'tldr': ''}
+    assert parse_triage_response('"score"：3') == {'score': 3.0, 'tldr': ''}
+
+
+def test_parse_clamps_score():
+    assert parse_triage_response('{"score": 15, "tldr": ""}')['score'] == 10.0
+    assert parse_triage_response('{"score": -2, "tldr": ""}')['score'] == 0.0
+
+
+@pytest.mark.parametrize('text', ['', None, '无法判断', '{"tldr": "no score"}', '{"score": "high"}'])
+def test_parse_without_score_returns_none(text):
+    assert parse_triage_response(text) is None
+
+
+def test_threshold_routing(paper_cache):
+    papers = make_papers('Relevant paper', 'Borderline paper', 'Off-topic paper', 'Unknown paper')
+    triage = PaperTriage(fake_summarizer(), 'survey topic', threshold=6)
+
+    assert triage.run(papers) == [True, True, False, True]
+    assert papers[0]['triage'] == {'score': 9.0, 'tldr': 'about Relevant paper', 'passed': True}
+    # 分数等于阈值时做全文总结
+    assert papers[1]['triage']['passed'] is True
+    assert papers[2]['triage'] == {'score': 2.0, 'tldr': 'about Off-topic paper', 'passed': False}
+    # 筛选失败的论文放行
+    assert papers[3]['triage'] is None
+    assert triage.counts == {'passed': 3, 'skipped': 1, 'failed': 1}
+
+
+def test_async_routing_matches_sync(paper_cache):
+    summarizer = fake_summarizer()
+
+    async def complete_async(prompt, kind="summary"):
+        return summarizer._complete(prompt, kind)
+
+    summarizer._complete_async = complete_async
+    papers = make_papers('Relevant paper', 'Off-topic paper')
+    assert PaperTriage(summarizer, 'survey topic').run(papers, concurrency=2) == [True, False]
+
+
+def test_report_per_tier(paper_cache):
+    triage = PaperTriage(fake_summarizer(), 'survey topic', threshold=6)
+    triage.run(make_papers('Relevant paper', 'Off-topic paper', 'Unknown paper'))
+    full = fake_summarizer()
+    full._count_usage(calls=2, tokens=200, latency_s=1.0)
+
+    report = triage.report(full, verbose=False)
+    assert (report['passed'], report['skipped'], report['failed'], report['threshold']) == (2, 1, 1, 6)
+    assert report['tiers']['triage']['calls'] == 3
+    assert report['tiers']['triage']['failures'] == 1
+    assert report['tiers']['triage']['tokens'] == 20
+    assert report['tiers']['full']['calls'] == 2
+    assert report['tiers']['full']['tokens'] == 200
+    assert 'full' not in triage.report(verbose=False)['tiers']
+
+
+def test_cached_triage_is_reused(paper_cache):
+    papers = [Paper(title='Relevant paper', summary='Abstract.', arxiv_id='2406.00001', version='v1')]
+    calls = []
+    PaperTriage(fake_summarizer(calls), 'survey topic').run(papers)
+    triage = PaperTriage(fake_summarizer(calls), 'survey topic')
+    assert triage.run(papers) == [True]
+    assert calls == ['triage']
+    assert triage.summarizer.get_usage_stats()['cache_hits'] == 1
+
+
+def test_format_triage_note():
+    note = format_triage_note({'score': 2.0, 'tldr': '无关'}, 6.0)
+    assert '2/10' in note and '阈值 6' in note and note.rstrip().endswith('无关')
+
+
+def test_survey_only_processes_papers_that_pass(tmp_path, paper_cache, monkeypatch):
+    calls = []
+    processed = []
+
+    def process_one(paper, *args, **kwargs):
+        processed.append(paper['title'])
+        paper = Paper.from_any(paper)
+        paper['pdf_text'] = f"Full text of {paper.title}."
+        return paper
+
+    monkeypatch.setattr(generator, 'get_summarizer', lambda *args, **kwargs: fake_summarizer(calls))
+    monkeypatch.setattr(generator, '_process_one', process_one)
+    papers = [{'title': title, 'summary': f"Abstract of {title}."}
+              for title in ('Relevant paper', 'Off-topic paper')]
+    output = tmp_path / 'survey.md'
+
+    generator.generate_survey(papers=papers, output_file=str(output), use_artifacts=False,
+                              triage=True, triage_query='survey topic')
+
+    assert processed == ['Relevant paper']
+    assert calls.count('triage') == 2
+    assert calls.count('summary') == 1
+    markdown = output.read_text(encoding='utf-8')
+    assert 'full summary' in markdown
+    assert 'about Off-topic paper' in markdown